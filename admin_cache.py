@@ -0,0 +1,125 @@
+import asyncio
+import time
+import logging
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Tuple
+from pyrogram import Client
+from pyrogram.enums import ChatMemberStatus, ChatMembersFilter
+from pyrogram.types import ChatMemberUpdated
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+ADMIN_TTL_SECONDS = 1800.0
+REFRESH_INTERVAL_SECONDS = 300.0
+PREFETCH_CONCURRENCY = 10
+ADMIN_STATUSES = (ChatMemberStatus.OWNER, ChatMemberStatus.ADMINISTRATOR)
+
+def is_admin_change(update: ChatMemberUpdated) -> bool:
+    """Check whether a chat_member update gives or takes admin rights (ordinary joins and leaves do not)."""
+    return any(member is not None and member.status in ADMIN_STATUSES
+               for member in (update.old_chat_member, update.new_chat_member))
+
+class AdminCache:
+    """TTL cache of chat administrators, refreshed concurrently and invalidated by chat_member updates.
+
+    Broadcast audience resolution reads the cache (`peek`) and never waits on the API; `prefetch`
+    and the background refresher keep it warm with a bounded number of concurrent lookups.
+    """
+
+    def __init__(self, client: Client, ttl: float = ADMIN_TTL_SECONDS, concurrency: int = PREFETCH_CONCURRENCY) -> None:
+        self.client = client
+        self.ttl = ttl
+        self.concurrency = concurrency
+        # chat_id -> (expires_at, admin user IDs)
+        self._entries: Dict[int, Tuple[float, FrozenSet[int]]] = {}
+        self._inflight: Dict[int, asyncio.Future] = {}
+        self._listeners: List[Callable[[int, FrozenSet[int]], None]] = []
+
+    def subscribe(self, listener: Callable[[int, FrozenSet[int]], None]) -> None:
+        """Call `listener(chat_id, admins)` whenever a chat's admins are fetched."""
+        self._listeners.append(listener)
+
+    async def _fetch(self, chat_id: int) -> FrozenSet[int]:
+        admins = frozenset([
+            member.user.id async for member in
+            self.client.get_chat_members(chat_id, filter=ChatMembersFilter.ADMINISTRATORS)
+        ])
+        self._entries[chat_id] = (time.monotonic() + self.ttl, admins)
+        for listener in self._listeners:
+            try:
+                listener(chat_id, admins)
+            except Exception as e:
+                logger.error(f"Admin cache listener failed for {chat_id}: {e}")
+        return admins
+
+    async def refresh(self, chat_id: int) -> FrozenSet[int]:
+        """Fetch a chat's admins, sharing one request between concurrent callers.
+
+        On failure the stale entry (if any) is kept so a transient error does not empty the audience.
+        """
+        future = self._inflight.get(chat_id)
+        owner = future is None
+        if owner:
+            future = asyncio.ensure_future(self._fetch(chat_id))
+            self._inflight[chat_id] = future
+        try:
+            return await asyncio.shield(future)
+        except Exception as e:
+            if owner:
+                logger.error(f"Failed to get admins of chat {chat_id}: {e}")
+            return self.peek(chat_id)
+        finally:
+            if owner:
+                self._inflight.pop(chat_id, None)
+
+    def is_fresh(self, chat_id: int) -> bool:
+        entry = self._entries.get(chat_id)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def peek(self, chat_id: int) -> FrozenSet[int]:
+        """Return the cached admins (possibly stale) without any API call."""
+        entry = self._entries.get(chat_id)
+        return entry[1] if entry else frozenset()
+
+    async def get(self, chat_id: int) -> FrozenSet[int]:
+        """Return a chat's admins, fetching them only if the cached entry has expired."""
+        if self.is_fresh(chat_id):
+            return self._entries[chat_id][1]
+        return await self.refresh(chat_id)
+
+    async def prefetch(self, chat_ids: Iterable[int]) -> None:
+        """Refresh every missing or expired chat concurrently (at most `concurrency` at a time)."""
+        stale = [chat_id for chat_id in chat_ids if not self.is_fresh(chat_id)]
+        if not stale:
+            return
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh_one(chat_id: int) -> None:
+            async with semaphore:
+                await self.refresh(chat_id)
+
+        await asyncio.gather(*(refresh_one(chat_id) for chat_id in stale))
+
+    def invalidate(self, chat_id: int) -> None:
+        """Drop a chat's entry (e.g. on a chat_member update) so the next lookup refetches it."""
+        self._entries.pop(chat_id, None)
+
+    async def refresh_forever(self, chat_ids: Callable[[], Iterable[int]],
+                              interval: float = REFRESH_INTERVAL_SECONDS) -> None:
+        """Background task: keep the admins of every known chat cached."""
+        while True:
+            try:
+                await self.prefetch(list(chat_ids()))
+            except Exception as e:
+                logger.error(f"Ralat menyegarkan cache admin: {e}")
+            await asyncio.sleep(interval)
+
+    async def chats_with_admin(self, chat_ids: Iterable[int], predicate: Callable[[int], bool]) -> List[int]:
+        """Return the chats with at least one admin matching `predicate`, prefetching stale entries first."""
+        chat_ids = list(chat_ids)
+        await self.prefetch(chat_ids)
+        return [chat_id for chat_id in chat_ids if any(predicate(admin_id) for admin_id in self.peek(chat_id))]
+
+def cached_chats_with_admin(cache: AdminCache, chat_ids: Iterable[Any], predicate: Callable[[int], bool]) -> List[Any]:
+    """Synchronous variant of `chats_with_admin` that only reads the cache."""
+    return [chat_id for chat_id in chat_ids if any(predicate(admin_id) for admin_id in cache.peek(chat_id))]
@@ -1,35 +1,49 @@
-import json
-import os
+import logging
 import requests
 from datetime import datetime
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
+from typing import Any, Callable, Iterable, Optional, Union
+from apscheduler.triggers.base import BaseTrigger
 from apscheduler.triggers.date import DateTrigger
 from pyrogram import Client, filters
-from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
+from pyrogram.types import ChatMemberUpdated, InlineKeyboardButton, InlineKeyboardMarkup, Message
 from config import TOKEN as TELEGRAM_BOT_TOKEN, API_ID, API_HASH, ADMIN_BOT_ID
+from json_store import load_json, save_json, update_json
+from user_registry import get_user_registry
+from tier_index import get_tier_index
+from segments import format_segment_sizes, get_segment_store, track_bot_membership
+from outbound_limiter import throttle_client
+from peer_cache import harvest_peers, warm_peers
+from audience import Audience
+from broadcast_engine import BroadcastResult, run_in_client_loop
+from broadcast_content import Content, as_content, build_sender, content_from_command
+from broadcast_jobs import BroadcastJob, DONE, list_jobs, run_job
+from recipient_health import get_recipient_health
+from broadcast_progress import edit_status, get_progress_registry
+from admin_cache import AdminCache, is_admin_change
+from membership_cache import MembershipCache, is_joined_status
+from scheduled_broadcasts import SCHEDULE_HELP, add_broadcast_job, cancel_job, format_jobs, parse_schedule, register_runner
+from scheduler_service import start_scheduler
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
 
 # Initialize the Pyrogram client
-app = Client("admin_bot", api_id=API_ID, api_hash=API_HASH, bot_token=TELEGRAM_BOT_TOKEN)
-scheduler = BackgroundScheduler()
-scheduler.start()
+app = harvest_peers(throttle_client(Client("admin_bot", api_id=API_ID, api_hash=API_HASH, bot_token=TELEGRAM_BOT_TOKEN)))
+admin_cache = AdminCache(app)
+admin_cache.subscribe(get_segment_store().set_chat_admins)
 
 # Helper Functions
 def load_json_file(file_path: str) -> list:
     """Load a JSON file and return its content."""
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as file:
-            return json.load(file)
-    return []
+    return load_json(file_path, [])
 
 def save_json_file(file_path: str, data: list) -> None:
     """Save a list to a JSON file."""
-    with open(file_path, 'w') as file:
-        json.dump(data, file, indent=4)
+    save_json(file_path, data)
 
 def load_user_data() -> dict:
-    """Load user data from file."""
-    return load_json_file('user_data.json')
+    """Load user data from the user registry."""
+    return get_user_registry().all()
 
 def load_group_ids() -> list:
     """Load group IDs from file."""
@@ -41,19 +55,12 @@ def load_channel_ids() -> list:
 
 def load_cloned_bots() -> list:
     """Load cloned bot tokens from file."""
-    if os.path.exists('cloned_bots.json'):
-        with open('cloned_bots.json', 'r') as file:
-            return json.load(file)
-    return []
+    return load_json('cloned_bots.json', [])
 
 def load_admin_bot_id() -> list:
     """Load admin bot IDs from the configuration file."""
-    config_file = 'admin_bot_id.json'
-    if os.path.exists(config_file):
-        with open(config_file, 'r') as file:
-            config_data = json.load(file)
-            return config_data.get('admin_bot_id', [])
-    return []
+    config_data = load_json('admin_bot_id.json', {})
+    return config_data.get('admin_bot_id', [])
 
 def is_admin_bot(user_id: int) -> bool:
     """Check if the user is an admin bot."""
@@ -71,124 +78,128 @@ def list_admin_bot_ids() -> list:
 
 def is_freemium(user_id: int) -> bool:
     """Check if the user is a freemium user."""
-    user_data = load_user_data()
-    return str(user_id) in user_data and user_data[str(user_id)].get('type') == 'freemium'
+    return get_tier_index().is_freemium(user_id)
+
+def get_admins_of_chat(chat_id: int) -> list:
+    """Retrieve the list of admins for a chat (cached with a TTL)."""
+    return list(run_in_client_loop(app, admin_cache.get(chat_id)))
+
+def freemium_chats(kind: str) -> Audience:
+    """Return the 'groups' or 'channels' segment where at least one admin is a freemium user."""
+    segment_store = get_segment_store()
+    run_in_client_loop(app, admin_cache.prefetch(segment_store.get(kind)))
+    return segment_store.freemium_chats(kind)
+
+def broadcast_message(content: Union[str, Content], ids: Iterable[int], entity_type: str,
+                      status_message: Optional[Message] = None, window: Optional[float] = None) -> BroadcastResult:
+    """Broadcast text or a copied message to a list of IDs as a resumable job on the client's event loop.
+
+    If `status_message` is given it is edited periodically with the live progress. With `window`
+    (seconds) the sends are spread evenly over that period.
+    """
+    job = BroadcastJob.create(as_content(content), ids, entity_type)
+    run_in_client_loop(app, warm_peers(app, job.pending_ids()))
+    send = run_in_client_loop(app, build_sender(app, job.content))
+    on_progress = edit_status(status_message) if status_message else None
+    return run_in_client_loop(app, run_job(job, send, on_progress=on_progress, window=window))
+
+def run_scheduled_broadcast(segment: str, content: Content, entity_type: str, window: Optional[float]) -> None:
+    """Scheduler runner: resolve the segment at fire time and broadcast it."""
+    if segment in ('freemium_groups', 'freemium_channels'):
+        ids = freemium_chats(segment[len('freemium_'):])
+    else:
+        ids = get_segment_store().get(segment)
+    broadcast_message(content, ids, entity_type, window=window)
 
-def broadcast_message(message_text: str, ids: list, entity_type: str) -> None:
-    """Broadcast message to a list of IDs (users, groups, channels)."""
-    for entity_id in ids:
-        try:
-            app.send_message(chat_id=entity_id, text=message_text)
-        except Exception as e:
-            print(f"Failed to send message to {entity_type} {entity_id}: {e}")
-
-def schedule_broadcast(message_text: str, ids: list, entity_type: str, send_time: datetime) -> None:
-    """Schedule a broadcast message."""
-    trigger = DateTrigger(run_date=send_time)
-    job_func = lambda: broadcast_message(message_text, ids, entity_type)
-    scheduler.add_job(job_func, trigger)
-
-def schedule_broadcast_all(message_text: str, interval_hours: int) -> None:
-    """Schedule a broadcast message to all freemium users, groups, and channels at specified intervals."""
-    job_func = lambda: schedule_all_broadcast(message_text)
-    scheduler.add_job(job_func, IntervalTrigger(hours=interval_hours))
-
-def schedule_user_broadcast(message_text: str, interval_hours: int) -> None:
-    """Schedule a broadcast message to all freemium users at specified intervals."""
-    user_ids = [int(uid) for uid in load_user_data().keys() if is_freemium(int(uid))]
-    job_func = lambda: broadcast_message(message_text, user_ids, "user")
-    scheduler.add_job(job_func, IntervalTrigger(hours=interval_hours))
-
-def schedule_group_broadcast(message_text: str, interval_hours: int) -> None:
-    """Schedule a broadcast message to all freemium groups at specified intervals."""
-    group_ids = load_group_ids()
-    freemium_groups = [gid for gid in group_ids if any(is_freemium(admin_id) for admin_id in get_admins_of_chat(gid))]
-    job_func = lambda: broadcast_message(message_text, freemium_groups, "group")
-    scheduler.add_job(job_func, IntervalTrigger(hours=interval_hours))
-
-def schedule_channel_broadcast(message_text: str, interval_hours: int) -> None:
-    """Schedule a broadcast message to all freemium channels at specified intervals."""
-    channel_ids = load_channel_ids()
-    freemium_channels = [cid for cid in channel_ids if any(is_freemium(admin_id) for admin_id in get_admins_of_chat(cid))]
-    job_func = lambda: broadcast_message(message_text, freemium_channels, "channel")
-    scheduler.add_job(job_func, IntervalTrigger(hours=interval_hours))
+register_runner('admintf', run_scheduled_broadcast, lambda: bool(app.is_initialized))
+
+def schedule_broadcast(message_text: str, segment: str, entity_type: str, send_time: datetime,
+                       window: Optional[float] = None) -> None:
+    """Schedule a broadcast to a segment, optionally spread over `window` seconds from `send_time`."""
+    add_broadcast_job('admintf', segment, as_content(message_text), entity_type,
+                      DateTrigger(run_date=send_time), window)
+
+def schedule_broadcast_all(content: Union[str, Content], trigger: BaseTrigger) -> None:
+    """Schedule a recurring broadcast to all freemium users, groups, and channels."""
+    schedule_user_broadcast(content, trigger)
+    schedule_group_broadcast(content, trigger)
+    schedule_channel_broadcast(content, trigger)
+
+def schedule_user_broadcast(content: Union[str, Content], trigger: BaseTrigger) -> None:
+    """Schedule a recurring broadcast to all freemium users."""
+    # Only the segment name is stored, so each run reaches the current audience
+    add_broadcast_job('admintf', 'freemium', as_content(content), "user", trigger)
+
+def schedule_group_broadcast(content: Union[str, Content], trigger: BaseTrigger) -> None:
+    """Schedule a recurring broadcast to all freemium groups."""
+    add_broadcast_job('admintf', 'freemium_groups', as_content(content), "group", trigger)
+
+def schedule_channel_broadcast(content: Union[str, Content], trigger: BaseTrigger) -> None:
+    """Schedule a recurring broadcast to all freemium channels."""
+    add_broadcast_job('admintf', 'freemium_channels', as_content(content), "channel", trigger)
 
 def list_scheduled_jobs() -> str:
     """List all scheduled jobs."""
-    jobs = scheduler.get_jobs()
-    if not jobs:
-        return "No scheduled jobs."
-    
-    job_list = []
-    for job in jobs:
-        job_info = f"ID: {job.id}, Next run time: {job.next_run_time}, Trigger: {job.trigger}"
-        job_list.append(job_info)
-    
-    return "\n".join(job_list)
+    return format_jobs()
 
 def cancel_scheduled_job(job_id: str) -> str:
     """Cancel a scheduled job by its ID."""
-    job = scheduler.get_job(job_id)
-    if job:
-        scheduler.remove_job(job_id)
-        return f"Job with ID {job_id} has been canceled."
-    else:
-        return f"No job found with ID {job_id}."
+    return cancel_job(job_id)
 
 def set_join_group_or_channel(group_or_channel_id: int) -> None:
     """Set a group or channel ID that users must join to use the bot."""
-    join_requirements = load_json_file('join_requirements.json')
-    if group_or_channel_id not in join_requirements:
-        join_requirements.append(group_or_channel_id)
-        save_json_file('join_requirements.json', join_requirements)
+    def add_requirement(join_requirements: list) -> None:
+        if group_or_channel_id not in join_requirements:
+            join_requirements.append(group_or_channel_id)
+
+    update_json('join_requirements.json', [], add_requirement)
 
 def get_join_requirements() -> list:
     """Get a list of group or channel IDs that users must join."""
     return load_json_file('join_requirements.json')
 
-def check_user_joined(user_id: int) -> bool:
-    """Check if the user has joined the required group or channel."""
-    join_requirements = get_join_requirements()
-    
-    for group_or_channel_id in join_requirements:
-        # Check if the requirement is a group or channel
-        if group_or_channel_id.startswith('-100'):
-            # It's a group
-            try:
-                member = app.get_chat_member(chat_id=group_or_channel_id, user_id=user_id)
-                if member.status in ['member', 'administrator', 'creator']:
-                    return True
-            except Exception as e:
-                # Handle exception if chat member info cannot be fetched
-                print(f"Error checking member status for {user_id} in group {group_or_channel_id}: {e}")
-                return False
-        else:
-            # For channels, we need a different approach
-            # Check if user is following the channel (only possible with user bots)
-            try:
-                response = requests.get(f'https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getChatMember', params={
-                    'chat_id': group_or_channel_id,
-                    'user_id': user_id
-                })
-                result = response.json()
-                if result['ok']:
-                    status = result['result']['status']
-                    if status in ['member', 'administrator', 'creator']:
-                        return True
-            except requests.RequestException as e:
-                # Handle exception if API request fails
-                print(f"Error checking channel membership for {user_id} in channel {group_or_channel_id}: {e}")
+def fetch_membership(user_id: int, group_or_channel_id: Any) -> Optional[bool]:
+    """Ask Telegram whether the user has joined a required group or channel (None if it could not be checked)."""
+    # Check if the requirement is a group or channel
+    if str(group_or_channel_id).startswith('-100'):
+        # It's a group
+        try:
+            member = app.get_chat_member(chat_id=group_or_channel_id, user_id=user_id)
+            return is_joined_status(member.status, member.is_member)
+        except Exception as e:
+            if type(e).__name__ == 'UserNotParticipant':
                 return False
-    
-    return False
+            # Handle exception if chat member info cannot be fetched
+            logger.error(f"Error checking member status for {user_id} in group {group_or_channel_id}: {e}")
+            return None
+    # For channels, we need a different approach
+    # Check if user is following the channel (only possible with user bots)
+    try:
+        response = requests.get(f'https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getChatMember', params={
+            'chat_id': group_or_channel_id,
+            'user_id': user_id
+        }, timeout=10)
+        result = response.json()
+        return bool(result['ok']) and is_joined_status(result['result']['status'], result['result'].get('is_member'))
+    except requests.RequestException as e:
+        # Handle exception if API request fails
+        logger.error(f"Error checking channel membership for {user_id} in channel {group_or_channel_id}: {e}")
+        return None
+
+membership_cache = MembershipCache(fetch_membership)
+
+def check_user_joined(user_id: int) -> bool:
+    """Check if the user has joined the required group or channel (cached per user and chat)."""
+    return any(membership_cache.is_member(user_id, group_or_channel_id)
+               for group_or_channel_id in get_join_requirements())
 
 @app.on_message(filters.command('broadcastfbot') & filters.user(ADMIN_BOT_ID))
 def broadcast_to_freemium_bots(client: Client, message: Message) -> None:
     """Broadcast message to all freemium bots."""
     if is_admin(message.from_user.id):
-        message_text = ' '.join(message.text.split()[1:])
-        broadcast_message(message_text, [int(uid) for uid in load_user_data().keys() if is_freemium(int(uid))], "user")
-        client.send_message(message.chat.id, "Broadcast to all freemium bots completed.")
+        status = client.send_message(message.chat.id, "Broadcast to all freemium bots started.")
+        result = broadcast_message(content_from_command(message), get_segment_store().get('freemium'), "user", status)
+        status.edit_text(f"Broadcast to all freemium bots completed: {result.summary()}")
     else:
         client.send_message(message.chat.id, "You do not have permission to use this command.")
 
@@ -196,10 +207,15 @@ def broadcast_to_freemium_bots(client: Client, message: Message) -> None:
 def broadcast_to_premium_bots(client: Client, message: Message) -> None:
     """Broadcast message to all premium bots."""
     if is_admin(message.from_user.id):
-        message_text = ' '.join(message.text.split()[1:])
         # Replace with your method for getting premium bot IDs
-        broadcast_message(message_text, load_cloned_bots(), "bot")
-        client.send_message(message.chat.id, "Broadcast to all premium bots completed.")
+        status = client.send_message(message.chat.id, "Broadcast to all premium bots started.")
+        try:
+            result = broadcast_message(content_from_command(message), load_cloned_bots(), "bot", status)
+        except ValueError as e:
+            # Cloned bots are stored as bot tokens, which the broadcast engine cannot address
+            status.edit_text(f"Broadcast to all premium bots failed: {e}")
+            return
+        status.edit_text(f"Broadcast to all premium bots completed: {result.summary()}")
     else:
         client.send_message(message.chat.id, "You do not have permission to use this command.")
 
@@ -214,101 +230,90 @@ def broadcast_to_all_bots(message_text: str) -> None:
         except Exception as e:
             print(f"Failed to send message using bot with token {bot_token}: {e}")
 
+@app.on_message(filters.command('segments') & filters.user(ADMIN_BOT_ID))
+def handle_list_segments(client: Client, message: Message) -> None:
+    """Handle command to show the size of every broadcast audience segment."""
+    client.send_message(message.chat.id, f"Broadcast segments:\n{format_segment_sizes()}")
+
+@app.on_message(filters.command('recipient_health') & filters.user(ADMIN_BOT_ID))
+def handle_recipient_health(client: Client, message: Message) -> None:
+    """Handle command to report how many dead recipients are pruned from broadcasts, by reason."""
+    client.send_message(message.chat.id, f"Pruned recipients:\n{get_recipient_health().report()}")
+
+@app.on_message(filters.command('broadcast_status') & filters.user(ADMIN_BOT_ID))
+def handle_broadcast_status(client: Client, message: Message) -> None:
+    """Handle command to show live progress of running broadcasts."""
+    client.send_message(message.chat.id, get_progress_registry().report())
+
+@app.on_message(filters.command('broadcast_resume') & filters.user(ADMIN_BOT_ID))
+def handle_broadcast_resume(client: Client, message: Message) -> None:
+    """Handle command to resume an interrupted broadcast job from its last checkpoint."""
+    parts = message.text.split()
+    if len(parts) != 2:
+        unfinished = "\n".join(
+            f"{job['job_id']} ({job['entity_type']}, {job['cursor']}/{job['total']})" for job in list_jobs(unfinished_only=True)
+        )
+        client.send_message(message.chat.id, f"Usage: /broadcast_resume <job_id>\nUnfinished broadcasts:\n{unfinished or 'None'}")
+        return
+    job = BroadcastJob.load(parts[1])
+    if job is None:
+        client.send_message(message.chat.id, f"No broadcast job found with ID {parts[1]}.")
+        return
+    if job.status == DONE:
+        client.send_message(message.chat.id, f"Broadcast {job.job_id} has already completed.")
+        return
+    if not job.lock():
+        client.send_message(message.chat.id, f"Broadcast {job.job_id} is still running.")
+        return
+    try:
+        status = client.send_message(message.chat.id, f"Resuming broadcast {job.job_id}: {job.remaining()} recipients left.")
+        run_in_client_loop(app, warm_peers(app, job.pending_ids()))
+        send = run_in_client_loop(app, build_sender(app, job.content))
+        result = run_in_client_loop(app, run_job(job, send, on_progress=edit_status(status)))
+    finally:
+        job.release()
+    status.edit_text(f"Broadcast {job.job_id} completed: {result.summary()}")
+
+def schedule_from_command(client: Client, message: Message, schedule: Callable[[Content, BaseTrigger], None],
+                          audience: str) -> None:
+    """Parse `/schedule_* <schedule> | <message>` (or reply to a message with `/schedule_* <schedule>`) and add the job."""
+    command, _, arguments = message.text.partition(' ')
+    spec, _, message_text = arguments.partition('|')
+    if not spec.strip() or not (message_text.strip() or message.reply_to_message):
+        client.send_message(message.chat.id, f"Usage: {command} <schedule> | <message>\n{SCHEDULE_HELP}")
+        return
+    try:
+        trigger = parse_schedule(spec)
+    except ValueError as e:
+        client.send_message(message.chat.id, f"Invalid schedule: {e}\n{SCHEDULE_HELP}")
+        return
+    if message.reply_to_message:
+        content = {'from_chat_id': message.chat.id, 'message_id': message.reply_to_message.id}
+    else:
+        content = as_content(message_text.strip())
+    schedule(content, trigger)
+    first_run = trigger.get_next_fire_time(None, datetime.now(trigger.timezone))
+    client.send_message(message.chat.id, f"Scheduled broadcast to {audience} ({spec.strip()}); first run at {first_run}.")
+
 @app.on_message(filters.command('schedule_user') & filters.user(ADMIN_BOT_ID))
 def handle_schedule_user_broadcast(client: Client, message: Message) -> None:
-    """Handle command to schedule broadcasts to all freemium users."""
-    if is_admin(message.from_user.id):
-        try:
-            parts = message.text.split()
-            if len(parts) != 3:
-                client.send_message(message.chat.id, "Usage: /schedule_user now:<interval_hours>")
-                return
-
-            command, now_str, interval_str = parts
-            if not now_str.startswith('now:') or not interval_str.isdigit():
-                client.send_message(message.chat.id, "Invalid format. Use /schedule_user now:<interval_hours>")
-                return
-            
-            interval_hours = int(interval_str)
-            message_text = ' '.join(parts[2:])
-            schedule_user_broadcast(message_text, interval_hours)
-            client.send_message(message.chat.id, f"Scheduled broadcast to freemium users every {interval_hours} hours.")
-        except ValueError:
-            client.send_message(message.chat.id, "Invalid input. Please ensure the interval is a number.")
-    else:
-        client.send_message(message.chat.id, "You do not have permission to schedule broadcasts.")
+    """Handle command to schedule recurring broadcasts to all freemium users."""
+    schedule_from_command(client, message, schedule_user_broadcast, "freemium users")
 
 @app.on_message(filters.command('schedule_group') & filters.user(ADMIN_BOT_ID))
 def handle_schedule_group_broadcast(client: Client, message: Message) -> None:
-    """Handle command to schedule broadcasts to all freemium groups."""
-    if is_admin(message.from_user.id):
-        try:
-            parts = message.text.split()
-            if len(parts) != 3:
-                client.send_message(message.chat.id, "Usage: /schedule_group now:<interval_hours>")
-                return
-
-            command, now_str, interval_str = parts
-            if not now_str.startswith('now:') or not interval_str.isdigit():
-                client.send_message(message.chat.id, "Invalid format. Use /schedule_group now:<interval_hours>")
-                return
-            
-            interval_hours = int(interval_str)
-            message_text = ' '.join(parts[2:])
-            schedule_group_broadcast(message_text, interval_hours)
-            client.send_message(message.chat.id, f"Scheduled broadcast to freemium groups every {interval_hours} hours.")
-        except ValueError:
-            client.send_message(message.chat.id, "Invalid input. Please ensure the interval is a number.")
-    else:
-        client.send_message(message.chat.id, "You do not have permission to schedule broadcasts.")
+    """Handle command to schedule recurring broadcasts to all freemium groups."""
+    schedule_from_command(client, message, schedule_group_broadcast, "freemium groups")
 
 @app.on_message(filters.command('schedule_channel') & filters.user(ADMIN_BOT_ID))
 def handle_schedule_channel_broadcast(client: Client, message: Message) -> None:
-    """Handle command to schedule broadcasts to all freemium channels."""
-    if is_admin(message.from_user.id):
-        try:
-            parts = message.text.split()
-            if len(parts) != 3:
-                client.send_message(message.chat.id, "Usage: /schedule_channel now:<interval_hours>")
-                return
-
-            command, now_str, interval_str = parts
-            if not now_str.startswith('now:') or not interval_str.isdigit():
-                client.send_message(message.chat.id, "Invalid format. Use /schedule_channel now:<interval_hours>")
-                return
-            
-            interval_hours = int(interval_str)
-            message_text = ' '.join(parts[2:])
-            schedule_channel_broadcast(message_text, interval_hours)
-            client.send_message(message.chat.id, f"Scheduled broadcast to freemium channels every {interval_hours} hours.")
-        except ValueError:
-            client.send_message(message.chat.id, "Invalid input. Please ensure the interval is a number.")
-    else:
-        client.send_message(message.chat.id, "You do not have permission to schedule broadcasts.")
+    """Handle command to schedule recurring broadcasts to all freemium channels."""
+    schedule_from_command(client, message, schedule_channel_broadcast, "freemium channels")
 
 @app.on_message(filters.command('schedule_all') & filters.user(ADMIN_BOT_ID))
 def handle_schedule_all_broadcast(client: Client, message: Message) -> None:
-    """Handle command to schedule broadcasts to all freemium users, groups, and channels."""
-    if is_admin(message.from_user.id):
-        try:
-            parts = message.text.split()
-            if len(parts) != 3:
-                client.send_message(message.chat.id, "Usage: /schedule_all now:<interval_hours>")
-                return
-
-            command, now_str, interval_str = parts
-            if not now_str.startswith('now:') or not interval_str.isdigit():
-                client.send_message(message.chat.id, "Invalid format. Use /schedule_all now:<interval_hours>")
-                return
-            
-            interval_hours = int(interval_str)
-            message_text = ' '.join(parts[2:])
-            schedule_broadcast_all(message_text, interval_hours)
-            client.send_message(message.chat.id, f"Scheduled broadcast to freemium users, groups, and channels every {interval_hours} hours.")
-        except ValueError:
-            client.send_message(message.chat.id, "Invalid input. Please ensure the interval is a number.")
-    else:
-        client.send_message(message.chat.id, "You do not have permission to schedule broadcasts.")
+    """Handle command to schedule recurring broadcasts to all freemium users, groups, and channels."""
+    schedule_from_command(client, message, schedule_broadcast_all, "freemium users, groups, and channels")
 
 @app.on_message(filters.command('list_scheduled') & filters.user(ADMIN_BOT_ID))
 def handle_list_scheduled_jobs(client: Client, message: Message) -> None:
@@ -358,6 +363,31 @@ def handle_user_not_joined(client: Client, message: Message) -> None:
         else:
             client.send_message(message.chat.id, "Access to this bot is restricted until you join the required group or channel.")
 
+@app.on_chat_member_updated()
+def handle_chat_member_updated(client: Client, update: ChatMemberUpdated) -> None:
+    """Drop cached admins of a chat when someone gains or loses admin rights, track the bot's own chats,
+    and update the join-check cache for other members."""
+    if is_admin_change(update):
+        admin_cache.invalidate(update.chat.id)
+    member = update.new_chat_member or update.old_chat_member
+    if member and member.user and member.user.is_self:
+        status = update.new_chat_member.status.value if update.new_chat_member else 'left'
+        track_bot_membership(update.chat.id, update.chat.type.value, status)
+    elif member and member.user:
+        joined = bool(update.new_chat_member) and is_joined_status(update.new_chat_member.status, update.new_chat_member.is_member)
+        membership_cache.update(member.user.id, (update.chat.id, update.chat.username), joined)
+
+@app.on_message((filters.new_chat_members | filters.left_chat_member) & filters.group, group=1)
+def handle_membership_service_message(client: Client, message: Message) -> None:
+    """Keep the join-check cache current from join and leave service messages."""
+    chats = (message.chat.id, message.chat.username)
+    if message.left_chat_member:
+        membership_cache.update(message.left_chat_member.id, chats, False)
+    for user in message.new_chat_members or []:
+        membership_cache.update(user.id, chats, True)
+
 # Start the Pyrogram client
 if __name__ == "__main__":
+    start_scheduler()
+    app.loop.create_task(admin_cache.refresh_forever(lambda: get_segment_store().get('groups') | get_segment_store().get('channels')))
     app.run()
@@ -0,0 +1,165 @@
+import mmap
+import os
+import logging
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, List, Tuple, Union
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+SEGMENTS_DIR = 'segments'
+
+IdBuffer = Union[array, memoryview]
+
+class Audience:
+    """Sorted, de-duplicated set of chat IDs stored as packed int64 (8 bytes per ID)."""
+
+    __slots__ = ('_ids', '_mmap')
+
+    def __init__(self, ids: IdBuffer = None, _mmap: mmap.mmap = None) -> None:
+        # `ids` must already be sorted and unique; use Audience.from_ids() otherwise
+        self._ids = ids if ids is not None else array('q')
+        self._mmap = _mmap
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[Union[int, str]]) -> 'Audience':
+        """Build an audience from any iterable of IDs (ints or numeric strings)."""
+        return cls(array('q', sorted({int(i) for i in ids})))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def __contains__(self, chat_id: int) -> bool:
+        index = bisect_left(self._ids, chat_id)
+        return index < len(self._ids) and self._ids[index] == chat_id
+
+    def __getitem__(self, index: int) -> int:
+        return self._ids[index]
+
+    def index(self, chat_id: int) -> int:
+        """Return the position of an ID (binary search). Raises ValueError if it is not present."""
+        index = bisect_left(self._ids, chat_id)
+        if index < len(self._ids) and self._ids[index] == chat_id:
+            return index
+        raise ValueError(f"{chat_id} is not in the audience")
+
+    def __repr__(self) -> str:
+        return f"Audience({len(self)} ids)"
+
+    def tolist(self) -> List[int]:
+        """Return the IDs as a plain list."""
+        return list(self._ids)
+
+    def nbytes(self) -> int:
+        """Return the size of the ID buffer in bytes."""
+        return len(self._ids) * 8
+
+    def union(self, other: 'Audience') -> 'Audience':
+        """Return IDs present in either audience (linear merge)."""
+        a, b, out = self._ids, other._ids, array('q')
+        i = j = 0
+        while i < len(a) and j < len(b):
+            if a[i] < b[j]:
+                out.append(a[i])
+                i += 1
+            elif a[i] > b[j]:
+                out.append(b[j])
+                j += 1
+            else:
+                out.append(a[i])
+                i += 1
+                j += 1
+        out.extend(a[i:])
+        out.extend(b[j:])
+        return Audience(out)
+
+    def intersection(self, other: 'Audience') -> 'Audience':
+        """Return IDs present in both audiences."""
+        small, large = (self, other) if len(self) <= len(other) else (other, self)
+        return Audience(array('q', (i for i in small._ids if i in large)))
+
+    def difference(self, other: 'Audience') -> 'Audience':
+        """Return IDs in this audience but not in `other`."""
+        a, b, out = self._ids, other._ids, array('q')
+        i = j = 0
+        while i < len(a):
+            while j < len(b) and b[j] < a[i]:
+                j += 1
+            if j >= len(b) or b[j] != a[i]:
+                out.append(a[i])
+            i += 1
+        return Audience(out)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def save(self, file_path: str) -> None:
+        """Write the packed IDs to a binary file atomically (temp file + rename)."""
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(self._ids.tobytes() if isinstance(self._ids, array) else bytes(self._ids))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: str, use_mmap: bool = True) -> 'Audience':
+        """Load an audience file, memory-mapped read-only by default."""
+        if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+            return cls()
+        with open(file_path, 'rb') as file:
+            if not use_mmap:
+                ids = array('q')
+                ids.frombytes(file.read())
+                return cls(ids)
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(memoryview(mapped).cast('q'), _mmap=mapped)
+
+def segment_path(name: str) -> str:
+    """Return the file path of a named audience segment."""
+    return os.path.join(SEGMENTS_DIR, f"{name}.bin")
+
+def segment_delta_path(name: str) -> str:
+    """Return the file path of a segment's change log (applied on top of `<name>.bin`)."""
+    return os.path.join(SEGMENTS_DIR, f"{name}.delta")
+
+def save_segment(name: str, audience: Audience) -> None:
+    """Persist a named audience segment in full, replacing its change log."""
+    os.makedirs(SEGMENTS_DIR, exist_ok=True)
+    audience.save(segment_path(name))
+    # Replaying the old log on the new snapshot would be harmless, so a crash before this is safe
+    if os.path.exists(segment_delta_path(name)):
+        os.unlink(segment_delta_path(name))
+
+def append_segment_delta(name: str, changes: List[Tuple[int, bool]]) -> None:
+    """Append membership changes to a segment's log as packed (ID, present) int64 pairs."""
+    os.makedirs(SEGMENTS_DIR, exist_ok=True)
+    packed = array('q')
+    for member_id, present in changes:
+        packed.append(member_id)
+        packed.append(int(present))
+    with open(segment_delta_path(name), 'ab') as file:
+        file.write(packed.tobytes())
+        file.flush()
+        os.fsync(file.fileno())
+
+def load_segment_delta(name: str) -> List[Tuple[int, bool]]:
+    """Read a segment's change log in order (empty if there is none)."""
+    packed = array('q')
+    try:
+        with open(segment_delta_path(name), 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return []
+    # A torn final record from a crash mid-append is ignored
+    packed.frombytes(data[:len(data) - len(data) % 16])
+    return [(packed[i], bool(packed[i + 1])) for i in range(0, len(packed), 2)]
+
+def load_segment(name: str) -> Audience:
+    """Memory-map a named audience segment (empty if it has never been saved); see load_segment_delta for its log."""
+    return Audience.load(segment_path(name))
@@ -1,6 +1,5 @@
 import logging
 import os
-import json
 import io
 import telebot
 from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
@@ -23,6 +22,7 @@ from broadcast import (
     schedule_user_broadcast, schedule_group_broadcast, schedule_channel_broadcast, 
     schedule_all_broadcast
 )
+from scheduler_service import start_scheduler
 from handlers import (
     start, button, handle_message, set_admin_id, set_user_id, clone_bot, 
     process_payment, payment_callback, total_users, handle_downloader_fb, 
@@ -30,6 +30,8 @@ from handlers import (
     handle_downloader_yt, is_user_allowed, is_user_paid, save_user_data, 
     handle_conversion, generate_random_string, create_category, create_bill, update_config
 )
+from user_registry import get_user_registry
+from outbound_limiter import throttle_client
 from keyboards import get_main_keyboard, get_submenu_keyboard, get_conversion_keyboard, SUBMENU_OPTIONS
 from config import (
     TOKEN as TELEGRAM_BOT_TOKEN, ADMIN_BOT_ID, ADMIN_USER_ID, 
@@ -47,7 +49,7 @@ if not TOKEN:
     exit(1)
 
 # Create the bot instance
-bot = telebot.TeleBot(TOKEN)
+bot = throttle_client(telebot.TeleBot(TOKEN))
 
 def save_auto_approve_group_id(group_id: int) -> None:
     """Save the group ID to a file."""
@@ -86,18 +88,9 @@ def handle_new_chat_member(message: telebot.types.Message) -> None:
         logger.error(f"Error handling new chat member: {e}")
 
 def save_user_data(user_id: int) -> None:
-    """Save user_id to user_data.json."""
+    """Register user_id in the user registry."""
     try:
-        file_path = 'user_data.json'
-        data = {}
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-
-        data[str(user_id)] = {"user_id": user_id}
-
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        get_user_registry().add_user(user_id)
     except Exception as e:
         logger.error(f"Error saving user data: {e}")
 
@@ -244,6 +237,7 @@ def handle_callback_query(call: telebot.types.CallbackQuery) -> None:
 # Run the bot
 if __name__ == "__main__":
     try:
+        start_scheduler()
         bot.polling(none_stop=True)
     except Exception as e:
         logger.error(f"Error running bot: {e}")
@@ -1,29 +1,38 @@
-import json
-import os
-from typing import List
+from typing import Iterable, List, Optional, Union
 from datetime import datetime
-from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.date import DateTrigger
 from pyrogram import Client, filters
-from pyrogram.types import Message
+from pyrogram.types import ChatMemberUpdated, Message
 from config import TOKEN as TELEGRAM_BOT_TOKEN, API_ID, API_HASH, ADMIN_USER_ID, ALLOWED_USER_IDS
+from json_store import load_json
+from user_registry import get_user_registry
+from tier_index import get_tier_index
+from segments import format_segment_sizes, get_segment_store, track_bot_membership
+from outbound_limiter import throttle_client
+from peer_cache import harvest_peers, warm_peers
+from audience import Audience
+from broadcast_engine import BroadcastResult, run_in_client_loop
+from broadcast_content import Content, as_content, build_sender, content_from_command, describe_window, pop_window
+from broadcast_jobs import BroadcastJob, DONE, list_jobs, run_job
+from recipient_health import get_recipient_health
+from broadcast_progress import edit_status, get_progress_registry
+from admin_cache import AdminCache, is_admin_change
+from scheduled_broadcasts import add_broadcast_job, register_runner
+from scheduler_service import start_scheduler
 
 # Initialize Pyrogram Client
-app = Client("broadcast_bot", api_id=API_ID, api_hash=API_HASH, bot_token=TELEGRAM_BOT_TOKEN)
-scheduler = BackgroundScheduler()
-scheduler.start()
+app = harvest_peers(throttle_client(Client("broadcast_bot", api_id=API_ID, api_hash=API_HASH, bot_token=TELEGRAM_BOT_TOKEN)))
+admin_cache = AdminCache(app)
+admin_cache.subscribe(get_segment_store().set_chat_admins)
 
 # Helper Functions
 def load_json_file(file_path: str) -> List[int]:
     """Load a JSON file and return its content as a list."""
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as file:
-            return json.load(file)
-    return []
+    return load_json(file_path, [])
 
 def load_user_data() -> dict:
-    """Load user data from file."""
-    return load_json_file('user_data.json')
+    """Load user data from the user registry."""
+    return get_user_registry().all()
 
 def load_group_ids() -> List[int]:
     """Load group IDs from file."""
@@ -39,158 +48,235 @@ def is_admin(user_id: int) -> bool:
 
 def is_freemium(user_id: int) -> bool:
     """Check if the user is a freemium user."""
-    user_data = load_user_data()
-    return str(user_id) in user_data and user_data[str(user_id)].get('subscription_end') is None
+    return get_tier_index().is_freemium(user_id)
 
 def is_premium(user_id: int) -> bool:
     """Check if the user is a premium user."""
-    user_data = load_user_data()
-    return str(user_id) in user_data and user_data[str(user_id)].get('subscription_end') is not None
+    return get_tier_index().is_premium(user_id)
 
 async def get_admins_of_chat(chat_id: int) -> List[int]:
-    """Retrieve the list of admins for a chat."""
-    try:
-        admins = await app.get_chat_members(chat_id, filter="administrators")
-        return [admin.user.id for admin in admins]
-    except Exception as e:
-        print(f"Failed to get admins of chat {chat_id}: {e}")
-        return []
-
-async def broadcast_message(message_text: str, ids: List[int], entity_type: str) -> None:
-    """Broadcast message to a list of IDs (users, groups, channels)."""
-    for entity_id in ids:
-        try:
-            await app.send_message(chat_id=entity_id, text=message_text)
-        except Exception as e:
-            print(f"Failed to send message to {entity_type} {entity_id}: {e}")
-
-def schedule_broadcast(message_text: str, ids: List[int], entity_type: str, send_time: datetime) -> None:
-    """Schedule a broadcast message."""
-    trigger = DateTrigger(run_date=send_time)
-    job_func = lambda: app.loop.create_task(broadcast_message(message_text, ids, entity_type))
-    scheduler.add_job(job_func, trigger)
-
-def schedule_all_broadcast(message_text: str, send_time: datetime) -> None:
-    """Schedule a broadcast message to all users, groups, and channels."""
-    user_data = load_user_data()
-    freemium_users = [int(uid) for uid in user_data.keys() if is_freemium(int(uid))]
-    group_ids = load_group_ids()
-    channel_ids = load_channel_ids()
+    """Retrieve the list of admins for a chat (cached with a TTL)."""
+    return list(await admin_cache.get(chat_id))
+
+async def freemium_chats(kind: str) -> Audience:
+    """Return the 'groups' or 'channels' segment where at least one admin is a freemium user.
+
+    Expired admin lists are refreshed first; fresh ones cost nothing, so this is normally a segment read.
+    """
+    segment_store = get_segment_store()
+    await admin_cache.prefetch(segment_store.get(kind))
+    return segment_store.freemium_chats(kind)
+
+async def broadcast_message(content: Union[str, Content], ids: Iterable[int], entity_type: str,
+                            status_message: Optional[Message] = None, window: Optional[float] = None) -> BroadcastResult:
+    """Broadcast text or a copied message to a list of IDs (users, groups, channels) as a resumable job.
+
+    If `status_message` is given it is edited periodically with the live progress. With `window`
+    (seconds) the sends are spread evenly over that period.
+    """
+    job = BroadcastJob.create(as_content(content), ids, entity_type)
+    await warm_peers(app, job.pending_ids())
+    on_progress = edit_status(status_message) if status_message else None
+    return await run_job(job, await build_sender(app, job.content), on_progress=on_progress, window=window)
+
+async def segment_audience(segment: str) -> Audience:
+    """Resolve a segment name to recipients; freemium chat segments refresh expired admin lists first."""
+    if segment in ('freemium_groups', 'freemium_channels'):
+        return await freemium_chats(segment[len('freemium_'):])
+    return get_segment_store().get(segment)
+
+def run_scheduled_broadcast(segment: str, content: Content, entity_type: str, window: Optional[float]) -> None:
+    """Scheduler runner: resolve the segment at fire time and broadcast on the client's event loop."""
+    async def run() -> None:
+        await broadcast_message(content, await segment_audience(segment), entity_type, window=window)
+
+    run_in_client_loop(app, run())
 
+register_runner('broadcast', run_scheduled_broadcast, lambda: bool(app.is_initialized))
+
+def schedule_broadcast(message_text: str, segment: str, entity_type: str, send_time: datetime,
+                       window: Optional[float] = None) -> None:
+    """Schedule a broadcast to a segment, optionally spread over `window` seconds from `send_time`."""
+    add_broadcast_job('broadcast', segment, as_content(message_text), entity_type,
+                      DateTrigger(run_date=send_time), window)
+
+def schedule_broadcast_all(message_text: str, send_time: datetime, window: Optional[float] = None) -> None:
+    """Schedule a broadcast message to all users, groups, and channels."""
     # Schedule broadcasts for users
-    schedule_broadcast(message_text, freemium_users, "user", send_time)
+    schedule_broadcast(message_text, 'freemium', "user", send_time, window)
 
     # Schedule broadcasts for groups where bot admin is freemium
-    freemium_groups = [gid for gid in group_ids if any(app.loop.run_until_complete(is_freemium(admin_id)) for admin_id in app.loop.run_until_complete(get_admins_of_chat(gid)))]
-    schedule_broadcast(message_text, freemium_groups, "group", send_time)
+    schedule_broadcast(message_text, 'freemium_groups', "group", send_time, window)
 
     # Schedule broadcasts for channels where bot admin is freemium
-    freemium_channels = [cid for cid in channel_ids if any(app.loop.run_until_complete(is_freemium(admin_id)) for admin_id in app.loop.run_until_complete(get_admins_of_chat(cid)))]
-    schedule_broadcast(message_text, freemium_channels, "channel", send_time)
+    schedule_broadcast(message_text, 'freemium_channels', "channel", send_time, window)
 
 # Command Handlers
 @app.on_message(filters.command('broadcast_user') & filters.user(ADMIN_USER_ID))
 async def broadcast_to_user(client: Client, message: Message) -> None:
     """Broadcast message to all users."""
-    message_text = ' '.join(message.text.split()[1:])
-    user_data = load_user_data()
-    freemium_users = [int(uid) for uid in user_data.keys() if is_freemium(int(uid))]
-    await broadcast_message(message_text, freemium_users, "user")
-    await message.reply_text("Broadcast to all users completed.")
+    content = content_from_command(message)
+    freemium_users = get_segment_store().get('freemium')
+    status = await message.reply_text("Broadcast to all users started.")
+    result = await broadcast_message(content, freemium_users, "user", status)
+    await status.edit_text(f"Broadcast to all users completed: {result.summary()}")
 
 @app.on_message(filters.command('broadcast_group') & filters.user(ADMIN_USER_ID))
 async def broadcast_to_group(client: Client, message: Message) -> None:
     """Broadcast message to groups."""
-    message_text = ' '.join(message.text.split()[1:])
-    group_ids = load_group_ids()
-    freemium_groups = [gid for gid in group_ids if any(await is_freemium(admin_id) for admin_id in await get_admins_of_chat(gid))]
-    await broadcast_message(message_text, freemium_groups, "group")
-    await message.reply_text("Broadcast to all groups completed.")
+    content = content_from_command(message)
+    freemium_groups = await freemium_chats('groups')
+    status = await message.reply_text("Broadcast to all groups started.")
+    result = await broadcast_message(content, freemium_groups, "group", status)
+    await status.edit_text(f"Broadcast to all groups completed: {result.summary()}")
 
 @app.on_message(filters.command('broadcast_channel') & filters.user(ADMIN_USER_ID))
 async def broadcast_to_channel(client: Client, message: Message) -> None:
     """Broadcast message to channels."""
-    message_text = ' '.join(message.text.split()[1:])
-    channel_ids = load_channel_ids()
-    freemium_channels = [cid for cid in channel_ids if any(await is_freemium(admin_id) for admin_id in await get_admins_of_chat(cid))]
-    await broadcast_message(message_text, freemium_channels, "channel")
-    await message.reply_text("Broadcast to all channels completed.")
+    content = content_from_command(message)
+    freemium_channels = await freemium_chats('channels')
+    status = await message.reply_text("Broadcast to all channels started.")
+    result = await broadcast_message(content, freemium_channels, "channel", status)
+    await status.edit_text(f"Broadcast to all channels completed: {result.summary()}")
 
 @app.on_message(filters.command('broadcast_all') & filters.user(ADMIN_USER_ID))
 async def broadcast_to_all(client: Client, message: Message) -> None:
     """Broadcast message to all users, groups, and channels."""
-    message_text = ' '.join(message.text.split()[1:])
-    user_data = load_user_data()
-    freemium_users = [int(uid) for uid in user_data.keys() if is_freemium(int(uid))]
-    group_ids = load_group_ids()
-    channel_ids = load_channel_ids()
+    content = content_from_command(message)
+    freemium_users = get_segment_store().get('freemium')
+    status = await message.reply_text("Broadcast to all users, groups, and channels started.")
 
     # Broadcast to users
-    await broadcast_message(message_text, freemium_users, "user")
+    results = [await broadcast_message(content, freemium_users, "user", status)]
 
     # Broadcast to groups
-    freemium_groups = [gid for gid in group_ids if any(await is_freemium(admin_id) for admin_id in await get_admins_of_chat(gid))]
-    await broadcast_message(message_text, freemium_groups, "group")
+    freemium_groups = await freemium_chats('groups')
+    results.append(await broadcast_message(content, freemium_groups, "group", status))
 
     # Broadcast to channels
-    freemium_channels = [cid for cid in channel_ids if any(await is_freemium(admin_id) for admin_id in await get_admins_of_chat(cid))]
-    await broadcast_message(message_text, freemium_channels, "channel")
+    freemium_channels = await freemium_chats('channels')
+    results.append(await broadcast_message(content, freemium_channels, "channel", status))
+
+    report = "\n".join(f"{result.entity_type}: {result.summary()}" for result in results)
+    await status.edit_text(f"Broadcast to all users, groups, and channels completed.\n{report}")
+
+@app.on_message(filters.command('segments') & filters.user(ADMIN_USER_ID))
+async def list_segments(client: Client, message: Message) -> None:
+    """Show the size of every broadcast audience segment."""
+    await message.reply_text(f"Broadcast segments:\n{format_segment_sizes()}")
 
-    await message.reply_text("Broadcast to all users, groups, and channels completed.")
+@app.on_message(filters.command('recipient_health') & filters.user(ADMIN_USER_ID))
+async def show_recipient_health(client: Client, message: Message) -> None:
+    """Report how many dead recipients are pruned from broadcasts, by reason."""
+    await message.reply_text(f"Pruned recipients:\n{get_recipient_health().report()}")
+
+@app.on_message(filters.command('broadcast_status') & filters.user(ADMIN_USER_ID))
+async def broadcast_status(client: Client, message: Message) -> None:
+    """Show live progress of running broadcasts (sent/failed/remaining, rate, FloodWait, ETA)."""
+    await message.reply_text(get_progress_registry().report())
+
+@app.on_message(filters.command('broadcast_resume') & filters.user(ADMIN_USER_ID))
+async def resume_broadcast(client: Client, message: Message) -> None:
+    """Resume an interrupted broadcast job from its last checkpoint."""
+    parts = message.text.split()
+    if len(parts) != 2:
+        unfinished = "\n".join(
+            f"{job['job_id']} ({job['entity_type']}, {job['cursor']}/{job['total']})" for job in list_jobs(unfinished_only=True)
+        )
+        await message.reply_text(f"Usage: /broadcast_resume <job_id>\nUnfinished broadcasts:\n{unfinished or 'None'}")
+        return
+    job = BroadcastJob.load(parts[1])
+    if job is None:
+        await message.reply_text(f"No broadcast job found with ID {parts[1]}.")
+        return
+    if job.status == DONE:
+        await message.reply_text(f"Broadcast {job.job_id} has already completed.")
+        return
+    if not job.lock():
+        await message.reply_text(f"Broadcast {job.job_id} is still running.")
+        return
+    try:
+        status = await message.reply_text(f"Resuming broadcast {job.job_id}: {job.remaining()} recipients left.")
+        await warm_peers(app, job.pending_ids())
+        result = await run_job(job, await build_sender(app, job.content), on_progress=edit_status(status))
+    finally:
+        job.release()
+    await status.edit_text(f"Broadcast {job.job_id} completed: {result.summary()}")
 
 @app.on_message(filters.command('schedule_user') & filters.user(ADMIN_USER_ID))
 async def schedule_user_broadcast(client: Client, message: Message) -> None:
     """Schedule broadcast message to all users."""
     try:
         _, datetime_str, *message_parts = message.text.split()
+        window, message_parts = pop_window(message_parts)
         message_text = ' '.join(message_parts)
         send_time = datetime.fromisoformat(datetime_str)
-        user_data = load_user_data()
-        freemium_users = [int(uid) for uid in user_data.keys() if is_freemium(int(uid))]
-        schedule_broadcast(message_text, freemium_users, "user", send_time)
-        await message.reply_text(f"Scheduled broadcast to all users at {send_time}.")
+        schedule_broadcast(message_text, 'freemium', "user", send_time, window)
+        await message.reply_text(f"Scheduled broadcast to all users at {send_time}{describe_window(window)}.")
     except ValueError:
-        await message.reply_text("Invalid date format. Please use ISO format (e.g., 2024-09-01T12:00:00).")
+        await message.reply_text(
+            "Invalid date format. Please use ISO format (e.g., 2024-09-01T12:00:00), optionally followed by window=30m."
+        )
 
 @app.on_message(filters.command('schedule_group') & filters.user(ADMIN_USER_ID))
 async def schedule_group_broadcast(client: Client, message: Message) -> None:
     """Schedule broadcast message to all groups."""
     try:
         _, datetime_str, *message_parts = message.text.split()
+        window, message_parts = pop_window(message_parts)
         message_text = ' '.join(message_parts)
         send_time = datetime.fromisoformat(datetime_str)
-        group_ids = load_group_ids()
-        freemium_groups = [gid for gid in group_ids if any(await is_freemium(admin_id) for admin_id in await get_admins_of_chat(gid))]
-        schedule_broadcast(message_text, freemium_groups, "group", send_time)
-        await message.reply_text(f"Scheduled broadcast to all groups at {send_time}.")
+        schedule_broadcast(message_text, 'freemium_groups', "group", send_time, window)
+        await message.reply_text(f"Scheduled broadcast to all groups at {send_time}{describe_window(window)}.")
     except ValueError:
-        await message.reply_text("Invalid date format. Please use ISO format (e.g., 2024-09-01T12:00:00).")
+        await message.reply_text(
+            "Invalid date format. Please use ISO format (e.g., 2024-09-01T12:00:00), optionally followed by window=30m."
+        )
 
 @app.on_message(filters.command('schedule_channel') & filters.user(ADMIN_USER_ID))
 async def schedule_channel_broadcast(client: Client, message: Message) -> None:
     """Schedule broadcast message to all channels."""
     try:
         _, datetime_str, *message_parts = message.text.split()
+        window, message_parts = pop_window(message_parts)
         message_text = ' '.join(message_parts)
         send_time = datetime.fromisoformat(datetime_str)
-        channel_ids = load_channel_ids()
-        freemium_channels = [cid for cid in channel_ids if any(await is_freemium(admin_id) for admin_id in await get_admins_of_chat(cid))]
-        schedule_broadcast(message_text, freemium_channels, "channel", send_time)
-        await message.reply_text(f"Scheduled broadcast to all channels at {send_time}.")
+        schedule_broadcast(message_text, 'freemium_channels', "channel", send_time, window)
+        await message.reply_text(f"Scheduled broadcast to all channels at {send_time}{describe_window(window)}.")
     except ValueError:
-        await message.reply_text("Invalid date format. Please use ISO format (e.g., 2024-09-01T12:00:00).")
+        await message.reply_text(
+            "Invalid date format. Please use ISO format (e.g., 2024-09-01T12:00:00), optionally followed by window=30m."
+        )
 
 @app.on_message(filters.command('schedule_all') & filters.user(ADMIN_USER_ID))
 async def schedule_all_broadcast(client: Client, message: Message) -> None:
     """Schedule a broadcast message to all users, groups, and channels."""
     try:
         _, datetime_str, *message_parts = message.text.split()
+        window, message_parts = pop_window(message_parts)
         message_text = ' '.join(message_parts)
         send_time = datetime.fromisoformat(datetime_str)
-        schedule_all_broadcast(message_text, send_time)
-        await message.reply_text(f"Scheduled broadcast to all users, groups, and channels at {send_time}.")
+        schedule_broadcast_all(message_text, send_time, window)
+        await message.reply_text(
+            f"Scheduled broadcast to all users, groups, and channels at {send_time}{describe_window(window)}."
+        )
     except ValueError:
-        await message.reply_text("Invalid date format. Please use ISO format (e.g., 2024-09-01T12:00:00).")
+        await message.reply_text(
+            "Invalid date format. Please use ISO format (e.g., 2024-09-01T12:00:00), optionally followed by window=30m."
+        )
+
+@app.on_chat_member_updated()
+async def handle_chat_member_updated(client: Client, update: ChatMemberUpdated) -> None:
+    """Drop cached admins of a chat when someone gains or loses admin rights, and track the bot's own chats."""
+    if is_admin_change(update):
+        admin_cache.invalidate(update.chat.id)
+    member = update.new_chat_member or update.old_chat_member
+    if member and member.user and member.user.is_self:
+        status = update.new_chat_member.status.value if update.new_chat_member else 'left'
+        track_bot_membership(update.chat.id, update.chat.type.value, status)
 
 # Run the bot
-app.run()
+if __name__ == "__main__":
+    start_scheduler()
+    app.loop.create_task(admin_cache.refresh_forever(lambda: get_segment_store().get('groups') | get_segment_store().get('channels')))
+    app.run()
@@ -0,0 +1,74 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+from pyrogram import Client, raw, types
+from pyrogram.enums import ParseMode
+from pyrogram.types import Message
+from broadcast_engine import SendFunc
+from peer_cache import resolving_sender
+
+# Kandungan siaran disimpan bersama kerja siaran supaya ia boleh disambung semula:
+#   {'message_text': str}                               - teks biasa (markup dihuraikan sekali sahaja)
+#   {'from_chat_id': int, 'message_id': int}            - mesej sedia ada disalin (media dimuat naik sekali)
+Content = Dict[str, Any]
+
+# Pilihan `window=30m` bagi arahan jadual: siaran diratakan sepanjang tempoh ini
+WINDOW_PATTERN = re.compile(r'^window=(\d+(?:\.\d+)?)([smh]?)$')
+DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600}
+
+def content_from_command(message: Message) -> Content:
+    """Return what a /broadcast_* command should send: the message it replies to, or the text after the command."""
+    if message.reply_to_message:
+        return {'from_chat_id': message.chat.id, 'message_id': message.reply_to_message.id}
+    return {'message_text': ' '.join(message.text.split()[1:])}
+
+def pop_window(parts: List[str]) -> Tuple[Optional[float], List[str]]:
+    """Split a leading `window=<n>[s|m|h]` option off command arguments. Returns (seconds or None, rest)."""
+    match = WINDOW_PATTERN.match(parts[0]) if parts else None
+    if match is None:
+        return None, parts
+    return float(match.group(1)) * DURATION_UNITS[match.group(2)], parts[1:]
+
+def describe_window(window: Optional[float]) -> str:
+    """Suffix for schedule confirmations, e.g. ' spread over 30 minutes'."""
+    return f" spread over {window / 60:g} minutes" if window else ""
+
+def as_content(content: Union[str, Content]) -> Content:
+    """Accept either plain text or a content dict."""
+    return {'message_text': content} if isinstance(content, str) else content
+
+def describe(content: Content) -> str:
+    """Short human-readable description of broadcast content."""
+    if 'message_id' in content:
+        return f"copy of message {content['message_id']}"
+    return content.get('message_text', '')[:50]
+
+def message_entities(client: Client, raw_entities: Optional[List[Any]]) -> Optional[List[types.MessageEntity]]:
+    """Convert the parser's raw TL entities into the MessageEntity objects send_message accepts."""
+    entities = []
+    for entity in raw_entities or []:
+        parsed = types.MessageEntity._parse(client, entity, {})
+        if isinstance(entity, raw.types.InputMessageEntityMentionName):
+            # The parser already resolved the mentioned user; write() only needs its ID to resolve it again
+            parsed.user = types.User(id=entity.user_id.user_id, client=client)
+        entities.append(parsed)
+    return entities or None
+
+async def build_sender(client: Client, content: Content) -> SendFunc:
+    """Prepare a per-recipient send function, doing all per-message work once up front.
+
+    Replied-to messages are sent with copy_message, so Telegram reuses the uploaded media
+    (file_id) and the original entities for every recipient. Text is parsed into entities once and
+    sent with parsing disabled, instead of re-parsing the markup for each recipient.
+    A recipient the session cannot address yet is warmed and retried once (see resolving_sender).
+    """
+    if 'message_id' in content:
+        from_chat_id, message_id = content['from_chat_id'], content['message_id']
+        return resolving_sender(client, lambda chat_id: client.copy_message(
+            chat_id=chat_id, from_chat_id=from_chat_id, message_id=message_id
+        ))
+
+    parsed = await client.parser.parse(content['message_text'], client.parse_mode)
+    text, entities = parsed['message'], message_entities(client, parsed['entities'])
+    return resolving_sender(client, lambda chat_id: client.send_message(
+        chat_id=chat_id, text=text, entities=entities, parse_mode=ParseMode.DISABLED
+    ))
@@ -0,0 +1,249 @@
+import asyncio
+import random
+import time
+import logging
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Set, Tuple
+from outbound_limiter import BULK, current_lane, flood_wait_seconds
+from broadcast_progress import get_progress_registry
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = 20
+MAX_RETRIES = 3
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+MAX_RECORDED_ERRORS = 100
+# Mesej status disunting paling kerap sekali setiap tempoh ini (had suntingan Telegram)
+PROGRESS_INTERVAL_SECONDS = 5.0
+
+# Ralat yang tidak akan berjaya jika dicuba semula (penerima menyekat bot, akaun dipadam, chat tidak sah).
+# PeerIdInvalid tidak termasuk: ia hanya bermakna sesi belum mempunyai access hash (lihat peer_cache.resolving_sender)
+PERMANENT_ERRORS = {
+    'UserIsBlocked', 'InputUserDeactivated', 'UserDeactivated', 'UserDeactivatedBan', 'UnresolvedPeer',
+    'ChatWriteForbidden', 'ChannelPrivate', 'ChannelInvalid', 'ChatIdInvalid', 'ChatAdminRequired', 'UserIsBot',
+}
+
+SendFunc = Callable[[int], Awaitable[Any]]
+ResultCallback = Callable[[int, bool, Optional[BaseException]], None]
+ProgressCallback = Callable[['BroadcastResult'], Awaitable[Any]]
+
+def is_permanent_error(error: BaseException) -> bool:
+    """Check whether retrying a send can never succeed."""
+    if type(error).__name__ in PERMANENT_ERRORS:
+        return True
+    # pyTelegramBotAPI: 400/403 bermaksud chat tidak sah atau bot disekat
+    return getattr(error, 'error_code', None) in (400, 403)
+
+class BroadcastResult:
+    """Counters and throughput of one broadcast run."""
+
+    def __init__(self, entity_type: str, expected: Optional[int] = None, concurrency: int = CONCURRENCY) -> None:
+        self.entity_type = entity_type
+        self.expected = expected
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.flood_waits = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.errors: List[Tuple[int, str]] = []
+        self.job_id: Optional[str] = None
+        self.pruned = 0
+        self.flood_wait_until = 0.0
+
+    @property
+    def total(self) -> int:
+        return self.sent + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rate(self) -> float:
+        """Completed sends per second."""
+        return self.total / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """Recipients not yet finished in this run, if the audience size is known."""
+        return max(self.expected - self.total, 0) if self.expected is not None else None
+
+    @property
+    def flood_wait(self) -> float:
+        """Seconds left on the current FloodWait pause (0 when sending)."""
+        return max(self.flood_wait_until - time.monotonic(), 0.0) if self.finished is None else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until the run finishes at the current rate."""
+        remaining = self.remaining
+        if remaining is None or self.rate <= 0:
+            return None
+        return remaining / self.rate + self.flood_wait
+
+    def progress(self) -> str:
+        """Multi-line live status, used for the edited status message and /broadcast_status."""
+        prefix = f"[job {self.job_id}] " if self.job_id else ""
+        remaining = self.remaining
+        eta = self.eta
+        lines = [
+            f"{prefix}Broadcast to {self.entity_type}" + (" (finished)" if self.finished else ""),
+            f"Sent: {self.sent} | Failed: {self.failed} | Remaining: {'?' if remaining is None else remaining}",
+            f"Rate: {self.rate:.1f} msg/s | In flight: {self.in_flight}/{self.concurrency} | Retries: {self.retries}",
+            f"FloodWait: {self.flood_waits} total" + (f", paused {self.flood_wait:.0f}s" if self.flood_wait else ""),
+            f"Elapsed: {self.elapsed:.0f}s | ETA: {'?' if eta is None else f'{eta:.0f}s'}",
+        ]
+        return "\n".join(lines)
+
+    def summary(self) -> str:
+        prefix = f"[job {self.job_id}] " if self.job_id else ""
+        pruned = f", {self.pruned} dead recipients skipped" if self.pruned else ""
+        return (f"{prefix}{self.sent} sent, {self.failed} failed in {self.elapsed:.1f}s "
+                f"({self.rate:.1f} msg/s, {self.flood_waits} FloodWait{pruned})")
+
+class BroadcastEngine:
+    """Send one message to many chats with a bounded number of sends in flight.
+
+    FloodWait pauses the whole pipeline for the requested time; transient errors are retried
+    with exponential backoff and jitter; permanent errors fail the recipient immediately.
+    Sends go out on the outbound limiter's bulk lane. With a `window` (seconds) the sends are
+    spread evenly over it at a steady rate instead of going out as fast as the limiter allows.
+    """
+
+    def __init__(self, send: SendFunc, concurrency: int = CONCURRENCY, max_retries: int = MAX_RETRIES,
+                 base_backoff: float = BASE_BACKOFF_SECONDS, on_result: Optional[ResultCallback] = None,
+                 on_progress: Optional[ProgressCallback] = None,
+                 progress_interval: float = PROGRESS_INTERVAL_SECONDS, window: Optional[float] = None) -> None:
+        self.send = send
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.on_result = on_result
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+        self.window = window
+        self._resume: Optional[asyncio.Event] = None
+        self._paused_until = 0.0
+
+    async def _pause(self, seconds: float, result: BroadcastResult) -> None:
+        """Hold every worker until a FloodWait has passed; overlapping waits extend the pause."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        result.flood_wait_until = self._paused_until
+        self._resume.clear()
+        while self._paused_until > time.monotonic():
+            await asyncio.sleep(self._paused_until - time.monotonic())
+        self._resume.set()
+
+    async def _send_one(self, chat_id: int, result: BroadcastResult) -> None:
+        error: Optional[BaseException] = None
+        attempt = 0
+        while True:
+            await self._resume.wait()
+            try:
+                await self.send(chat_id)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                wait = flood_wait_seconds(e)
+                if wait is not None:
+                    # FloodWait tidak dikira sebagai cubaan; ia hanya bermakna kita terlalu laju.
+                    # Pengehad keluar sudah merekodkannya dan tidak mencuba semula penghantaran lorong pukal.
+                    result.flood_waits += 1
+                    await self._pause(wait, result)
+                    continue
+                if is_permanent_error(e) or attempt >= self.max_retries:
+                    break
+                attempt += 1
+                result.retries += 1
+                delay = min(MAX_BACKOFF_SECONDS, self.base_backoff * 2 ** (attempt - 1))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+        if error is None:
+            result.sent += 1
+        else:
+            result.failed += 1
+            if len(result.errors) < MAX_RECORDED_ERRORS:
+                result.errors.append((chat_id, f"{type(error).__name__}: {error}"))
+        if self.on_result:
+            try:
+                self.on_result(chat_id, error is None, error)
+            except Exception as e:
+                logger.error(f"Ralat dalam panggilan balik keputusan siaran: {e}")
+
+    async def _report_progress(self, result: BroadcastResult) -> None:
+        """Call `on_progress` every `progress_interval` seconds until the run is cancelled."""
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            try:
+                await self.on_progress(result)
+            except Exception as e:
+                logger.warning(f"Ralat mengemas kini status siaran: {e}")
+
+    async def run(self, ids: Iterable[int], entity_type: str = "user", expected: Optional[int] = None,
+                  job_id: Optional[str] = None) -> BroadcastResult:
+        """Send to every ID and return the run's counters once all sends have finished.
+
+        `expected` is the number of IDs (when `ids` is lazy) so progress can show remaining and ETA,
+        and is required for pacing over a window.
+        """
+        if expected is None and hasattr(ids, '__len__'):
+            expected = len(ids)
+        result = BroadcastResult(entity_type, expected, self.concurrency)
+        result.job_id = job_id
+        self._resume = asyncio.Event()
+        self._resume.set()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks: Set[asyncio.Task] = set()
+        registry = get_progress_registry()
+        registry.start(result)
+        # Broadcast sends (and the tasks created below) use the bulk lane so interactive replies go first
+        lane_token = current_lane.set(BULK)
+        reporter = asyncio.ensure_future(self._report_progress(result)) if self.on_progress else None
+        # Time-smeared run: one send every `pace` seconds, restarted from now after a FloodWait pause
+        pace = self.window / expected if self.window and expected else 0.0
+        next_start = time.monotonic()
+
+        async def worker(chat_id: int) -> None:
+            result.in_flight += 1
+            try:
+                await self._send_one(chat_id, result)
+            finally:
+                result.in_flight -= 1
+                semaphore.release()
+
+        try:
+            # IDs are pulled lazily so only `concurrency` tasks exist at once, whatever the audience size
+            for chat_id in ids:
+                if pace:
+                    next_start = max(next_start, time.monotonic())
+                    await asyncio.sleep(next_start - time.monotonic())
+                    next_start += pace
+                await semaphore.acquire()
+                task = asyncio.ensure_future(worker(chat_id))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            result.finished = time.monotonic()
+            if reporter is not None:
+                reporter.cancel()
+            registry.finish(result)
+            current_lane.reset(lane_token)
+        logger.info(f"Broadcast to {entity_type}: {result.summary()}")
+        return result
+
+async def broadcast(send: SendFunc, ids: Iterable[int], entity_type: str = "user", **options: Any) -> BroadcastResult:
+    """Run a broadcast with a fresh engine."""
+    return await BroadcastEngine(send, **options).run(ids, entity_type)
+
+def run_in_client_loop(client: Any, coroutine: Awaitable[Any]) -> Any:
+    """Run a coroutine on a Pyrogram client's event loop from synchronous code and wait for it."""
+    loop = client.loop
+    if loop.is_running():
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+    return loop.run_until_complete(coroutine)
@@ -0,0 +1,211 @@
+import fcntl
+import os
+import time
+import uuid
+import logging
+from datetime import datetime
+from typing import IO, Any, Dict, Iterator, List, Optional
+from audience import Audience
+from broadcast_engine import BroadcastEngine, BroadcastResult, SendFunc, is_permanent_error
+from json_store import load_json, save_json
+from segments import record_delivery
+from recipient_health import get_recipient_health
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = 'broadcast_jobs'
+CHECKPOINT_INTERVAL_SECONDS = 5.0
+CHECKPOINT_EVERY = 500
+
+RUNNING = 'running'
+DONE = 'done'
+INCOMPLETE = 'incomplete'
+
+def _write_bytes(file_path: str, data: bytes) -> None:
+    """Atomically replace a binary file (temp file + fsync + rename)."""
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, file_path)
+
+class BroadcastJob:
+    """A persisted broadcast: message, audience snapshot and a bitmap of finished recipients.
+
+    On disk under `broadcast_jobs/<job_id>/`: meta.json (content and counters), audience.bin (packed sorted IDs) and
+    done.bin (one bit per audience position). `cursor` is the first position not yet finished,
+    so a resumed run skips the finished prefix without reading the bitmap. A run holds run.lock,
+    so the same job is never sent twice at once, even from another process.
+    """
+
+    def __init__(self, job_id: str, meta: Dict[str, Any], audience: Audience, done: bytearray) -> None:
+        self.job_id = job_id
+        self.meta = meta
+        self.audience = audience
+        self.done = done
+        self._unsaved = 0
+        self._last_checkpoint = time.monotonic()
+        self._lock_file: Optional[IO] = None
+
+    @staticmethod
+    def directory(job_id: str) -> str:
+        return os.path.join(JOBS_DIR, job_id)
+
+    @classmethod
+    def create(cls, content: Dict[str, Any], ids: Any, entity_type: str, **extra: Any) -> 'BroadcastJob':
+        """Snapshot the audience and persist a new job. `content` is the text or message reference to send."""
+        job_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        # Recipients known to be dead are left out of the snapshot (they are re-probed once their backoff passes)
+        try:
+            audience, pruned = get_recipient_health().prune(ids)
+        except (TypeError, ValueError):
+            raise ValueError(f"A {entity_type} broadcast audience must contain numeric chat IDs only.")
+        meta = {
+            'job_id': job_id,
+            'entity_type': entity_type,
+            'content': content,
+            'created_at': datetime.now().isoformat(),
+            'status': RUNNING,
+            'total': len(audience),
+            'cursor': 0,
+            'sent': 0,
+            'failed': 0,
+            'pruned': pruned,
+            **extra,
+        }
+        os.makedirs(cls.directory(job_id), exist_ok=True)
+        audience.save(os.path.join(cls.directory(job_id), 'audience.bin'))
+        job = cls(job_id, meta, audience, bytearray((len(audience) + 7) // 8))
+        job.checkpoint()
+        return job
+
+    @classmethod
+    def load(cls, job_id: str) -> Optional['BroadcastJob']:
+        """Load a job from its last checkpoint, or None if it does not exist."""
+        directory = cls.directory(os.path.basename(job_id))
+        meta = load_json(os.path.join(directory, 'meta.json'), None)
+        if meta is None:
+            return None
+        audience = Audience.load(os.path.join(directory, 'audience.bin'))
+        done = bytearray((len(audience) + 7) // 8)
+        done_path = os.path.join(directory, 'done.bin')
+        if os.path.exists(done_path):
+            with open(done_path, 'rb') as file:
+                data = file.read()
+            done[:len(data)] = data[:len(done)]
+        return cls(meta['job_id'], meta, audience, done)
+
+    def lock(self) -> bool:
+        """Take the job's run lock until release(). Returns False if another run holds it."""
+        if self._lock_file is not None:
+            return True
+        lock_file = open(os.path.join(self.directory(self.job_id), 'run.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def release(self) -> None:
+        """Release the run lock (closing the file drops the flock)."""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    @property
+    def content(self) -> Dict[str, Any]:
+        return self.meta['content']
+
+    @property
+    def entity_type(self) -> str:
+        return self.meta['entity_type']
+
+    @property
+    def status(self) -> str:
+        return self.meta['status']
+
+    def is_done(self, index: int) -> bool:
+        return bool(self.done[index >> 3] & (1 << (index & 7)))
+
+    def pending_ids(self) -> Iterator[int]:
+        """Yield recipients not yet finished, starting at the checkpointed cursor."""
+        for index in range(self.meta['cursor'], len(self.audience)):
+            if not self.is_done(index):
+                yield self.audience[index]
+
+    def remaining(self) -> int:
+        return sum(1 for index in range(self.meta['cursor'], len(self.audience)) if not self.is_done(index))
+
+    def record(self, chat_id: int, ok: bool, error: Optional[BaseException]) -> None:
+        """Engine callback: mark sent and permanently failed recipients; transient failures stay pending."""
+        if ok:
+            self.meta['sent'] += 1
+        else:
+            self.meta['failed'] += 1
+        if ok or is_permanent_error(error):
+            index = self.audience.index(chat_id)
+            self.done[index >> 3] |= 1 << (index & 7)
+        self._unsaved += 1
+        if self._unsaved >= CHECKPOINT_EVERY or time.monotonic() - self._last_checkpoint >= CHECKPOINT_INTERVAL_SECONDS:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        """Persist the bitmap and metadata so a restart can resume from here."""
+        cursor = self.meta['cursor']
+        while cursor < len(self.audience) and self.is_done(cursor):
+            cursor += 1
+        self.meta['cursor'] = cursor
+        self.meta['updated_at'] = datetime.now().isoformat()
+        directory = self.directory(self.job_id)
+        try:
+            _write_bytes(os.path.join(directory, 'done.bin'), bytes(self.done))
+            save_json(os.path.join(directory, 'meta.json'), self.meta)
+        except Exception as e:
+            logger.error(f"Ralat menyimpan checkpoint siaran {self.job_id}: {e}")
+        self._unsaved = 0
+        self._last_checkpoint = time.monotonic()
+
+    def finish(self) -> None:
+        """Write the final checkpoint, marking the job done if every recipient is finished."""
+        self.meta['status'] = DONE if self.remaining() == 0 else INCOMPLETE
+        self.checkpoint()
+
+def list_jobs(unfinished_only: bool = False) -> List[Dict[str, Any]]:
+    """Return the metadata of saved jobs, newest first."""
+    if not os.path.isdir(JOBS_DIR):
+        return []
+    jobs = []
+    for job_id in sorted(os.listdir(JOBS_DIR), reverse=True):
+        meta = load_json(os.path.join(JOBS_DIR, job_id, 'meta.json'), None)
+        if meta and (not unfinished_only or meta.get('status') != DONE):
+            jobs.append(meta)
+    return jobs
+
+async def run_job(job: BroadcastJob, send: SendFunc, **options: Any) -> BroadcastResult:
+    """Send a job's pending recipients, checkpointing progress, and return this run's counters.
+
+    Raises RuntimeError if the job is already being sent by another run.
+    """
+    if not job.lock():
+        raise RuntimeError(f"Broadcast {job.job_id} is already running.")
+    job.meta['status'] = RUNNING
+    health = get_recipient_health()
+
+    def on_result(chat_id: int, ok: bool, error: Optional[BaseException]) -> None:
+        job.record(chat_id, ok, error)
+        health.record(chat_id, ok, error)
+        record_delivery(chat_id, ok, error)
+
+    engine = BroadcastEngine(send, on_result=on_result, **options)
+    try:
+        result = await engine.run(job.pending_ids(), job.entity_type, expected=job.remaining(), job_id=job.job_id)
+    finally:
+        job.finish()
+        health.flush()
+        job.release()
+    result.pruned = job.meta.get('pruned', 0)
+    return result
@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from broadcast_engine import BroadcastResult
+
+# Bilangan siaran yang telah selesai yang masih dipaparkan oleh /broadcast_status
+RECENT_RUNS = 5
+
+class ProgressRegistry:
+    """In-memory view of running broadcasts (and the last few finished ones) for /broadcast_status.
+
+    Entries are the live `BroadcastResult` objects the engine updates, so reading the registry
+    always shows current counters without any extra bookkeeping in the send path.
+    """
+
+    def __init__(self, recent: int = RECENT_RUNS) -> None:
+        self._lock = threading.Lock()
+        self._active: Dict[int, 'BroadcastResult'] = OrderedDict()
+        self._recent: Deque['BroadcastResult'] = deque(maxlen=recent)
+
+    def start(self, result: 'BroadcastResult') -> None:
+        with self._lock:
+            self._active[id(result)] = result
+
+    def finish(self, result: 'BroadcastResult') -> None:
+        with self._lock:
+            if self._active.pop(id(result), None) is not None:
+                self._recent.appendleft(result)
+
+    def active(self) -> List['BroadcastResult']:
+        with self._lock:
+            return list(self._active.values())
+
+    def recent(self) -> List['BroadcastResult']:
+        with self._lock:
+            return list(self._recent)
+
+    def report(self) -> str:
+        """Human-readable status of every running broadcast and the most recent finished ones."""
+        active, recent = self.active(), self.recent()
+        if not active and not recent:
+            return "No broadcasts have run since the bot started."
+        sections = [f"Running ({len(active)}):" if active else "No broadcast is running."]
+        sections.extend(result.progress() for result in active)
+        if recent:
+            sections.append("Recently finished:")
+            sections.extend(f"{result.entity_type}: {result.summary()}" for result in recent)
+        return "\n\n".join(sections)
+
+def edit_status(status_message: Any) -> Callable[['BroadcastResult'], Awaitable[Any]]:
+    """Progress callback that keeps one admin status message updated with the live counters."""
+    return lambda result: status_message.edit_text(result.progress())
+
+_registry: Optional[ProgressRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_progress_registry() -> ProgressRegistry:
+    """Return the process-wide broadcast progress registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ProgressRegistry()
+        return _registry
@@ -1,73 +1,31 @@
 from flask import Flask, request, jsonify
-import json
 import logging
-import os
+from datetime import datetime
 from typing import Dict
-from datetime import datetime, timedelta
 from payment import create_category, create_bill
+from subscription_store import SUBSCRIPTION_DAYS, get_subscription_store
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Tempat menyimpan data pengguna
-USER_DATA_FILE = 'userpaid_data.json'
-
-def load_userpaid_data():
-    """Muatkan data pengguna dari fail."""
-    if os.path.exists(USER_DATA_FILE):
-        with open(USER_DATA_FILE, 'r') as file:
-            try:
-                return json.load(file)
-            except json.JSONDecodeError as e:
-                logger.error(f"Ralat mendekod JSON dari fail: {e}")
-                return {}
-    return {}
-
-def save_userpaid_data(user_data):
-    """Simpan data pengguna ke dalam fail."""
-    try:
-        with open(USER_DATA_FILE, 'w') as file:
-            json.dump(user_data, file, indent=4)
-    except IOError as e:
-        logger.error(f"Ralat menulis ke fail: {e}")
-
 def load_premium_users() -> Dict[str, Dict[str, str]]:
-    """Muatkan data pengguna premium dari fail JSON."""
-    try:
-        with open('userpaid_data.json', 'r') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return {}
-    except json.JSONDecodeError:
-        logger.error("Gagal memuatkan data pengguna premium. Format JSON tidak sah.")
-        return {}
+    """Muatkan data pengguna premium dari stor langganan."""
+    return {
+        str(user_id): {"subscription_end": datetime.fromtimestamp(expiry).isoformat() if expiry else None}
+        for user_id, expiry in get_subscription_store().active().items()
+    }
 
 def is_premium(user_id: int) -> bool:
     """Semak jika pengguna mempunyai langganan premium yang sah."""
-    premium_users = load_premium_users()
-    user_data = premium_users.get(str(user_id))
-    
-    if user_data:
-        subscription_end = datetime.fromisoformat(user_data['subscription_end'])
-        return datetime.now() < subscription_end
-    
-    return False
+    return get_subscription_store().is_active(user_id)
     
 def set_premium_status(user_id: int, is_premium: bool) -> None:
     """Tetapkan status premium pengguna berdasarkan pembayaran."""
-    premium_users = load_premium_users()
-    
     if is_premium:
-        # Set langganan tamat tempoh 30 hari dari sekarang sebagai contoh
-        subscription_end = (datetime.now() + timedelta(days=30)).isoformat()
-        premium_users[str(user_id)] = {"subscription_end": subscription_end}
+        get_subscription_store().grant(user_id, days=SUBSCRIPTION_DAYS, source='set_premium_status')
     else:
-        if str(user_id) in premium_users:
-            del premium_users[str(user_id)]
-    
-    with open('userpaid_data.json', 'w') as file:
-        json.dump(premium_users, file, indent=4)
+        get_subscription_store().revoke(user_id)
 
 @app.route('/payment_callback', methods=['POST'])
 def payment_callback():
@@ -85,10 +43,7 @@ def payment_callback():
         user_id = int(order_id.split('_')[0])
 
         if status == '1':  # Berjaya
-            user_data = load_userpaid_data()
-            subscription_end = datetime.now() + timedelta(days=30)
-            user_data[user_id] = {"subscription_end": subscription_end.isoformat()}
-            save_userpaid_data(user_data)
+            get_subscription_store().grant(user_id, days=SUBSCRIPTION_DAYS, source='payment_callback')
             # Beritahu pengguna (melalui bot Telegram, dsb.)
             return jsonify({'status': 'success', 'message': 'Pembayaran berjaya'}), 200
         else:
@@ -1,10 +1,12 @@
-import os
-import json
 import requests
 from typing import Dict, Optional
 from pyrogram import Client, filters
 from pyrogram.types import Message
-from config import TOKEN as TELEGRAM_BOT_TOKEN, API_ID, API_HASH, PAID_USER_IDS, TOYYIBPAY_SECRET_KEY
+from config import TOKEN as TELEGRAM_BOT_TOKEN, API_ID, API_HASH, TOYYIBPAY_SECRET_KEY
+from user_registry import get_user_registry
+from subscription_store import get_subscription_store
+from outbound_limiter import throttle_client
+from peer_cache import harvest_peers
 
 # Define type aliases for better readability
 UserData = Dict[str, Optional[int]]
@@ -15,7 +17,7 @@ FREE_VERSION_LIMIT = 1
 PREMIUM_VERSION_LIMIT = 5
 
 # Initialize the Pyrogram client
-app = Client("clonebot", api_id=API_ID, api_hash=API_HASH, bot_token=TELEGRAM_BOT_TOKEN)
+app = harvest_peers(throttle_client(Client("clonebot", api_id=API_ID, api_hash=API_HASH, bot_token=TELEGRAM_BOT_TOKEN)))
 
 def get_user_bot_limits() -> Dict[str, int]:
     """Retrieve default bot limits for users."""
@@ -26,24 +28,21 @@ def get_user_bot_limits() -> Dict[str, int]:
 
 def is_user_paid(user_id: int) -> bool:
     """Check if the user has paid and is allowed to clone the bot."""
-    return user_id in PAID_USER_IDS
+    return get_subscription_store().is_active(user_id)
 
 def get_user_data(user_id: int) -> UserData:
-    """Load user data from file."""
-    user_data = load_user_data()
-    return user_data.get(str(user_id), {})
+    """Load a single user's data from the user registry."""
+    return get_user_registry().get(user_id)
 
 def load_user_data() -> Dict[str, UserData]:
-    """Load user data from file."""
-    if os.path.exists('user_data.json'):
-        with open('user_data.json', 'r') as file:
-            return json.load(file)
-    return {}
+    """Load all user data from the user registry."""
+    return get_user_registry().all()
 
 def save_user_data(user_data: Dict[str, UserData]) -> None:
-    """Save user data to file."""
-    with open('user_data.json', 'w') as file:
-        json.dump(user_data, file, indent=4)
+    """Merge the given users' data into the user registry."""
+    registry = get_user_registry()
+    for uid, data in user_data.items():
+        registry.update(int(uid), data)
 
 def clone_bot(client: Client, message: Message) -> None:
     """Handle bot cloning based on user payment status and limits."""
@@ -2,27 +2,79 @@ import sqlite3
 
 DB_PATH = 'your_database_path.db'  # Nama fail pangkalan data
 
-def create_database():
-    """Cipta pangkalan data dan jadual daily_usage jika belum wujud."""
+# Kiraan penggunaan dipecahkan mengikut hari supaya tetapan semula harian tidak memerlukan sebarang penulisan.
+# Lajur had dinamakan daily_limit kerana `limit` adalah kata simpanan SQL.
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS daily_usage (
+        user_id INTEGER NOT NULL,
+        feature TEXT NOT NULL,
+        day TEXT NOT NULL,
+        usage INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, feature, day)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS daily_limits (
+        user_id INTEGER NOT NULL,
+        feature TEXT NOT NULL,
+        daily_limit INTEGER NOT NULL,
+        last_updated DATE NOT NULL,
+        PRIMARY KEY (user_id, feature)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_daily_usage_day ON daily_usage (day);
+"""
+
+def migrate_legacy_usage(conn: sqlite3.Connection) -> bool:
+    """Pindahkan jadual daily_usage lama (satu baris bagi setiap pengguna/fungsi, tanpa lajur day) ke skema baharu.
+
+    Kiraan disimpan pada hari last_updated dan had bukan sifar menjadi had khusus pengguna.
+    Pulangkan True jika migrasi dijalankan.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(daily_usage)")}
+    if not columns or 'day' in columns:
+        return False
+    # BEGIN IMMEDIATE supaya hanya satu proses memindahkan jadual; yang lain menyemak semula selepas itu
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        # Sambung ke pangkalan data (ia akan dicipta jika tidak wujud)
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            
-            # Cipta jadual daily_usage
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS daily_usage (
-                    user_id INTEGER NOT NULL,
-                    feature TEXT NOT NULL,
-                    usage INTEGER DEFAULT 0,
-                    limit INTEGER DEFAULT 0,
-                    last_updated DATE NOT NULL,
-                    PRIMARY KEY (user_id, feature)
-                )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(daily_usage)")}
+        if 'day' in columns:
+            conn.rollback()
+            return False
+        conn.execute("ALTER TABLE daily_usage RENAME TO daily_usage_legacy")
+        for statement in SCHEMA.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        conn.execute("""
+            INSERT OR IGNORE INTO daily_usage (user_id, feature, day, usage)
+            SELECT user_id, feature, last_updated, COALESCE(usage, 0) FROM daily_usage_legacy
+        """)
+        if 'limit' in columns:
+            conn.execute("""
+                INSERT OR IGNORE INTO daily_limits (user_id, feature, daily_limit, last_updated)
+                SELECT user_id, feature, "limit", last_updated FROM daily_usage_legacy WHERE "limit" > 0
             """)
-            
+        conn.execute("DROP TABLE daily_usage_legacy")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+def create_schema(conn: sqlite3.Connection) -> None:
+    """Cipta jadual daily_usage/daily_limits, memindahkan jadual daily_usage lama terlebih dahulu jika ada."""
+    if not migrate_legacy_usage(conn):
+        conn.executescript(SCHEMA)
+
+def create_database(db_path: str = DB_PATH):
+    """Cipta pangkalan data dan jadual daily_usage/daily_limits jika belum wujud."""
+    try:
+        # Sambung ke pangkalan data (ia akan dicipta jika tidak wujud)
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            create_schema(conn)
+
             print("Pangkalan data dan jadual daily_usage telah dicipta atau sudah wujud.")
-    
+
     except Exception as e:
         print(f"Ralat semasa mencipta pangkalan data: {e}")
 
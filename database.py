@@ -1,5 +1,10 @@
-import json
 import os
+import logging
+from config import ADMIN_USER_ID, ALLOWED_USER_IDS
+from user_registry import get_user_registry
+from subscription_store import get_subscription_store
+
+logger = logging.getLogger(__name__)
 
 def is_user_allowed(user_id: int) -> bool:
     """Check if the user is allowed to use the bot."""
@@ -7,22 +12,18 @@ def is_user_allowed(user_id: int) -> bool:
 
 def is_user_paid(user_id: int) -> bool:
     """Check if the user has paid to access the bot."""
-    user_data = load_user_data()
-    return (user_id in user_data and
-            user_data[user_id].get("subscription_end") and
-            datetime.fromisoformat(user_data[user_id]["subscription_end"]) > datetime.now())
+    return get_subscription_store().is_active(user_id)
 
 def load_user_data() -> dict:
-    """Load user data from file."""
-    if os.path.exists('user_data.json'):
-        with open('user_data.json', 'r') as file:
-            return json.load(file)
-    return {}
+    """Load user data from the user registry."""
+    return get_user_registry().all()
 
-def save_user_data(user_data: dict) -> None:
-    """Save user data to file."""
-    with open('user_data.json', 'w') as file:
-        json.dump(user_data, file, indent=4)
+def save_user_data(user_id: int) -> None:
+    """Register the user in the user registry."""
+    try:
+        get_user_registry().add_user(user_id)
+    except Exception as e:
+        logger.error(f"Ralat menyimpan data pengguna: {e}")
         
 def save_auto_approve_group_id(group_id: int) -> None:
     """Simpan ID group/channel untuk kelulusan automatik."""
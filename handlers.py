@@ -1,7 +1,5 @@
 import logging
 import re
-import json
-import os
 import random
 import string
 from datetime import datetime, timedelta
@@ -9,6 +7,8 @@ import requests
 from pyrogram import Client, types
 from config import ADMIN_USER_ID, ALLOWED_USER_IDS, PAID_USER_IDS, TOYYIBPAY_SECRET_KEY
 from clonebot import get_user_data
+from user_registry import get_user_registry
+from rate_limiter import check_rate, retry_after
 from keyboards import get_main_keyboard, get_submenu_keyboard, get_conversion_keyboard, SUBMENU_OPTIONS
 
 logger = logging.getLogger(__name__)
@@ -44,6 +44,10 @@ def extract_info_from_text(user_text: str) -> tuple:
 
 def handle_conversion(client: Client, message: types.Message) -> None:
     """Handle conversion options based on user's selected format."""
+    wait = check_rate(message.from_user.id, 'convert')
+    if wait:
+        client.send_message(message.chat.id, f"You're sending requests too quickly. Please try again in {retry_after(wait)} seconds.")
+        return
     user_text = message.text
     uuid, subdo, name = extract_info_from_text(user_text)
     if uuid and subdo and name:
@@ -126,17 +130,9 @@ def clone_bot(client: Client, message: types.Message) -> None:
 
 def total_users(client: Client, message: types.Message) -> None:
     """Handle the /total_users command to show total number of users."""
-    user_data_file = 'user_data.json'
-
     try:
-        if os.path.exists(user_data_file):
-            with open(user_data_file, 'r') as file:
-                user_data = json.load(file)
-                
-            total_users_count = len(user_data)
-            response_message = f"Total number of users: {total_users_count}"
-        else:
-            response_message = "User data file does not exist."
+        total_users_count = get_user_registry().count()
+        response_message = f"Total number of users: {total_users_count}"
     except Exception as e:
         response_message = f"An error occurred: {e}"
 
@@ -0,0 +1,96 @@
+import copy
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+# path -> ((inode, mtime_ns, size), parsed data)
+_cache: Dict[str, Tuple[Tuple[int, int, int], Any]] = {}
+_cache_lock = threading.Lock()
+
+def file_signature(file_path: str) -> Optional[Tuple[int, int, int]]:
+    """Return (inode, mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+@contextmanager
+def file_lock(file_path: str, exclusive: bool = True) -> Iterator[None]:
+    """Hold an fcntl advisory lock on `<file_path>.lock`, shared across processes."""
+    with open(f"{file_path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def _read(file_path: str, default: Any, use_cache: bool) -> Any:
+    """Read and parse a JSON file, reusing the cached value if the file is unchanged."""
+    signature = file_signature(file_path)
+    if signature is None:
+        return copy.deepcopy(default)
+    if use_cache:
+        with _cache_lock:
+            cached = _cache.get(file_path)
+        if cached and cached[0] == signature:
+            return copy.deepcopy(cached[1])
+    try:
+        with open(file_path, 'r') as file:
+            data = json.load(file)
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid JSON in {file_path}: {e}")
+        return copy.deepcopy(default)
+    if use_cache:
+        with _cache_lock:
+            _cache[file_path] = (signature, data)
+        return copy.deepcopy(data)
+    return data
+
+def _write(file_path: str, data: Any, indent: Optional[int]) -> None:
+    """Write JSON to a temp file in the same directory, fsync it and rename it over the target."""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(file_path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as file:
+            json.dump(data, file, indent=indent)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    with _cache_lock:
+        _cache.pop(file_path, None)
+
+def load_json(file_path: str, default: Any = None, use_cache: bool = True) -> Any:
+    """Load a JSON file under a shared lock. Returns a copy of `default` if it does not exist."""
+    with file_lock(file_path, exclusive=False):
+        return _read(file_path, default, use_cache)
+
+def save_json(file_path: str, data: Any, indent: Optional[int] = 4) -> None:
+    """Atomically replace a JSON file under an exclusive lock."""
+    with file_lock(file_path, exclusive=True):
+        _write(file_path, data, indent)
+
+def update_json(file_path: str, default: Any, updater: Callable[[Any], Any], indent: Optional[int] = 4) -> Any:
+    """Read-modify-write a JSON file under one exclusive lock so concurrent updates are not lost.
+
+    `updater` receives the current data and returns the new data (or None to keep the mutated value).
+    """
+    with file_lock(file_path, exclusive=True):
+        data = _read(file_path, default, use_cache=True)
+        result = updater(data)
+        if result is not None:
+            data = result
+        _write(file_path, data, indent)
+        return data
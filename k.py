@@ -7,7 +7,10 @@ from chatgpt import generate_chatgpt_response, extract_info_from_text
 from callurl import is_premium, load_premium_users
 from payment import generate_random_string, create_category, create_bill, process_payment
 from database import save_user_data, save_auto_approve_group_id, get_auto_approve_group_id
-from limit import set_daily_limit, load_limits, save_limits, initialize_user, check_daily_limit, update_daily_usage
+from limit import set_daily_limit, load_limits, save_limits, try_consume
+from rate_limiter import check_rate, retry_after
+from outbound_limiter import throttle_client
+from peer_cache import harvest_peers
 
 # Setup logging
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
@@ -18,7 +21,7 @@ API_HASH = os.getenv("API_HASH")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 # Initialize the Pyrogram Client
-app = Client("my_bot", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
+app = harvest_peers(throttle_client(Client("my_bot", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)))
 
 @app.on_message(filters.command('start'))
 def handle_start(client: Client, message: Message) -> None:
@@ -26,7 +29,6 @@ def handle_start(client: Client, message: Message) -> None:
     try:
         user_id = message.from_user.id
         save_user_data(user_id)
-        initialize_user(user_id)  # Initialize limits for the new user
         
         # Text untuk mesej utama bot
         welcome_message = (
@@ -58,6 +60,10 @@ def handle_start(client: Client, message: Message) -> None:
 def handle_ask_command(client: Client, message: Message) -> None:
     """Handle /ask command to interact with ChatGPT or extract information."""
     try:
+        wait = check_rate(message.from_user.id, 'chatgpt')
+        if wait:
+            client.send_message(message.chat.id, f"Anda menghantar permintaan terlalu kerap. Sila cuba lagi dalam {retry_after(wait)} saat.")
+            return
         user_input = message.text[len('/ask'):].strip()
         if user_input.startswith('extract:'):
             text_to_extract = user_input[len('extract:'):].strip()
@@ -177,10 +183,9 @@ def handle_version_submenu(client: Client, callback_query: CallbackQuery) -> Non
         
         # Update penggunaan untuk versi percuma
         if version_type == 'free_version':
-            if not check_daily_limit(callback_query.from_user.id, feature, version_type):
+            if not try_consume(callback_query.from_user.id, feature):
                 client.send_message(callback_query.message.chat.id, "Anda telah melebihi had harian untuk fungsi ini.")
                 return
-            update_daily_usage(callback_query.from_user.id, feature)
     except Exception as e:
         logger.error(f"Ralat memaparkan submenu versi: {e}")
 
@@ -1,13 +1,10 @@
-import json
 import os
-import sqlite3
-from datetime import datetime
 import logging
 from pyrogram import Client, filters
 from pyrogram.types import Message
+from json_store import load_json, save_json
+from usage_counters import LIMITS_FILE, get_usage_counters
 
-LIMITS_FILE = "limits.json"
-DB_PATH = 'your_database_path.db'
 ADMIN_USER_ID = os.getenv("ADMIN_USER_ID")
 
 # Konfigurasi logger
@@ -16,17 +13,7 @@ logger = logging.getLogger(__name__)
 
 def set_daily_limit(user_id: int, feature: str, limit: int) -> None:
     """Tetapkan had harian untuk fungsi tertentu bagi pengguna versi percuma tertentu."""
-    today = datetime.now().date()
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO daily_usage (user_id, feature, usage, limit, last_updated)
-            VALUES (?, ?, 0, ?, ?)
-            ON CONFLICT(user_id, feature) DO UPDATE SET
-                limit = excluded.limit,
-                last_updated = excluded.last_updated
-        """, (user_id, feature, limit, today))
-        conn.commit()
+    get_usage_counters().set_limit(user_id, feature, limit)
 
 @app.on_message(filters.command('setdailylimit'))
 def handle_set_daily_limit(client: Client, message: Message) -> None:
@@ -60,76 +47,20 @@ def handle_set_daily_limit(client: Client, message: Message) -> None:
 
 def load_limits() -> dict:
     """Muatkan had dari fail."""
-    if os.path.exists(LIMITS_FILE):
-        with open(LIMITS_FILE, "r") as file:
-            return json.load(file)
-    return {}
+    return load_json(LIMITS_FILE, {})
 
 def save_limits(data: dict) -> None:
     """Simpan had ke dalam fail."""
-    with open(LIMITS_FILE, "w") as file:
-        json.dump(data, file, indent=2)
-
-def initialize_user(user_id: int) -> None:
-    """Inisialisasi had harian untuk pengguna baru."""
-    limits = load_limits()
-    user_id_str = str(user_id)
-    
-    if user_id_str not in limits:
-        today = datetime.now().date().isoformat()
-        limits[user_id_str] = {
-            "convert": {"date": today, "count": 0, "limit": 5},
-            "broadcast": {"date": today, "count": 0, "limit": 2},
-            "auto_approve": {"date": today, "count": 0, "limit": 5},
-            "downloader": {"date": today, "count": 0, "limit": 5},
-            "chatgpt": {"date": today, "count": 0, "limit": 10}
-        }
-        save_limits(limits)
+    save_json(LIMITS_FILE, data, indent=2)
 
 def check_daily_limit(user_id: int, feature: str) -> bool:
     """Semak jika pengguna telah melebihi had harian untuk fungsi tertentu."""
-    limits = load_limits()
-    user_id_str = str(user_id)
-    
-    today = datetime.now().date().isoformat()
-    
-    if user_id_str not in limits:
-        initialize_user(user_id)  # Inisialisasi jika pengguna tidak ditemui
-        limits = load_limits()  # Muatkan semula had selepas inisialisasi
-
-    user_limits = limits.get(user_id_str, {})
-    feature_limits = user_limits.get(feature, {})
-    
-    # Semak jika penggunaan harian wujud dan adalah untuk hari ini
-    if feature_limits.get("date") == today:
-        daily_limit = feature_limits.get("limit", 0)
-        usage_count = feature_limits.get("count", 0)
-        
-        if usage_count >= daily_limit:
-            return False  # Melebihi had harian
-    
-    return True  # Tidak melebihi had harian
+    return get_usage_counters().remaining(user_id, feature) > 0
 
 def update_daily_usage(user_id: int, feature: str) -> None:
     """Kemaskini kiraan penggunaan harian untuk fungsi tertentu."""
-    limits = load_limits()
-    user_id_str = str(user_id)
-    
-    today = datetime.now().date().isoformat()
-    
-    if user_id_str not in limits:
-        initialize_user(user_id)  # Inisialisasi jika pengguna tidak ditemui
-        limits = load_limits()  # Muatkan semula had selepas inisialisasi
+    get_usage_counters().consume(user_id, feature)
 
-    user_limits = limits.get(user_id_str, {})
-    feature_limits = user_limits.get(feature, {})
-    
-    # Inisialisasi data penggunaan harian jika tidak wujud
-    if feature_limits.get("date") != today:
-        feature_limits = {"date": today, "count": 0, "limit": 10}  # Tetapkan had harian mengikut keperluan
-        user_limits[feature] = feature_limits
-    
-    # Tambah kiraan penggunaan
-    feature_limits["count"] += 1
-    limits[user_id_str] = user_limits
-    save_limits(limits)
+def try_consume(user_id: int, feature: str) -> bool:
+    """Semak dan tambah kiraan penggunaan harian secara atomik. Pulangkan False jika had dicapai."""
+    return get_usage_counters().try_consume(user_id, feature)
@@ -0,0 +1,193 @@
+import queue
+import sqlite3
+import logging
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+from create_database import DB_PATH, create_schema
+from json_store import load_json
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = 4
+DEFAULT_TIER = 'freemium'
+RETENTION_DAYS = 7
+
+# Satu pernyataan untuk semak had dan tambah kiraan: tiada baris dipulangkan bermakna had telah dicapai
+TRY_CONSUME_SQL = """
+    INSERT INTO daily_usage (user_id, feature, day, usage)
+    SELECT :user_id, :feature, :day, :amount
+    WHERE :amount <= COALESCE(
+        (SELECT daily_limit FROM daily_limits WHERE user_id = :user_id AND feature = :feature), :default_limit)
+    ON CONFLICT(user_id, feature, day) DO UPDATE SET usage = usage + excluded.usage
+    WHERE daily_usage.usage + excluded.usage <= COALESCE(
+        (SELECT daily_limit FROM daily_limits WHERE user_id = :user_id AND feature = :feature), :default_limit)
+    RETURNING usage
+"""
+
+CONSUME_SQL = """
+    INSERT INTO daily_usage (user_id, feature, day, usage) VALUES (:user_id, :feature, :day, :amount)
+    ON CONFLICT(user_id, feature, day) DO UPDATE SET usage = usage + excluded.usage
+"""
+
+ADD_USAGE_SQL = """
+    INSERT INTO daily_usage (user_id, feature, day, usage) VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id, feature, day) DO UPDATE SET usage = usage + excluded.usage
+"""
+
+STORE_USAGE_SQL = """
+    INSERT INTO daily_usage (user_id, feature, day, usage) VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id, feature, day) DO UPDATE SET usage = excluded.usage
+"""
+
+SET_LIMIT_SQL = """
+    INSERT INTO daily_limits (user_id, feature, daily_limit, last_updated) VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id, feature) DO UPDATE SET
+        daily_limit = excluded.daily_limit,
+        last_updated = excluded.last_updated
+"""
+
+USAGE_SQL = "SELECT usage FROM daily_usage WHERE user_id = ? AND feature = ? AND day = ?"
+LIMIT_SQL = "SELECT daily_limit FROM daily_limits WHERE user_id = ? AND feature = ?"
+
+class LimitsEngine:
+    """SQLite daily-limit backend over a small pool of connections with cached prepared statements.
+
+    Limits come from per-tier policies; only admin overrides are stored per user.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, pool_size: int = POOL_SIZE,
+                 tier_limits: Optional[Dict[str, Dict[str, int]]] = None, fallback_limit: int = 10,
+                 tier_of: Optional[Callable[[int], str]] = None) -> None:
+        self.db_path = db_path
+        self.tier_limits = tier_limits or {}
+        self.fallback_limit = fallback_limit
+        self.tier_of = tier_of or (lambda user_id: DEFAULT_TIER)
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._connection() as conn:
+            create_schema(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a pooled connection; sqlite3 reuses prepared statements per connection."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection from the pool and commit on success."""
+        conn = self._pool.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def default_limit(self, feature: str, tier: str = None) -> int:
+        """Return the tier policy's daily limit for a feature."""
+        return self.tier_limits.get(tier or DEFAULT_TIER, {}).get(feature, self.fallback_limit)
+
+    def policy_limit(self, user_id: int, feature: str) -> int:
+        """Return the daily limit the user inherits from their current tier."""
+        return self.default_limit(feature, self.tier_of(user_id))
+
+    def try_consume(self, user_id: int, feature: str, amount: int = 1) -> bool:
+        """Atomically check the daily limit and count a use with one UPSERT ... RETURNING."""
+        params = {
+            "user_id": user_id, "feature": feature, "day": date.today().isoformat(),
+            "amount": amount, "default_limit": self.policy_limit(user_id, feature),
+        }
+        with self._connection() as conn:
+            return conn.execute(TRY_CONSUME_SQL, params).fetchone() is not None
+
+    def consume(self, user_id: int, feature: str, amount: int = 1) -> None:
+        """Count a use without checking the limit."""
+        params = {"user_id": user_id, "feature": feature, "day": date.today().isoformat(), "amount": amount}
+        with self._connection() as conn:
+            conn.execute(CONSUME_SQL, params)
+
+    def usage(self, user_id: int, feature: str, day: Optional[str] = None) -> int:
+        """Return the usage count for a day (today by default)."""
+        with self._connection() as conn:
+            row = conn.execute(USAGE_SQL, (user_id, feature, day or date.today().isoformat())).fetchone()
+        return row[0] if row else 0
+
+    def limit(self, user_id: int, feature: str) -> int:
+        """Return the user's daily limit for a feature (override or default)."""
+        with self._connection() as conn:
+            row = conn.execute(LIMIT_SQL, (user_id, feature)).fetchone()
+        return row[0] if row else self.policy_limit(user_id, feature)
+
+    def remaining(self, user_id: int, feature: str) -> int:
+        """Return how many uses are left today."""
+        return max(self.limit(user_id, feature) - self.usage(user_id, feature), 0)
+
+    def set_limit(self, user_id: int, feature: str, limit: int) -> None:
+        """Store a per-user daily limit override (from /setdailylimit)."""
+        with self._connection() as conn:
+            conn.execute(SET_LIMIT_SQL, (user_id, feature, limit, date.today().isoformat()))
+
+    def add_usage(self, rows: Iterable[Tuple[int, str, str, int]]) -> None:
+        """Bulk add (user_id, feature, day, delta) increments in one transaction; safe with several writers."""
+        with self._connection() as conn:
+            conn.executemany(ADD_USAGE_SQL, rows)
+
+    def store_usage(self, rows: Iterable[Tuple[int, str, str, int]]) -> None:
+        """Bulk write absolute (user_id, feature, day, usage) counts in one transaction."""
+        with self._connection() as conn:
+            conn.executemany(STORE_USAGE_SQL, rows)
+
+    def load_usage(self, day: Optional[str] = None) -> Dict[Tuple[int, str], int]:
+        """Return {(user_id, feature): usage} for one day (today by default)."""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT user_id, feature, usage FROM daily_usage WHERE day = ?", (day or date.today().isoformat(),)
+            ).fetchall()
+        return {(user_id, feature): usage for user_id, feature, usage in rows}
+
+    def load_limits(self) -> Dict[Tuple[int, str], int]:
+        """Return every per-user limit override."""
+        with self._connection() as conn:
+            rows = conn.execute("SELECT user_id, feature, daily_limit FROM daily_limits").fetchall()
+        return {(user_id, feature): limit for user_id, feature, limit in rows}
+
+    def purge_before(self, day: str) -> int:
+        """Delete usage partitions older than `day`. Returns rows deleted."""
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM daily_usage WHERE day < ?", (day,)).rowcount
+
+    def purge_expired(self, retention_days: int = RETENTION_DAYS) -> int:
+        """Drop usage partitions past the retention window."""
+        return self.purge_before((date.today() - timedelta(days=retention_days)).isoformat())
+
+    def import_limits_json(self, file_path: str) -> int:
+        """Bulk import a legacy limits.json file. Returns the number of (user, feature) rows imported."""
+        legacy = load_json(file_path, {})
+        usage_rows, limit_rows = [], []
+        for user_id, features in legacy.items():
+            for feature, entry in features.items():
+                if entry.get("date"):
+                    usage_rows.append((int(user_id), feature, entry["date"], entry.get("count", 0)))
+                # Only keep limits that differ from the freemium policy; everything else is inherited
+                if entry.get("limit") is not None and entry["limit"] != self.default_limit(feature):
+                    limit_rows.append((int(user_id), feature, entry["limit"], date.today().isoformat()))
+        with self._connection() as conn:
+            conn.executemany(STORE_USAGE_SQL, usage_rows)
+            conn.executemany(SET_LIMIT_SQL, limit_rows)
+        logger.info(f"Imported {len(usage_rows)} usage rows and {len(limit_rows)} limits from {file_path}.")
+        return len(usage_rows)
+
+    def is_empty(self) -> bool:
+        """Check whether the engine holds no usage or limit rows yet."""
+        with self._connection() as conn:
+            return (conn.execute("SELECT 1 FROM daily_usage LIMIT 1").fetchone() is None and
+                    conn.execute("SELECT 1 FROM daily_limits LIMIT 1").fetchone() is None)
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
@@ -18,11 +18,16 @@ from broadcast import (
     schedule_broadcast, broadcast_to_user, broadcast_to_group, broadcast_to_channel, broadcast_to_all, schedule_user_broadcast,
     schedule_group_broadcast, schedule_channel_broadcast, schedule_all_broadcast
 )
+from scheduler_service import start_scheduler
 from handlers import (
     start, button, handle_message, set_admin_id, set_user_id, clone_bot, process_payment, payment_callback, total_users,
     handle_downloader_fb, handle_downloader_tg, handle_downloader_ig, handle_downloader_tt, handle_downloader_yt,
     is_user_allowed, is_user_paid, save_user_data, handle_conversion, generate_random_string, create_category, create_bill, update_config
 )
+from user_registry import get_user_registry
+from rate_limiter import check_rate, retry_after
+from outbound_limiter import throttle_client
+from peer_cache import harvest_peers
 from keyboards import get_main_keyboard, get_submenu_keyboard, get_conversion_keyboard, SUBMENU_OPTIONS
 from config import TOKEN as TELEGRAM_BOT_TOKEN,API_ID, API_HASH, ADMIN_BOT_ID, ADMIN_USER_ID, ALLOWED_USER_IDS, PAID_USER_IDS, TOYYIBPAY_SECRET_KEY
 
@@ -35,7 +40,7 @@ API_HASH = os.getenv("API_HASH")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 # Get the api id, api hash & telegram bot token from environment variables
-app = Client("my_bot", api_id=API_ID, api_hash=API_HASH, bot_token=TELEGRAM_BOT_TOKEN)
+app = harvest_peers(throttle_client(Client("my_bot", api_id=API_ID, api_hash=API_HASH, bot_token=TELEGRAM_BOT_TOKEN)))
 
 def save_auto_approve_group_id(group_id: int) -> None:
     """Simpan ID kumpulan untuk kelulusan automatik."""
@@ -75,18 +80,9 @@ def handle_new_chat_member(client: Client, message: "Message") -> None:
         logger.error(f"Ralat mengendalikan ahli baru: {e}")
 
 def save_user_data(user_id: int) -> None:
-    """Simpan user_id ke dalam user_data.json."""
+    """Daftarkan user_id dalam daftar pengguna."""
     try:
-        file_path = 'user_data.json'
-        data = {}
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-
-        data[str(user_id)] = {"user_id": user_id}
-
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        get_user_registry().add_user(user_id)
     except Exception as e:
         logger.error(f"Ralat menyimpan data pengguna: {e}")
 
@@ -94,6 +90,10 @@ def save_user_data(user_id: int) -> None:
 def handle_ask_command(client: Client, message) -> None:
     """Handle /ask command to interact with ChatGPT or extract information."""
     try:
+        wait = check_rate(message.from_user.id, 'chatgpt')
+        if wait:
+            client.send_message(message.chat.id, f"Anda menghantar permintaan terlalu kerap. Sila cuba lagi dalam {retry_after(wait)} saat.")
+            return
         user_input = message.text[len('/ask'):].strip()
         if user_input.startswith('extract:'):
             text_to_extract = user_input[len('extract:'):].strip()
@@ -328,4 +328,5 @@ def handle_query(client: Client, query: CallbackQuery) -> None:
         logger.error(f"Ralat mengendalikan pertanyaan: {e}")
 
 if __name__ == "__main__":
+    start_scheduler()
     app.run()
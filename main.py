@@ -18,11 +18,15 @@ from broadcast import (
     schedule_broadcast, broadcast_to_user, broadcast_to_group, broadcast_to_channel, broadcast_to_all, schedule_user_broadcast,
     schedule_group_broadcast, schedule_channel_broadcast, schedule_all_broadcast
 )
+from scheduler_service import start_scheduler
 from handlers import (
     start, button, handle_message, set_admin_id, set_user_id, clone_bot, process_payment, payment_callback, total_users,
     handle_downloader_fb, handle_downloader_tg, handle_downloader_ig, handle_downloader_tt, handle_downloader_yt,
     is_user_allowed, is_user_paid, save_user_data, handle_conversion, generate_random_string, create_category, create_bill, update_config
 )
+from user_registry import get_user_registry
+from rate_limiter import check_rate, retry_after
+from outbound_limiter import throttle_client
 from keyboards import get_main_keyboard, get_submenu_keyboard, get_conversion_keyboard, SUBMENU_OPTIONS
 from config import TOKEN as TELEGRAM_BOT_TOKEN, ADMIN_BOT_ID, ADMIN_USER_ID, ALLOWED_USER_IDS, PAID_USER_IDS, TOYYIBPAY_SECRET_KEY
 
@@ -37,7 +41,7 @@ if not TOKEN:
     exit(1)
 
 # Create the bot instance
-bot = telebot.TeleBot(TOKEN)
+bot = throttle_client(telebot.TeleBot(TOKEN))
 
 def save_auto_approve_group_id(group_id: int) -> None:
     """Save the group ID to a file."""
@@ -77,18 +81,9 @@ def handle_new_chat_member(message: telebot.types.Message) -> None:
         logger.error(f"Error handling new chat member: {e}")
 
 def save_user_data(user_id: int) -> None:
-    """Save user_id to user_data.json."""
+    """Register user_id in the user registry."""
     try:
-        file_path = 'user_data.json'
-        data = {}
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-
-        data[str(user_id)] = {"user_id": user_id}
-
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        get_user_registry().add_user(user_id)
     except Exception as e:
         logger.error(f"Error saving user data: {e}")
 
@@ -209,6 +204,10 @@ def show_chatgpt_info(chat_id: int) -> None:
 def handle_ask_command(message: telebot.types.Message) -> None:
     """Handle /ask command to interact with ChatGPT or extract information."""
     try:
+        wait = check_rate(message.from_user.id, 'chatgpt')
+        if wait:
+            bot.send_message(message.chat.id, f"You're sending requests too quickly. Please try again in {retry_after(wait)} seconds.")
+            return
         user_input = message.text[len('/ask'):].strip()
         if user_input.startswith('extract:'):
             text_to_extract = user_input[len('extract:'):].strip()
@@ -300,7 +299,14 @@ def handle_bug_vless_callback(call: telebot.types.CallbackQuery) -> None:
 ])
 def handle_conversion_option(message: telebot.types.Message) -> None:
     """Handle user selecting a conversion option from the keyboard."""
-    handle_conversion(message, bot)
+    handle_conversion(bot, message)
+
+def is_rate_limited(message: telebot.types.Message, feature: str) -> bool:
+    """Reply and return True if the user has exceeded the request rate for a feature."""
+    wait = check_rate(message.from_user.id, feature)
+    if wait:
+        bot.send_message(message.chat.id, f"You're sending requests too quickly. Please try again in {retry_after(wait)} seconds.")
+    return bool(wait)
 
 # Command Handlers
 command_handlers = {
@@ -326,12 +332,14 @@ command_handlers = {
 
 for command, handler in command_handlers.items():
     @bot.message_handler(commands=[command])
-    def handle_command(message: telebot.types.Message, handler=handler) -> None:
+    def handle_command(message: telebot.types.Message, handler=handler, command=command) -> None:
+        if command.startswith('downloader_') and is_rate_limited(message, 'downloader'):
+            return
         handler(message)
 
 @bot.message_handler(func=lambda message: not message.text.startswith('/'))
 def handle_text_message(message: telebot.types.Message) -> None:
-    handle_message(message, bot)
+    handle_message(bot, message)
 
 @bot.callback_query_handler(func=lambda call: call.data == 'text_to_img')
 def handle_text_to_img_callback(call: telebot.types.CallbackQuery) -> None:
@@ -341,6 +349,8 @@ def handle_text_to_img_callback(call: telebot.types.CallbackQuery) -> None:
 @bot.message_handler(func=lambda message: message.text and message.reply_to_message and message.reply_to_message.text == "Please send me the text you want to convert to an image.")
 def handle_text_to_image_message(message: telebot.types.Message) -> None:
     """Handle the text message to convert it to an image."""
+    if is_rate_limited(message, 'convert'):
+        return
     text = message.text
     image_stream = text_to_image(text)
     
@@ -354,6 +364,10 @@ def handle_img_to_text_callback(call: telebot.types.CallbackQuery) -> None:
 @bot.message_handler(content_types=['photo'])
 def handle_image_message(message: telebot.types.Message) -> None:
     """Handle image messages and convert them to text or PDF."""
+    if message.reply_to_message and message.reply_to_message.text in (
+        "Please send me the image you want to convert to text.", "Please send me the image you want to convert to PDF."
+    ) and is_rate_limited(message, 'convert'):
+        return
     if message.reply_to_message and message.reply_to_message.text == "Please send me the image you want to convert to text.":
         file_info = bot.get_file(message.photo[-1].file_id)
         file = bot.download_file(file_info.file_path)
@@ -385,6 +399,10 @@ def handle_pdf_to_img_callback(call: telebot.types.CallbackQuery) -> None:
 @bot.message_handler(content_types=['document'])
 def handle_document_message(message: telebot.types.Message) -> None:
     """Handle document messages and convert PDFs to images or MP4s to audio."""
+    if message.reply_to_message and message.reply_to_message.text in (
+        "Please send me the PDF file you want to convert to an image.", "Please send me the MP4 file you want to convert to audio."
+    ) and is_rate_limited(message, 'convert'):
+        return
     if message.reply_to_message and message.reply_to_message.text == "Please send me the PDF file you want to convert to an image.":
         file_info = bot.get_file(message.document.file_id)
         file = bot.download_file(file_info.file_path)
@@ -414,6 +432,7 @@ def handle_document_message(message: telebot.types.Message) -> None:
 def main() -> None:
     try:
         logger.info("Starting bot...")
+        start_scheduler()
         bot.polling(none_stop=True)
     except Exception as e:
         logger.error(f"An error occurred: {e}")
@@ -0,0 +1,104 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional, Tuple
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+# Ahli yang telah menyertai jarang keluar (dan keluar dimaklumkan melalui kemas kini), jadi keputusan positif disimpan lama;
+# keputusan negatif disimpan sebentar sahaja supaya pengguna yang baru menyertai tidak perlu menunggu
+POSITIVE_TTL_SECONDS = 6 * 3600.0
+NEGATIVE_TTL_SECONDS = 60.0
+MAX_ENTRIES = 100_000
+
+JOINED_STATUSES = {'owner', 'creator', 'administrator', 'member'}
+
+# lookup(user_id, chat) -> True/False, or None if membership could not be determined
+MembershipLookup = Callable[[int, Any], Optional[bool]]
+
+def chat_key(chat: Any) -> str:
+    """Normalise a chat ID or @username so requirements and update chats map to the same cache key."""
+    return str(chat).lower().lstrip('@')
+
+def is_joined_status(status: Any, is_member: Optional[bool] = None) -> bool:
+    """Check a chat member status (Pyrogram enum or Bot API string) for membership.
+
+    A restricted user is still in the chat only if `is_member` (from the same ChatMember) is true.
+    """
+    status = getattr(status, 'value', status)
+    if status == 'restricted':
+        return bool(is_member)
+    return status in JOINED_STATUSES
+
+class MembershipCache:
+    """LRU cache of (user, chat) join checks with separate TTLs for joined and not-joined results.
+
+    The join gate runs on every private message, so a hit must not touch the network. Entries are
+    updated directly from chat_member updates and join/leave service messages, so the long positive
+    TTL only matters when such an update is missed. Failed lookups are not cached.
+    """
+
+    def __init__(self, lookup: MembershipLookup, positive_ttl: float = POSITIVE_TTL_SECONDS,
+                 negative_ttl: float = NEGATIVE_TTL_SECONDS, max_entries: int = MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.lookup = lookup
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        # (user_id, chat key) -> (expires_at, joined)
+        self._entries: 'OrderedDict[Tuple[int, str], Tuple[float, bool]]' = OrderedDict()
+
+    def peek(self, user_id: int, chat: Any) -> Optional[bool]:
+        """Return the cached result, or None if missing or expired."""
+        key = (user_id, chat_key(chat))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, user_id: int, chat: Any, joined: bool) -> None:
+        """Store a membership result (from a lookup or an update)."""
+        ttl = self.positive_ttl if joined else self.negative_ttl
+        key = (user_id, chat_key(chat))
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl, joined)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_member(self, user_id: int, chat: Any) -> bool:
+        """Cached membership check; only a miss calls the lookup."""
+        joined = self.peek(user_id, chat)
+        if joined is not None:
+            return joined
+        joined = self.lookup(user_id, chat)
+        if joined is None:
+            return False
+        self.set(user_id, chat, joined)
+        return joined
+
+    def update(self, user_id: int, chats: Iterable[Any], joined: Optional[bool]) -> None:
+        """Apply a membership change seen in an update to every key the chat is known by (ID, @username).
+
+        `joined=None` only drops the entries so the next check asks Telegram.
+        """
+        for chat in chats:
+            if chat is None:
+                continue
+            if joined is None:
+                with self._lock:
+                    self._entries.pop((user_id, chat_key(chat)), None)
+            else:
+                self.set(user_id, chat, joined)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,278 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import inspect
+import time
+import threading
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Union
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+# Had Telegram untuk bot: ~30 mesej/saat secara global, 1 mesej/saat bagi setiap chat, 20 mesej/minit bagi kumpulan
+GLOBAL_RATE = 30.0
+MIN_GLOBAL_RATE = 1.0
+PER_CHAT_INTERVAL = 1.0
+GROUP_MESSAGES_PER_WINDOW = 20
+GROUP_WINDOW_SECONDS = 60.0
+# AIMD: kadar dinaikkan ~1 mesej/saat bagi setiap saat penghantaran berjaya, dan dipotong separuh pada FloodWait
+ADDITIVE_INCREASE = 1.0
+MULTIPLICATIVE_DECREASE = 0.5
+CHAT_IDLE_SECONDS = 120.0
+MAX_FLOOD_RETRIES = 3
+
+# Lorong keutamaan: balasan interaktif > transaksi (pautan pembayaran) > siaran pukal
+INTERACTIVE = 0
+TRANSACTIONAL = 1
+BULK = 2
+LANES = (INTERACTIVE, TRANSACTIONAL, BULK)
+# Bahagian kadar global bagi setiap lorong yang aktif; lorong yang senyap tidak mengambil bahagian
+LANE_WEIGHTS = {INTERACTIVE: 6.0, TRANSACTIONAL: 3.0, BULK: 1.0}
+LANE_ACTIVE_SECONDS = 1.0
+
+# The lane of sends made in the current context; handlers default to interactive
+current_lane: contextvars.ContextVar = contextvars.ContextVar('outbound_lane', default=INTERACTIVE)
+
+@contextlib.contextmanager
+def send_lane(lane: int) -> Iterator[None]:
+    """Send everything inside the block on `lane` (asyncio tasks created inside inherit it)."""
+    token = current_lane.set(lane)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+# Kaedah klien yang menghantar mesej ke sesebuah chat (argumen pertama atau chat_id)
+SEND_METHODS = (
+    'send_message', 'send_photo', 'send_document', 'send_audio', 'send_video', 'send_animation',
+    'send_voice', 'send_sticker', 'send_media_group', 'copy_message', 'forward_message', 'forward_messages',
+)
+
+ChatId = Union[int, str]
+
+class ChatState:
+    """Per-chat send budget: next free slot and, for groups, the send times within the last minute."""
+
+    __slots__ = ('next_slot', 'window')
+
+    def __init__(self) -> None:
+        self.next_slot = 0.0
+        self.window: Deque[float] = deque(maxlen=GROUP_MESSAGES_PER_WINDOW)
+
+def is_group_chat(chat_id: ChatId) -> bool:
+    """Groups, supergroups and channels have negative chat IDs."""
+    return str(chat_id).startswith('-')
+
+def flood_wait_seconds(error: BaseException) -> Optional[float]:
+    """Return the wait Telegram asked for if `error` is a FloodWait/429, otherwise None."""
+    # Pyrogram: FloodWait.value (FloodWait.x pada versi lama)
+    if type(error).__name__ == 'FloodWait':
+        return float(getattr(error, 'value', None) or getattr(error, 'x', 0) or 0)
+    # pyTelegramBotAPI: ApiTelegramException dengan error_code 429 dan parameters.retry_after
+    if getattr(error, 'error_code', None) == 429:
+        result = getattr(error, 'result_json', None) or {}
+        return float(result.get('parameters', {}).get('retry_after', 1))
+    return None
+
+class OutboundLimiter:
+    """Process-wide outbound message scheduler shared by every bot client.
+
+    Each send reserves a slot that satisfies the global rate, the per-chat interval and the group
+    per-minute window, then sleeps until that slot. The global rate adapts AIMD-style: it grows
+    while sends succeed and is halved (with a global pause) whenever Telegram returns FloodWait.
+
+    Sends are split into priority lanes. A lane never queues behind lower lanes' reservations;
+    every slot it takes pushes the lower lanes back by one slot instead, so a running broadcast
+    yields to interactive replies while the total stays within the budget. While lower lanes are
+    active a higher lane is capped at its weighted share, so bulk traffic is never starved.
+    """
+
+    def __init__(self, max_rate: float = GLOBAL_RATE, min_rate: float = MIN_GLOBAL_RATE,
+                 per_chat_interval: float = PER_CHAT_INTERVAL, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.rate = max_rate
+        self.per_chat_interval = per_chat_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._lane_next: Dict[int, float] = {lane: 0.0 for lane in LANES}
+        self._lane_seen: Dict[int, float] = {lane: float('-inf') for lane in LANES}
+        self._paused_until = 0.0
+        self._chats: Dict[ChatId, ChatState] = {}
+        self._last_sweep = 0.0
+        self.flood_waits = 0
+
+    def _lane_rate(self, lane: int, now: float) -> float:
+        """The rate a lane may use; caller must hold the lock.
+
+        With lower lanes active it is capped at its weighted share so it cannot starve them;
+        otherwise it may use the whole rate (lower lanes already yield a slot for each of its sends).
+        """
+        self._lane_seen[lane] = now
+        active = [other for other in LANES if now - self._lane_seen[other] <= LANE_ACTIVE_SECONDS]
+        if not any(other > lane for other in active):
+            return self.rate
+        return self.rate * LANE_WEIGHTS[lane] / sum(LANE_WEIGHTS[other] for other in active)
+
+    def reserve(self, chat_id: Optional[ChatId] = None, lane: Optional[int] = None) -> float:
+        """Reserve the next send slot for a chat. Returns how many seconds the caller must wait."""
+        lane = current_lane.get() if lane is None else lane
+        with self._lock:
+            now = self.clock()
+            # The global budget is taken at its own earliest slot so one slow chat does not hold up the others
+            slot = max(now, self._lane_next[lane], self._paused_until)
+            self._lane_next[lane] = slot + 1.0 / self._lane_rate(lane, now)
+            for lower in LANES[lane + 1:]:
+                self._lane_next[lower] = max(self._lane_next[lower], now) + 1.0 / self.rate
+            if chat_id is not None:
+                state = self._chats.get(chat_id)
+                if state is None:
+                    state = self._chats[chat_id] = ChatState()
+                slot = max(slot, state.next_slot)
+                if is_group_chat(chat_id) and len(state.window) == state.window.maxlen:
+                    slot = max(slot, state.window[0] + GROUP_WINDOW_SECONDS)
+                state.next_slot = slot + self.per_chat_interval
+                if is_group_chat(chat_id):
+                    state.window.append(slot)
+            if now - self._last_sweep > CHAT_IDLE_SECONDS:
+                self._sweep(now)
+            return slot - now
+
+    def _sweep(self, now: float) -> None:
+        """Forget chats whose budget has fully recovered; caller must hold the lock."""
+        self._chats = {
+            chat_id: state for chat_id, state in self._chats.items()
+            if state.next_slot > now - CHAT_IDLE_SECONDS
+            or (state.window and state.window[-1] > now - GROUP_WINDOW_SECONDS)
+        }
+        self._last_sweep = now
+
+    def acquire(self, chat_id: Optional[ChatId] = None) -> None:
+        """Block the calling thread until the chat may be sent to."""
+        delay = self.reserve(chat_id)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, chat_id: Optional[ChatId] = None) -> None:
+        """Wait without blocking the event loop until the chat may be sent to."""
+        delay = self.reserve(chat_id)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self) -> None:
+        """Additive increase: recover roughly one msg/s per second of successful sending."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + ADDITIVE_INCREASE / self.rate)
+
+    def on_flood_wait(self, seconds: float) -> None:
+        """Multiplicative decrease and pause every sender until Telegram's wait has passed.
+
+        FloodWaits that arrive while already paused belong to the same burst and only extend the pause.
+        """
+        with self._lock:
+            self.flood_waits += 1
+            now = self.clock()
+            if self._paused_until <= now:
+                self.rate = max(self.min_rate, self.rate * MULTIPLICATIVE_DECREASE)
+            self._paused_until = max(self._paused_until, now + seconds)
+        logger.warning(f"FloodWait {seconds:.0f}s; kadar keluar dikurangkan kepada {self.rate:.1f} mesej/saat.")
+
+    def paused_for(self) -> float:
+        """Return how long all senders are paused because of a FloodWait (0 if not paused)."""
+        return max(self._paused_until - self.clock(), 0.0)
+
+    def _flood_retries(self) -> int:
+        """Bulk sends are not retried here: the broadcast engine pauses all its workers and retries them itself."""
+        return 0 if current_lane.get() == BULK else MAX_FLOOD_RETRIES
+
+    def send(self, func: Callable[..., Any], chat_id: Optional[ChatId], *args: Any, **kwargs: Any) -> Any:
+        """Call a blocking send function within the budget, retrying after FloodWait."""
+        retries = self._flood_retries()
+        for attempt in range(retries + 1):
+            self.acquire(chat_id)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                wait = flood_wait_seconds(e)
+                if wait is None:
+                    raise
+                self.on_flood_wait(wait)
+                if attempt == retries:
+                    raise
+                continue
+            self.on_success()
+            return result
+
+    async def send_async(self, func: Callable[..., Any], chat_id: Optional[ChatId], *args: Any, **kwargs: Any) -> Any:
+        """Await a coroutine send function within the budget, retrying after FloodWait."""
+        retries = self._flood_retries()
+        for attempt in range(retries + 1):
+            await self.acquire_async(chat_id)
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                wait = flood_wait_seconds(e)
+                if wait is None:
+                    raise
+                self.on_flood_wait(wait)
+                if attempt == retries:
+                    raise
+                continue
+            self.on_success()
+            return result
+
+_limiter: Optional[OutboundLimiter] = None
+_limiter_lock = threading.Lock()
+
+def get_outbound_limiter() -> OutboundLimiter:
+    """Return the process-wide outbound limiter."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = OutboundLimiter()
+        return _limiter
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+def _throttled(method: Callable[..., Any], limiter: OutboundLimiter) -> Callable[..., Any]:
+    """Wrap a bound send method so it goes through the outbound limiter.
+
+    Pyrogram methods are coroutines inside the event loop and blocking elsewhere, so the wrapper
+    picks the async or blocking path at call time.
+    """
+    is_coroutine = inspect.iscoroutinefunction(method)
+
+    @functools.wraps(method)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        chat_id = kwargs.get('chat_id', args[0] if args else None)
+        if is_coroutine or _in_event_loop():
+            return limiter.send_async(_as_coroutine(method), chat_id, *args, **kwargs)
+        return limiter.send(method, chat_id, *args, **kwargs)
+
+    return wrapper
+
+def _as_coroutine(method: Callable[..., Any]) -> Callable[..., Any]:
+    async def call(*args: Any, **kwargs: Any) -> Any:
+        result = method(*args, **kwargs)
+        return await result if inspect.isawaitable(result) else result
+    return call
+
+def throttle_client(client: Any, limiter: Optional[OutboundLimiter] = None) -> Any:
+    """Route every send method of a Pyrogram Client or TeleBot through the shared outbound limiter."""
+    limiter = limiter or get_outbound_limiter()
+    for name in SEND_METHODS:
+        method = getattr(client, name, None)
+        if method is not None and not getattr(method, '_throttled', False):
+            wrapper = _throttled(method, limiter)
+            wrapper._throttled = True
+            setattr(client, name, wrapper)
+    return client
@@ -6,6 +6,7 @@ import requests
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Optional
+from outbound_limiter import TRANSACTIONAL, send_lane
 
 # Konfigurasi logger
 logging.basicConfig(level=logging.INFO)
@@ -95,14 +96,17 @@ def process_payment(client: 'Client', message: 'types.Message') -> None:
     
     category_code = create_category()
     if not category_code:
-        client.send_message(message.chat.id, "Failed to create payment category. Please try again later.")
+        with send_lane(TRANSACTIONAL):
+            client.send_message(message.chat.id, "Failed to create payment category. Please try again later.")
         return
     
     price_code = 1000  # Example: RM10 (in cents)
     item_name = "premium_access"
     
     payment_url = create_bill(category_code, user_id, price_code, item_name)
-    if payment_url:
-        client.send_message(message.chat.id, f"Please complete your payment by visiting: {payment_url}")
-    else:
-        client.send_message(message.chat.id, "Failed to create payment link. Please try again later.")
+    # Pautan pembayaran dihantar melalui lorong transaksi supaya tidak beratur di belakang siaran
+    with send_lane(TRANSACTIONAL):
+        if payment_url:
+            client.send_message(message.chat.id, f"Please complete your payment by visiting: {payment_url}")
+        else:
+            client.send_message(message.chat.id, "Failed to create payment link. Please try again later.")
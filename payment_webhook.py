@@ -1,24 +1,14 @@
 from flask import Flask, request, jsonify
-import os
 import hmac
 import hashlib
 import logging
-import json
 from config import TOYYIBPAY_SECRET_KEY
+from subscription_store import get_subscription_store
 
 app = Flask(__name__)
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-def initialize_paid_user_ids_file():
-    """Create or initialize the paid_user_ids.json file."""
-    if not os.path.exists('paid_user_ids.json'):
-        with open('paid_user_ids.json', 'w') as file:
-            json.dump([], file)
-            print("Created paid_user_ids.json with an empty list.")
-
-initialize_paid_user_ids_file()
-
 # Fungsi untuk memeriksa tandatangan (signature) untuk keselamatan
 def verify_signature(params, secret_key):
     signature = params.pop('signature', '')
@@ -39,12 +29,7 @@ def payment_return():
 
         if payment_status == "paid":
             user_id = int(invoice_no.split('-')[1])
-            with open('paid_user_ids.json', 'r+') as file:
-                paid_user_ids = json.load(file)
-                if user_id not in paid_user_ids:
-                    paid_user_ids.append(user_id)
-                    file.seek(0)
-                    json.dump(paid_user_ids, file)
+            get_subscription_store().grant(user_id, source='payment_return')
             
             logger.info(f"Payment successful for user_id: {user_id}")
             return jsonify({"status": "success", "message": "Payment successful"}), 200
@@ -0,0 +1,280 @@
+import asyncio
+import atexit
+import sqlite3
+import threading
+import time
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pyrogram import Client, raw, utils
+from pyrogram.handlers import RawUpdateHandler
+from broadcast_engine import SendFunc
+from outbound_limiter import flood_wait_seconds
+from user_repository import USER_DB_PATH
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+# Telegram menerima sehingga 200 ID bagi setiap users.GetUsers / channels.GetChannels
+PEER_BATCH_SIZE = 200
+# Bajet permintaan pemanasan yang berasingan daripada had penghantaran mesej
+WARMUP_REQUESTS_PER_SECOND = 2.0
+HARVEST_FLUSH_EVERY = 100
+HARVEST_FLUSH_SECONDS = 5.0
+# Kumpulan pengendali berasingan supaya penuaian tidak menjejaskan pengendali mesej
+HARVEST_HANDLER_GROUP = -100
+
+# (peer_id, access_hash, type, username, phone_number) as stored by Pyrogram's session storage
+PeerRow = Tuple[int, int, str, Optional[str], Optional[str]]
+
+_session_query_lock = threading.Lock()
+
+def bot_id_of(client: Client) -> Optional[int]:
+    """Access hashes are only valid for the bot that saw them, so shared peers are keyed by bot ID.
+
+    Returns None when the client has no usable bot token, in which case nothing is shared.
+    """
+    prefix = str(client.bot_token or '').split(':')[0]
+    return int(prefix) if prefix.isdigit() else None
+
+def missing_from_session(conn: sqlite3.Connection, peer_ids: List[int]) -> List[int]:
+    """Return the IDs absent from a Pyrogram session's peers table, with one set-difference query.
+
+    Uses the session's own connection so peers cached but not yet committed count as known.
+    """
+    with _session_query_lock, conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS warm_peer_ids (id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM temp.warm_peer_ids")
+        conn.executemany("INSERT OR IGNORE INTO temp.warm_peer_ids (id) VALUES (?)", ((peer_id,) for peer_id in peer_ids))
+        missing = [row[0] for row in conn.execute("SELECT id FROM temp.warm_peer_ids EXCEPT SELECT id FROM main.peers")]
+        conn.execute("DROP TABLE temp.warm_peer_ids")
+    return missing
+
+def peer_rows(peers: Iterable[Any]) -> List[PeerRow]:
+    """Convert raw users/chats/channels into storage rows, skipping 'min' peers that carry no usable hash."""
+    rows = []
+    for peer in peers:
+        if getattr(peer, 'min', False):
+            continue
+        username = getattr(peer, 'username', None)
+        username = username.lower() if username else None
+        if isinstance(peer, raw.types.User):
+            rows.append((peer.id, peer.access_hash, 'bot' if peer.bot else 'user', username, peer.phone))
+        elif isinstance(peer, (raw.types.Channel, raw.types.ChannelForbidden)):
+            peer_type = 'channel' if peer.broadcast else 'supergroup'
+            rows.append((utils.get_channel_id(peer.id), peer.access_hash, peer_type, username, None))
+    return rows
+
+class PeerStore:
+    """Peers (with access hashes) harvested by every Pyrogram session of the same bot, shared through users.db.
+
+    Each session file only knows the peers that session has seen; this table lets the broadcast
+    session import peers first met by another process instead of resolving them over the API.
+    """
+
+    def __init__(self, db_path: str = USER_DB_PATH) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS shared_peers (
+                    bot_id INTEGER NOT NULL,
+                    peer_id INTEGER NOT NULL,
+                    access_hash INTEGER NOT NULL,
+                    type TEXT NOT NULL,
+                    username TEXT,
+                    phone_number TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (bot_id, peer_id)
+                )
+            """)
+        self._pending: Dict[Tuple[int, int], Tuple] = {}
+        self._last_flush = time.monotonic()
+
+    def record(self, bot_id: int, rows: Iterable[PeerRow]) -> None:
+        """Buffer harvested peers; written in batches."""
+        now = time.time()
+        with self._lock:
+            for row in rows:
+                self._pending[(bot_id, row[0])] = (bot_id, *row, now)
+            due = len(self._pending) >= HARVEST_FLUSH_EVERY or time.monotonic() - self._last_flush >= HARVEST_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "REPLACE INTO shared_peers (bot_id, peer_id, access_hash, type, username, phone_number, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    list(pending.values())
+                )
+        except Exception as e:
+            logger.error(f"Ralat menyimpan peer: {e}")
+
+    def lookup(self, bot_id: int, peer_ids: List[int]) -> List[PeerRow]:
+        """Return the stored rows for whichever of `peer_ids` are known."""
+        self.flush()
+        rows: List[PeerRow] = []
+        for start in range(0, len(peer_ids), 500):
+            chunk = peer_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows.extend(self._conn.execute(
+                f"SELECT peer_id, access_hash, type, username, phone_number FROM shared_peers"
+                f" WHERE bot_id = ? AND peer_id IN ({placeholders})",
+                (bot_id, *chunk)
+            ).fetchall())
+        return rows
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+_peer_store: Optional[PeerStore] = None
+_peer_store_lock = threading.Lock()
+
+def get_peer_store() -> PeerStore:
+    """Return the process-wide shared peer table."""
+    global _peer_store
+    with _peer_store_lock:
+        if _peer_store is None:
+            _peer_store = PeerStore()
+            atexit.register(_peer_store.close)
+        return _peer_store
+
+def harvest_peers(client: Client) -> Client:
+    """Record every user and channel seen in this client's updates in the shared peer table."""
+    async def harvest(_: Client, update: Any, users: Dict[int, Any], chats: Dict[int, Any]) -> None:
+        # Resolved per update rather than at import, so a client built before its token is set still imports
+        bot_id = bot_id_of(client)
+        if bot_id is None:
+            return
+        rows = peer_rows(list(users.values()) + list(chats.values()))
+        if rows:
+            get_peer_store().record(bot_id, rows)
+
+    client.add_handler(RawUpdateHandler(harvest), group=HARVEST_HANDLER_GROUP)
+    return client
+
+class PeerWarmer:
+    """Make sure a client's session can address every recipient before a broadcast starts.
+
+    Missing peers are first imported from the shared peer table (no API calls), then the rest are
+    resolved in batches of 200 with users.GetUsers / channels.GetChannels on a request budget of
+    its own, so the send phase never pays for peer resolution.
+    """
+
+    def __init__(self, client: Client, batch_size: int = PEER_BATCH_SIZE,
+                 requests_per_second: float = WARMUP_REQUESTS_PER_SECOND) -> None:
+        self.client = client
+        self.batch_size = batch_size
+        self.interval = 1.0 / requests_per_second
+        self._next_request = 0.0
+
+    def _missing(self, peer_ids: Iterable[Any]) -> List[int]:
+        # Basic groups are addressed without an access hash, so they are never missing
+        candidates = [peer_id for peer_id in peer_ids if isinstance(peer_id, int) and utils.get_peer_type(peer_id) != 'chat']
+        return missing_from_session(self.client.storage.conn, candidates) if candidates else []
+
+    async def missing(self, peer_ids: Iterable[Any]) -> List[int]:
+        """Return the IDs the session has no access hash for, computed off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._missing, peer_ids)
+
+    async def _invoke(self, query: Any) -> Any:
+        """Invoke a resolution request within the warmup budget, waiting out FloodWait."""
+        while True:
+            loop = asyncio.get_running_loop()
+            delay = self._next_request - loop.time()
+            self._next_request = max(self._next_request, loop.time()) + self.interval
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await self.client.invoke(query)
+            except Exception as e:
+                wait = flood_wait_seconds(e)
+                if wait is None:
+                    raise
+                logger.warning(f"FloodWait {wait:.0f}s semasa memanaskan peer.")
+                await asyncio.sleep(wait)
+
+    async def _resolve(self, peer_ids: List[int]) -> List[Any]:
+        """Resolve one batch of same-type IDs over the API and return the raw peers."""
+        if peer_ids[0] > 0:
+            result = await self._invoke(raw.functions.users.GetUsers(
+                id=[raw.types.InputUser(user_id=peer_id, access_hash=0) for peer_id in peer_ids]
+            ))
+            return list(result)
+        result = await self._invoke(raw.functions.channels.GetChannels(
+            id=[raw.types.InputChannel(channel_id=utils.get_channel_id(peer_id), access_hash=0) for peer_id in peer_ids]
+        ))
+        return list(result.chats)
+
+    async def warm(self, peer_ids: Iterable[Any]) -> Dict[str, int]:
+        """Cache every missing peer in the session. Returns counts of imported, resolved and unresolved peers."""
+        missing = await self.missing(peer_ids)
+        counts = {'missing': len(missing), 'imported': 0, 'resolved': 0, 'unresolved': 0}
+        if not missing:
+            return counts
+
+        bot_id = bot_id_of(self.client)
+        known = get_peer_store().lookup(bot_id, missing) if bot_id is not None else []
+        if known:
+            await self.client.storage.update_peers(known)
+            counts['imported'] = len(known)
+        imported = {row[0] for row in known}
+        remaining = [peer_id for peer_id in missing if peer_id not in imported]
+
+        for kind in ([peer_id for peer_id in remaining if peer_id > 0], [peer_id for peer_id in remaining if peer_id < 0]):
+            for start in range(0, len(kind), self.batch_size):
+                batch = kind[start:start + self.batch_size]
+                try:
+                    rows = peer_rows(await self._resolve(batch))
+                except Exception as e:
+                    logger.error(f"Ralat memanaskan {len(batch)} peer: {e}")
+                    counts['unresolved'] += len(batch)
+                    continue
+                await self.client.storage.update_peers(rows)
+                if bot_id is not None:
+                    get_peer_store().record(bot_id, rows)
+                counts['resolved'] += len(rows)
+                counts['unresolved'] += len(batch) - len(rows)
+        logger.info(f"Pemanasan peer: {counts}")
+        return counts
+
+async def warm_peers(client: Client, peer_ids: Iterable[Any]) -> Dict[str, int]:
+    """Bulk-resolve a broadcast audience into the client's peer cache ahead of the send phase."""
+    return await PeerWarmer(client).warm(peer_ids)
+
+class UnresolvedPeer(Exception):
+    """A send failed with PeerIdInvalid even after the peer was warmed, so this bot cannot address the chat."""
+
+def resolving_sender(client: Client, send: SendFunc) -> SendFunc:
+    """Wrap a broadcast sender so PeerIdInvalid is treated as a missing access hash, not a dead recipient.
+
+    On PeerIdInvalid the peer is warmed (shared table, then the API) and the send is retried once.
+    If the peer could not be resolved the original error propagates as a transient failure (the
+    recipient stays pending); only a resolved peer failing again raises UnresolvedPeer, which the
+    engine and recipient health treat as permanent.
+    """
+    async def send_resolved(chat_id: int) -> Any:
+        try:
+            return await send(chat_id)
+        except Exception as e:
+            if type(e).__name__ != 'PeerIdInvalid':
+                raise
+            counts = await warm_peers(client, [chat_id])
+            if counts['unresolved']:
+                raise
+        try:
+            return await send(chat_id)
+        except Exception as e:
+            if type(e).__name__ == 'PeerIdInvalid':
+                raise UnresolvedPeer(f"Peer {chat_id} is still invalid after warming: {e}") from e
+            raise
+
+    return send_resolved
@@ -0,0 +1,118 @@
+import math
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from tier_index import FREEMIUM, PREMIUM
+from usage_counters import tier_of
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+IDLE_TTL_SECONDS = 600.0
+
+# feature -> (kapasiti baldi, token diisi semula sesaat); burst dibenarkan sehingga kapasiti
+TIER_RATES: Dict[str, Dict[str, Tuple[float, float]]] = {
+    FREEMIUM: {
+        "chatgpt": (3, 1 / 20),
+        "convert": (3, 1 / 10),
+        "downloader": (2, 1 / 15),
+    },
+    PREMIUM: {
+        "chatgpt": (10, 1 / 3),
+        "convert": (10, 1 / 2),
+        "downloader": (5, 1 / 5),
+    },
+}
+
+# (user_id, feature) -> [tokens, last_refill]
+Bucket = list
+
+class TokenBucketLimiter:
+    """Per-(user, feature) token buckets with O(1) state per active key.
+
+    Keys are kept in least-recently-used order so idle buckets (which would be full again anyway)
+    are evicted from the front without scanning every key.
+    """
+
+    def __init__(self, rates: Dict[str, Dict[str, Tuple[float, float]]] = None,
+                 tier_of: Optional[Callable[[int], str]] = None, idle_ttl: float = IDLE_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.rates = rates or TIER_RATES
+        self.tier_of = tier_of or (lambda user_id: FREEMIUM)
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[Tuple[int, str], Bucket]" = OrderedDict()
+
+    def rate(self, user_id: int, feature: str) -> Optional[Tuple[float, float]]:
+        """Return (capacity, refill per second) for the user's tier, or None if the feature is unlimited."""
+        return self.rates.get(self.tier_of(user_id), self.rates.get(FREEMIUM, {})).get(feature)
+
+    def _evict_idle(self, now: float) -> None:
+        """Drop buckets untouched for longer than idle_ttl; caller must hold the lock."""
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket[1] < self.idle_ttl:
+                break
+            del self._buckets[key]
+
+    def acquire(self, user_id: int, feature: str, cost: float = 1.0) -> float:
+        """Take `cost` tokens. Returns 0 if allowed, otherwise the seconds to wait before retrying."""
+        rate = self.rate(user_id, feature)
+        if rate is None:
+            return 0.0
+        capacity, refill = rate
+        now = self.clock()
+        key = (user_id, feature)
+        with self._lock:
+            self._evict_idle(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [capacity, now]
+                self._buckets[key] = bucket
+            else:
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * refill)
+                bucket[1] = now
+                self._buckets.move_to_end(key)
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / refill if refill > 0 else float('inf')
+
+    def allow(self, user_id: int, feature: str, cost: float = 1.0) -> bool:
+        """Check whether the user may use the feature right now, consuming a token if so."""
+        return self.acquire(user_id, feature, cost) == 0.0
+
+    def reset(self, user_id: int, feature: Optional[str] = None) -> None:
+        """Forget a user's buckets (e.g. after a tier change)."""
+        with self._lock:
+            for key in [key for key in self._buckets if key[0] == user_id and feature in (None, key[1])]:
+                del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+_limiter: Optional[TokenBucketLimiter] = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> TokenBucketLimiter:
+    """Return the process-wide rate limiter with per-tier rates."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = TokenBucketLimiter(tier_of=tier_of)
+        return _limiter
+
+def check_rate(user_id: int, feature: str) -> float:
+    """Return 0 if the user may proceed, otherwise the seconds until the next request is allowed."""
+    try:
+        return get_rate_limiter().acquire(user_id, feature)
+    except Exception as e:
+        logger.error(f"Ralat menyemak had kadar: {e}")
+        return 0.0
+
+def retry_after(wait: float) -> int:
+    """Round a wait from check_rate up to whole seconds for user-facing messages (never "0 seconds")."""
+    return max(1, math.ceil(wait))
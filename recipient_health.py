@@ -0,0 +1,203 @@
+import atexit
+import sqlite3
+import threading
+import time
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from audience import Audience
+from user_repository import USER_DB_PATH
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+# Penerima mati dicuba semula selepas tempoh ini, berganda bagi setiap kegagalan berturut-turut
+PROBE_AFTER_SECONDS = 7 * 24 * 3600.0
+MAX_PROBE_AFTER_SECONDS = 90 * 24 * 3600.0
+
+BLOCKED = 'blocked'
+DEACTIVATED = 'deactivated'
+INVALID = 'invalid'
+FORBIDDEN = 'forbidden'
+
+# Pyrogram error class name -> health status
+ERROR_STATUSES = {
+    'UserIsBlocked': BLOCKED,
+    'InputUserDeactivated': DEACTIVATED,
+    'UserDeactivated': DEACTIVATED,
+    'UserDeactivatedBan': DEACTIVATED,
+    # PeerIdInvalid only means the session has no access hash yet; it becomes UnresolvedPeer once warming failed
+    'UnresolvedPeer': INVALID,
+    'ChatIdInvalid': INVALID,
+    'ChannelInvalid': INVALID,
+    'UserIsBot': INVALID,
+    'ChatWriteForbidden': FORBIDDEN,
+    'ChannelPrivate': FORBIDDEN,
+    'ChatAdminRequired': FORBIDDEN,
+}
+
+UPSERT_SQL = """
+    INSERT INTO recipient_health (chat_id, status, error, failures, first_failed_at, last_failed_at, next_probe_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(chat_id) DO UPDATE SET
+        status = excluded.status,
+        error = excluded.error,
+        failures = excluded.failures,
+        last_failed_at = excluded.last_failed_at,
+        next_probe_at = excluded.next_probe_at
+"""
+
+def classify(error: Optional[BaseException]) -> Optional[str]:
+    """Return the health status a delivery error implies, or None if the error is transient."""
+    if error is None:
+        return None
+    status = ERROR_STATUSES.get(type(error).__name__)
+    if status is None and getattr(error, 'error_code', None) in (400, 403):
+        # pyTelegramBotAPI hanya memberi kod dan penerangan
+        description = str(error).lower()
+        if 'blocked' in description:
+            status = BLOCKED
+        elif 'deactivated' in description:
+            status = DEACTIVATED
+        elif 'not found' in description or 'invalid' in description:
+            status = INVALID
+        else:
+            status = FORBIDDEN
+    return status
+
+class RecipientHealth:
+    """Table of recipients that can no longer be reached, used to prune broadcast audiences.
+
+    Dead recipients are excluded until their `next_probe_at`; after that they are included once more
+    as a re-probe. A successful delivery or a /start revives them, another permanent failure doubles the backoff.
+    Writes are buffered and flushed once per broadcast run.
+    """
+
+    def __init__(self, db_path: str = USER_DB_PATH, probe_after: float = PROBE_AFTER_SECONDS) -> None:
+        self.db_path = db_path
+        self.probe_after = probe_after
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS recipient_health (
+                    chat_id INTEGER PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    failures INTEGER NOT NULL DEFAULT 1,
+                    first_failed_at REAL NOT NULL,
+                    last_failed_at REAL NOT NULL,
+                    next_probe_at REAL NOT NULL
+                )
+            """)
+        # chat_id -> (status, failures, first_failed_at, next_probe_at)
+        self._dead: Dict[int, Tuple[str, int, float, float]] = {}
+        self._pending: Dict[int, Optional[Tuple]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        rows = self._conn.execute(
+            "SELECT chat_id, status, failures, first_failed_at, next_probe_at FROM recipient_health"
+        ).fetchall()
+        self._dead = {chat_id: (status, failures, first, probe) for chat_id, status, failures, first, probe in rows}
+
+    def record(self, chat_id: int, ok: bool, error: Optional[BaseException]) -> None:
+        """Broadcast result hook: mark permanently failed recipients dead, revive ones that got through."""
+        if ok:
+            self.revive(chat_id)
+            return
+        status = classify(error)
+        if status is None:
+            return
+        now = time.time()
+        with self._lock:
+            _, failures, first_failed_at, _ = self._dead.get(chat_id, (status, 0, now, now))
+            failures += 1
+            next_probe_at = now + min(self.probe_after * 2 ** (failures - 1), MAX_PROBE_AFTER_SECONDS)
+            self._dead[chat_id] = (status, failures, first_failed_at, next_probe_at)
+            self._pending[chat_id] = (chat_id, status, f"{type(error).__name__}: {error}"[:200], failures,
+                                      first_failed_at, now, next_probe_at)
+
+    def revive(self, chat_id: int) -> None:
+        """Include a recipient in broadcasts again (a delivery got through, or the user sent /start)."""
+        if chat_id in self._dead:
+            with self._lock:
+                self._dead.pop(chat_id, None)
+                self._pending[chat_id] = None
+
+    def flush(self) -> int:
+        """Write buffered health changes. Returns the number of rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        upserts = [row for row in pending.values() if row is not None]
+        revived = [(chat_id,) for chat_id, row in pending.items() if row is None]
+        try:
+            with self._conn:
+                self._conn.executemany(UPSERT_SQL, upserts)
+                self._conn.executemany("DELETE FROM recipient_health WHERE chat_id = ?", revived)
+        except Exception as e:
+            logger.error(f"Ralat menyimpan kesihatan penerima: {e}")
+            with self._lock:
+                for chat_id, row in pending.items():
+                    self._pending.setdefault(chat_id, row)
+            return 0
+        return len(pending)
+
+    def is_dead(self, chat_id: int, now: Optional[float] = None) -> bool:
+        """Check whether a recipient is dead and not yet due for a re-probe."""
+        entry = self._dead.get(chat_id)
+        return entry is not None and entry[3] > (now or time.time())
+
+    def excluded(self) -> Audience:
+        """Return every recipient currently excluded from broadcasts."""
+        now = time.time()
+        with self._lock:
+            return Audience.from_ids(chat_id for chat_id, entry in self._dead.items() if entry[3] > now)
+
+    def prune(self, ids: Iterable[int]) -> Tuple[Audience, int]:
+        """Drop dead recipients from an audience. Returns (pruned audience, number removed)."""
+        audience = ids if isinstance(ids, Audience) else Audience.from_ids(ids)
+        if not self._dead:
+            return audience, 0
+        pruned = audience - self.excluded()
+        return pruned, len(audience) - len(pruned)
+
+    def due_for_probe(self) -> List[int]:
+        """Return dead recipients whose backoff has passed; the next broadcast re-probes them."""
+        now = time.time()
+        with self._lock:
+            return [chat_id for chat_id, entry in self._dead.items() if entry[3] <= now]
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of excluded recipients per status."""
+        now = time.time()
+        with self._lock:
+            return dict(Counter(entry[0] for entry in self._dead.values() if entry[3] > now))
+
+    def report(self) -> str:
+        """Human-readable summary for admins."""
+        counts = self.counts()
+        lines = [f"{status}: {count}" for status, count in sorted(counts.items())]
+        lines.append(f"total excluded: {sum(counts.values())}")
+        lines.append(f"due for re-probe: {len(self.due_for_probe())}")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        """Flush pending changes and close the connection."""
+        self.flush()
+        self._conn.close()
+
+_health: Optional[RecipientHealth] = None
+_health_lock = threading.Lock()
+
+def get_recipient_health() -> RecipientHealth:
+    """Return the process-wide recipient health table."""
+    global _health
+    with _health_lock:
+        if _health is None:
+            _health = RecipientHealth()
+            atexit.register(_health.close)
+        return _health
@@ -0,0 +1,115 @@
+import os
+import re
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+from apscheduler.job import Job
+from apscheduler.triggers.base import BaseTrigger
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from broadcast_content import Content, describe
+from scheduler_service import add_ready_check, get_scheduler
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+# Runner = (segment, content, entity_type, window) -> None; each bot process registers the one bound to its client
+Runner = Callable[[str, Content, str, Optional[float]], Any]
+
+# Jadual berulang ditafsir dalam waktu Malaysia dan dianjakkan secara rawak supaya tidak semua bermula serentak
+SCHEDULE_TIMEZONE = os.getenv('SCHEDULE_TIMEZONE', 'Asia/Kuala_Lumpur')
+SCHEDULE_JITTER_SECONDS = 120
+INTERVAL_PATTERN = re.compile(r'^every\s+(\d+)\s*([mhd])$', re.IGNORECASE)
+DAILY_PATTERN = re.compile(r'^daily\s+(\d{1,2}):(\d{2})$', re.IGNORECASE)
+INTERVAL_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days'}
+CRON_FIELDS = ('minute', 'hour', 'day', 'month', 'day_of_week')
+SCHEDULE_HELP = (
+    "Schedule formats: 'every 6h' (m/h/d), 'daily 20:00', or a cron expression "
+    f"'minute hour day month day_of_week' such as '0 20 * * mon-fri'. Times are in {SCHEDULE_TIMEZONE}."
+)
+
+# name -> (runner, is_ready); is_ready reports whether the runner's client is running in this process
+_runners: Dict[str, Tuple[Runner, Callable[[], bool]]] = {}
+
+def register_runner(name: str, runner: Runner, is_ready: Callable[[], bool]) -> None:
+    """Register the function that sends scheduled broadcasts for a bot module (e.g. 'broadcast', 'admintf').
+
+    `is_ready` must return True only while the runner's client is running; a module can be imported
+    (and register its runner) in a process that never starts its client.
+    """
+    _runners[name] = (runner, is_ready)
+
+def _ready_runner(preferred: str) -> Optional[Tuple[str, Runner]]:
+    """The preferred runner if its client is running, otherwise any runner whose client is."""
+    names = [preferred] + [name for name in _runners if name != preferred]
+    for name in names:
+        entry = _runners.get(name)
+        if entry is not None and entry[1]():
+            return name, entry[0]
+    return None
+
+def has_ready_runner() -> bool:
+    """Whether this process can deliver a scheduled broadcast now (the scheduler only runs jobs while it can)."""
+    return any(is_ready() for _, is_ready in _runners.values())
+
+add_ready_check(has_ready_runner)
+
+def fire_broadcast(runner: str, segment: str, content: Content, entity_type: str,
+                   window: Optional[float] = None) -> None:
+    """Scheduler entry point. Jobs store only these references; the audience is resolved from the segment now."""
+    ready = _ready_runner(runner)
+    if ready is None:
+        logger.error(f"Tiada pelari siaran yang kliennya berjalan; siaran berjadual ke {segment} dilangkau.")
+        return
+    name, send = ready
+    if name != runner:
+        # Every module sends as the same bot, so whichever runner is running here can deliver it
+        logger.warning(f"Pelari siaran '{runner}' tidak berjalan dalam proses ini; menggunakan '{name}'.")
+    send(segment, content, entity_type, window)
+
+def parse_schedule(spec: str, jitter: int = SCHEDULE_JITTER_SECONDS) -> BaseTrigger:
+    """Turn 'every 6h', 'daily 20:00' or a five-field cron expression into a trigger. Raises ValueError."""
+    spec = ' '.join(spec.split())
+    match = INTERVAL_PATTERN.match(spec)
+    if match:
+        amount = int(match.group(1))
+        if amount <= 0:
+            raise ValueError("The interval must be positive.")
+        return IntervalTrigger(**{INTERVAL_UNITS[match.group(2).lower()]: amount},
+                               timezone=SCHEDULE_TIMEZONE, jitter=jitter)
+    match = DAILY_PATTERN.match(spec)
+    if match:
+        return CronTrigger(hour=int(match.group(1)), minute=int(match.group(2)),
+                           timezone=SCHEDULE_TIMEZONE, jitter=jitter)
+    fields = spec.split(' ')
+    if len(fields) != len(CRON_FIELDS):
+        raise ValueError(f"Unrecognised schedule '{spec}'.")
+    return CronTrigger(**dict(zip(CRON_FIELDS, fields)), timezone=SCHEDULE_TIMEZONE, jitter=jitter)
+
+def add_broadcast_job(runner: str, segment: str, content: Content, entity_type: str,
+                      trigger: Any, window: Optional[float] = None) -> Job:
+    """Add a persisted broadcast job: (runner, segment name, message reference) instead of a recipient list.
+
+    Recurring runs missed during downtime are coalesced into one, and a run is skipped rather than
+    started while the previous run of the same broadcast is still sending.
+    """
+    return get_scheduler().add_job(
+        fire_broadcast, trigger, args=[runner, segment, content, entity_type, window],
+        name=f"{entity_type} ({segment}): {describe(content)}", coalesce=True, max_instances=1,
+    )
+
+def format_jobs() -> str:
+    """List all scheduled jobs."""
+    jobs = get_scheduler().get_jobs(jobstore='default')
+    if not jobs:
+        return "No scheduled jobs."
+    return "\n".join(
+        f"ID: {job.id}, {job.name}, Next run time: {job.next_run_time}, Trigger: {job.trigger}" for job in jobs
+    )
+
+def cancel_job(job_id: str) -> str:
+    """Cancel a scheduled job by its ID."""
+    scheduler = get_scheduler()
+    if scheduler.get_job(job_id, jobstore='default'):
+        scheduler.remove_job(job_id, jobstore='default')
+        return f"Job with ID {job_id} has been canceled."
+    return f"No job found with ID {job_id}."
@@ -0,0 +1,137 @@
+import atexit
+import fcntl
+import os
+import threading
+import logging
+from typing import IO, Callable, List, Optional
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlite_jobstore import SQLiteJobStore
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+SCHEDULER_TABLE = 'scheduled_jobs'
+# Kerja siaran hanya menyerahkan penghantaran kepada gelung acara klien, jadi beberapa benang sudah mencukupi
+SEND_WORKERS = 4
+# Larian yang terlepas (contohnya semasa bot dimulakan semula) masih dijalankan jika lewat tidak lebih daripada ini
+MISFIRE_GRACE_SECONDS = 600
+# Proses yang menjalankan kerja menyemak semula jadual sekurang-kurangnya sekali setiap tempoh ini
+POLL_SECONDS = 60
+# Proses yang dijeda cuba mengambil alih kerja berjadual (atau menyerahkannya) sekerap ini
+LEADER_RETRY_SECONDS = 15
+LOCK_FILE = os.getenv('SCHEDULER_LOCK_FILE', 'scheduler.lock')
+
+_scheduler: Optional[BackgroundScheduler] = None
+_scheduler_lock = threading.Lock()
+_lock_file: Optional[IO] = None
+_leadership_lock = threading.Lock()
+_ready_checks: List[Callable[[], bool]] = []
+_stopped = threading.Event()
+
+def get_scheduler() -> BackgroundScheduler:
+    """Return the process-wide scheduler that every module registers its jobs with (not started here).
+
+    Jobs live in one SQLite table, so a job added by one bot module can be listed and cancelled from any other.
+    Jobs run on a small thread pool (broadcast runners hand their sends to the client's event loop).
+    Missed runs are coalesced into one, and a job never overlaps itself.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = BackgroundScheduler(
+                jobstores={
+                    'default': SQLiteJobStore(tablename=SCHEDULER_TABLE),
+                    'local': MemoryJobStore(),
+                },
+                executors={
+                    'default': ThreadPoolExecutor(SEND_WORKERS),
+                },
+                job_defaults={
+                    'coalesce': True,
+                    'max_instances': 1,
+                    'misfire_grace_time': MISFIRE_GRACE_SECONDS,
+                },
+            )
+        return _scheduler
+
+def add_ready_check(check: Callable[[], bool]) -> None:
+    """Only run jobs in this process while `check()` is true (e.g. while a broadcast runner's client is running)."""
+    _ready_checks.append(check)
+
+def _ready() -> bool:
+    try:
+        return all(check() for check in _ready_checks)
+    except Exception as e:
+        logger.error(f"Ralat menyemak kesediaan penjadual: {e}")
+        return False
+
+def _acquire_leadership() -> bool:
+    """Take the cross-process scheduler lock; only its holder runs jobs."""
+    global _lock_file
+    lock_file = open(LOCK_FILE, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _lock_file = lock_file
+    return True
+
+def _release_leadership() -> None:
+    global _lock_file
+    if _lock_file is not None:
+        _lock_file.close()
+        _lock_file = None
+
+def update_leadership(scheduler: BackgroundScheduler) -> bool:
+    """Take over the jobs if this process can run them and no other process holds the lock;
+    hand them back if it no longer can. Returns True if this process runs the jobs."""
+    with _leadership_lock:
+        ready = _ready()
+        if _lock_file is None and ready and _acquire_leadership():
+            scheduler.resume()
+            logger.info("Proses ini kini menjalankan kerja berjadual.")
+        elif _lock_file is not None and not ready:
+            scheduler.pause()
+            _release_leadership()
+            logger.warning("Klien pelari tidak berjalan; kerja berjadual diserahkan kepada proses lain.")
+        return _lock_file is not None
+
+def _campaign(scheduler: BackgroundScheduler) -> None:
+    """Background loop: a paused process takes over when the leader exits, a leader steps down when it cannot send."""
+    while not _stopped.wait(LEADER_RETRY_SECONDS):
+        try:
+            update_leadership(scheduler)
+        except Exception as e:
+            logger.error(f"Ralat mengemas kini kepimpinan penjadual: {e}")
+
+def _poll_jobstores() -> None:
+    """No-op heartbeat: each run makes the scheduler re-read the job table, picking up jobs added by other processes."""
+
+def _shutdown(scheduler: BackgroundScheduler) -> None:
+    _stopped.set()
+    scheduler.shutdown(wait=False)
+    _release_leadership()
+
+def start_scheduler() -> bool:
+    """Start the shared scheduler. Call once from the entry point, after the bot modules have registered their runners.
+
+    Several bot processes can share users.db. Only the process holding a file lock runs the jobs, and only
+    while its ready checks pass; the others run paused, so they can still add, list and cancel jobs without
+    firing them twice, and retry the lock every LEADER_RETRY_SECONDS so the jobs survive the leader exiting.
+    Returns True if this process runs the jobs now.
+    """
+    scheduler = get_scheduler()
+    if scheduler.running:
+        return _lock_file is not None
+    scheduler.start(paused=True)
+    scheduler.add_job(_poll_jobstores, IntervalTrigger(seconds=POLL_SECONDS), id='poll_jobstores', jobstore='local')
+    leader = update_leadership(scheduler)
+    if not leader:
+        logger.info("Penjadual dimulakan dalam mod jeda; proses lain (atau klien yang belum bermula) menentukan larian.")
+    threading.Thread(target=_campaign, args=(scheduler,), name="scheduler-leader", daemon=True).start()
+    atexit.register(_shutdown, scheduler)
+    return leader
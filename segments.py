@@ -0,0 +1,369 @@
+import atexit
+import threading
+import time
+import logging
+from array import array
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from audience import Audience, append_segment_delta, load_segment, load_segment_delta, save_segment
+from json_store import file_signature, load_json, update_json
+from user_registry import UserRegistry, get_user_registry
+from subscription_store import SubscriptionStore, get_subscription_store
+from tier_index import get_tier_index
+from recipient_health import BLOCKED, DEACTIVATED, classify, get_recipient_health
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+GROUP_IDS_FILE = 'group_ids.json'
+CHANNEL_IDS_FILE = 'channel_ids.json'
+FLUSH_INTERVAL_SECONDS = 5.0
+# Fail senarai kumpulan/saluran ditulis juga oleh proses lain; stat dijalankan paling kerap sekali setiap tempoh ini
+CHAT_LIST_CHECK_SECONDS = 1.0
+# Log perubahan segmen ditulis semula sebagai fail penuh apabila ia melebihi bahagian ini daripada saiz segmen
+COMPACT_RATIO = 0.1
+COMPACT_MIN_CHANGES = 10_000
+
+USER_SEGMENTS = ('all', 'premium', 'blocked', 'freemium')
+CHAT_SEGMENTS = ('groups', 'channels', 'freemium_groups', 'freemium_channels')
+CHAT_KINDS = {'group': 'groups', 'supergroup': 'groups', 'channel': 'channels'}
+CHAT_LIST_FILES = {'groups': GROUP_IDS_FILE, 'channels': CHANNEL_IDS_FILE}
+
+class Segment:
+    """One segment's members: a sorted Audience plus small add/remove sets merged on read.
+
+    Changes only touch the delta sets, so they cost O(1); `audience()` folds them into the base with
+    a linear merge (sorting only the delta) and never re-sorts the whole segment.
+    """
+
+    __slots__ = ('base', 'added', 'removed', 'log', 'logged', 'compact')
+
+    def __init__(self, base: Optional[Audience] = None) -> None:
+        self.base = base if base is not None else Audience()
+        self.added: Set[int] = set()
+        self.removed: Set[int] = set()
+        # Changes not yet appended to the log file, how many the file already holds, and whether to rewrite in full
+        self.log: List[Tuple[int, bool]] = []
+        self.logged = 0
+        self.compact = False
+
+    def __contains__(self, member_id: int) -> bool:
+        return member_id in self.added or (member_id not in self.removed and member_id in self.base)
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.added) - len(self.removed)
+
+    def set(self, member_id: int, present: bool) -> bool:
+        """Add or remove one member. Returns True if membership changed."""
+        if (member_id in self) == present:
+            return False
+        if present:
+            self.removed.discard(member_id)
+            if member_id not in self.base:
+                self.added.add(member_id)
+        else:
+            self.added.discard(member_id)
+            if member_id in self.base:
+                self.removed.add(member_id)
+        self.log.append((member_id, present))
+        return True
+
+    def audience(self) -> Audience:
+        """Return the members as a sorted audience, folding any pending delta into the base."""
+        if self.removed:
+            self.base = self.base - Audience(array('q', sorted(self.removed)))
+            self.removed.clear()
+        if self.added:
+            self.base = self.base | Audience(array('q', sorted(self.added)))
+            self.added.clear()
+        return self.base
+
+    @classmethod
+    def load(cls, name: str) -> 'Segment':
+        """Load a saved segment and replay its change log."""
+        segment = cls(load_segment(name))
+        changes = load_segment_delta(name)
+        for member_id, present in changes:
+            segment.set(member_id, present)
+        segment.log.clear()
+        segment.logged = len(changes)
+        return segment
+
+class SegmentStore:
+    """Materialized broadcast audiences kept up to date by change events instead of rebuilt per broadcast.
+
+    User segments follow the registry (/start), the subscription store (tier changes) and broadcast
+    results; chat segments follow the bot being added to/removed from chats and the admin cache.
+    'blocked' only reports who blocked the bot: whether a recipient is skipped (and when it is
+    re-probed) is decided by RecipientHealth when a broadcast job is created.
+    Changes are appended to `segments/<name>.delta` in the background; the full `segments/<name>.bin`
+    is only rewritten once the log grows past a fraction of the segment.
+    Other bot processes register users and join chats too: reads pick up their users through the
+    registry's change check and their chats when group_ids.json / channel_ids.json change on disk.
+    """
+
+    def __init__(self, registry: UserRegistry, subscriptions: SubscriptionStore,
+                 is_freemium: Callable[[int], bool], flush_interval: float = FLUSH_INTERVAL_SECONDS) -> None:
+        self.registry = registry
+        self.subscriptions = subscriptions
+        self.is_freemium = is_freemium
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._segments: Dict[str, Segment] = {name: Segment() for name in USER_SEGMENTS + CHAT_SEGMENTS}
+        self._dirty: Set[str] = set()
+        # Admins of each known chat and the reverse index used to re-evaluate chats on a tier change
+        self._chat_admins: Dict[int, FrozenSet[int]] = {}
+        self._admin_chats: Dict[int, Set[int]] = {}
+        self._chat_list_signatures: Dict[str, Optional[Tuple[int, int, int]]] = {}
+        self._next_chat_list_check = 0.0
+        self.rebuild()
+        registry.subscribe(self._on_user_changed)
+        registry.subscribe_started(self._on_user_started)
+        subscriptions.subscribe(self._on_subscription_changed)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="segment-flush", daemon=True)
+        self._thread.start()
+
+    def rebuild(self) -> None:
+        """Recompute every segment from the source stores (startup only) and save each in full."""
+        with self._lock:
+            segments = self._segments
+            segments['all'] = Segment(Audience.from_ids(self.registry.user_ids()))
+            segments['premium'] = Segment(Audience.from_ids(self.subscriptions.active()))
+            segments['blocked'] = Segment.load('blocked')
+            segments['freemium'] = Segment(segments['all'].audience() - segments['premium'].audience())
+            for kind, file_path in CHAT_LIST_FILES.items():
+                self._chat_list_signatures[kind] = file_signature(file_path)
+                segments[kind] = Segment(Audience.from_ids(load_json(file_path, [])))
+            for kind in ('groups', 'channels'):
+                segments[f'freemium_{kind}'] = Segment(Audience.from_ids(
+                    chat_id for chat_id in segments[kind].audience() if self._has_freemium_admin(chat_id)
+                ))
+            for segment in segments.values():
+                segment.compact = True
+            self._dirty.update(segments)
+
+    def _set(self, name: str, member_id: int, present: bool) -> None:
+        """Add or remove one member of a segment; caller must hold the lock."""
+        if self._segments[name].set(member_id, present):
+            self._dirty.add(name)
+
+    def _update_user(self, user_id: int) -> None:
+        """Re-evaluate the derived freemium segment for one user; caller must hold the lock."""
+        segments = self._segments
+        self._set('freemium', user_id, user_id in segments['all'] and user_id not in segments['premium'])
+
+    def _has_freemium_admin(self, chat_id: int) -> bool:
+        return any(self.is_freemium(admin_id) for admin_id in self._chat_admins.get(chat_id, ()))
+
+    def _update_chat(self, chat_id: int) -> None:
+        """Re-evaluate the freemium chat segments for one chat; caller must hold the lock."""
+        for kind in ('groups', 'channels'):
+            self._set(f'freemium_{kind}', chat_id, chat_id in self._segments[kind] and self._has_freemium_admin(chat_id))
+
+    def _on_user_changed(self, user_id: int, record: dict) -> None:
+        """Registry event (new user or profile update): the user belongs to 'all'. Blocked status is left alone."""
+        with self._lock:
+            self._set('all', user_id, True)
+            self._update_user(user_id)
+
+    def _on_user_started(self, user_id: int, record: dict) -> None:
+        """Registry /start event: the user can be messaged again."""
+        with self._lock:
+            self._set('all', user_id, True)
+            self._set('blocked', user_id, False)
+            self._update_user(user_id)
+        get_recipient_health().revive(user_id)
+
+    def _on_subscription_changed(self, user_id: int, expiry: Optional[float], active: bool) -> None:
+        """Tier change: move the user between premium and freemium, and re-check chats they administer."""
+        with self._lock:
+            self._set('premium', user_id, active)
+            self._update_user(user_id)
+            for chat_id in self._admin_chats.get(user_id, ()):
+                self._update_chat(chat_id)
+
+    def set_blocked(self, user_id: int, blocked: bool) -> None:
+        """Broadcast result: record that the user blocked the bot, or that a message got through again."""
+        with self._lock:
+            self._set('blocked', user_id, blocked)
+
+    def add_chat(self, chat_id: int, kind: str) -> None:
+        """The bot was added to a group or channel."""
+        name = CHAT_KINDS.get(kind)
+        if name is None:
+            return
+        with self._lock:
+            if chat_id in self._segments[name]:
+                return
+            self._set(name, chat_id, True)
+            self._update_chat(chat_id)
+        self._persist_chat_list(name, chat_id, True)
+
+    def remove_chat(self, chat_id: int) -> None:
+        """The bot was removed from a group or channel."""
+        with self._lock:
+            removed = [name for name in ('groups', 'channels') if chat_id in self._segments[name]]
+            for name in removed:
+                self._set(name, chat_id, False)
+            self._update_chat(chat_id)
+            for admin_id in self._chat_admins.pop(chat_id, ()):
+                self._admin_chats.get(admin_id, set()).discard(chat_id)
+        for name in removed:
+            self._persist_chat_list(name, chat_id, False)
+
+    def set_chat_admins(self, chat_id: int, admins: Iterable[int]) -> None:
+        """Admin cache event: record a chat's admins and re-evaluate its freemium membership."""
+        admins = frozenset(admins)
+        with self._lock:
+            for admin_id in self._chat_admins.get(chat_id, frozenset()) - admins:
+                self._admin_chats.get(admin_id, set()).discard(chat_id)
+            for admin_id in admins:
+                self._admin_chats.setdefault(admin_id, set()).add(chat_id)
+            self._chat_admins[chat_id] = admins
+            self._update_chat(chat_id)
+
+    def _persist_chat_list(self, name: str, chat_id: int, present: bool) -> None:
+        """Keep group_ids.json / channel_ids.json in step with the bot's memberships."""
+        file_path = GROUP_IDS_FILE if name == 'groups' else CHANNEL_IDS_FILE
+
+        def apply(chat_ids: list) -> list:
+            remaining = [existing for existing in chat_ids if int(existing) != chat_id]
+            return remaining + [chat_id] if present else remaining
+
+        try:
+            update_json(file_path, [], apply)
+        except Exception as e:
+            logger.error(f"Ralat mengemas kini {file_path}: {e}")
+
+    def refresh_sources(self) -> None:
+        """Pick up users and chats other processes have added since the last read.
+
+        The registry publishes other processes' users to `_on_user_changed`; the chat lists are
+        re-read only when their file signature changed, and only the difference is applied.
+        """
+        self.registry.refresh()
+        now = time.monotonic()
+        if now < self._next_chat_list_check:
+            return
+        self._next_chat_list_check = now + CHAT_LIST_CHECK_SECONDS
+        for kind, file_path in CHAT_LIST_FILES.items():
+            signature = file_signature(file_path)
+            if signature == self._chat_list_signatures.get(kind):
+                continue
+            chat_ids = {int(chat_id) for chat_id in load_json(file_path, [])}
+            with self._lock:
+                self._chat_list_signatures[kind] = signature
+                current = set(self._segments[kind].audience())
+                for chat_id in chat_ids ^ current:
+                    self._set(kind, chat_id, chat_id in chat_ids)
+                    self._update_chat(chat_id)
+
+    def freemium_chats(self, kind: str) -> Audience:
+        """Return 'freemium_groups' or 'freemium_channels'; call after prefetching the admins of `kind`.
+
+        A chat whose admins have never been loaded cannot be classified, so it is left out, and the
+        number left out is logged.
+        """
+        audience = self.get(f'freemium_{kind}')
+        with self._lock:
+            unknown = sum(1 for chat_id in self._segments[kind].audience() if chat_id not in self._chat_admins)
+        if unknown:
+            logger.warning(f"Senarai admin bagi {unknown} {kind} belum dimuatkan; ia tidak termasuk dalam freemium_{kind}.")
+        return audience
+
+    def get(self, name: str) -> Audience:
+        """Return a segment as a compact sorted audience (pending changes are merged in linearly)."""
+        self.refresh_sources()
+        with self._lock:
+            return self._segments[name].audience()
+
+    def sizes(self) -> Dict[str, int]:
+        """Return the size of every segment."""
+        self.refresh_sources()
+        with self._lock:
+            return {name: len(segment) for name, segment in self._segments.items()}
+
+    def flush(self) -> None:
+        """Append changed segments' logs to disk, rewriting a segment in full once its log grows too long."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            writes = []
+            for name in dirty:
+                segment = self._segments[name]
+                changes, segment.log = segment.log, []
+                threshold = max(COMPACT_MIN_CHANGES, len(segment) * COMPACT_RATIO)
+                if segment.compact or segment.logged + len(changes) > threshold:
+                    writes.append((name, segment, changes, segment.audience()))
+                elif changes:
+                    writes.append((name, segment, changes, None))
+        for name, segment, changes, snapshot in writes:
+            try:
+                if snapshot is not None:
+                    save_segment(name, snapshot)
+                else:
+                    append_segment_delta(name, changes)
+            except Exception as e:
+                logger.error(f"Ralat menyimpan segmen {name}: {e}")
+                with self._lock:
+                    if snapshot is not None:
+                        segment.compact = True
+                    else:
+                        segment.log[:0] = changes
+                    self._dirty.add(name)
+                continue
+            with self._lock:
+                if snapshot is not None:
+                    segment.compact = False
+                    segment.logged = 0
+                else:
+                    segment.logged += len(changes)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.refresh_sources()
+            except Exception as e:
+                logger.error(f"Ralat memuatkan semula sumber segmen: {e}")
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the flush thread and write pending segments."""
+        self._stopped.set()
+        self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+ACTIVE_MEMBER_STATUSES = {'owner', 'creator', 'administrator', 'member', 'restricted'}
+
+def track_bot_membership(chat_id: int, chat_type: str, status: str) -> None:
+    """Bot membership update: add the chat to its segment while the bot is in it, remove it otherwise."""
+    if status in ACTIVE_MEMBER_STATUSES:
+        get_segment_store().add_chat(chat_id, chat_type)
+    else:
+        get_segment_store().remove_chat(chat_id)
+
+def format_segment_sizes() -> str:
+    """Return one 'name: size' line per segment."""
+    return "\n".join(f"{name}: {size}" for name, size in get_segment_store().sizes().items())
+
+def record_delivery(chat_id: int, ok: bool, error: Optional[BaseException]) -> None:
+    """Broadcast result hook: keep the blocked segment in step with deliveries to users."""
+    if chat_id <= 0:
+        return
+    if ok:
+        get_segment_store().set_blocked(chat_id, False)
+    elif classify(error) in (BLOCKED, DEACTIVATED):
+        get_segment_store().set_blocked(chat_id, True)
+
+_segment_store: Optional[SegmentStore] = None
+_segment_store_lock = threading.Lock()
+
+def get_segment_store() -> SegmentStore:
+    """Return the process-wide segment store."""
+    global _segment_store
+    with _segment_store_lock:
+        if _segment_store is None:
+            # The tier index must subscribe first so it is current when segments re-check admins
+            tier_index = get_tier_index()
+            _segment_store = SegmentStore(get_user_registry(), get_subscription_store(), tier_index.is_freemium)
+            atexit.register(_segment_store.close)
+        return _segment_store
@@ -0,0 +1,131 @@
+import pickle
+import sqlite3
+import threading
+from typing import List, Optional
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+from user_repository import USER_DB_PATH
+
+class SQLiteJobStore(BaseJobStore):
+    """APScheduler job store on the standard-library sqlite3 module (no SQLAlchemy dependency).
+
+    Same layout as APScheduler's SQLAlchemyJobStore: one row per job with the pickled job state and
+    an indexed next_run_time, so scheduled jobs survive restarts and only due jobs are loaded.
+    Jobs must therefore reference module-level functions with picklable arguments.
+    """
+
+    def __init__(self, db_path: str = USER_DB_PATH, tablename: str = 'scheduled_jobs',
+                 pickle_protocol: int = pickle.HIGHEST_PROTOCOL) -> None:
+        super().__init__()
+        self.db_path = db_path
+        self.tablename = tablename
+        self.pickle_protocol = pickle_protocol
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the connection on first use (and again if the scheduler thread runs once more after shutdown)."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        return self._conn
+
+    def start(self, scheduler, alias) -> None:
+        super().start(scheduler, alias)
+        with self._lock, self._connection():
+            self._conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.tablename} (
+                    id TEXT PRIMARY KEY,
+                    next_run_time REAL,
+                    job_state BLOB NOT NULL
+                )
+            """)
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{self.tablename}_next_run_time ON {self.tablename} (next_run_time)"
+            )
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock, self._connection():
+            return self._conn.execute(sql, params)
+
+    def lookup_job(self, job_id: str) -> Optional[Job]:
+        row = self._execute(f"SELECT job_state FROM {self.tablename} WHERE id = ?", (job_id,)).fetchone()
+        return self._reconstitute_job(row[0]) if row else None
+
+    def get_due_jobs(self, now) -> List[Job]:
+        return self._get_jobs("WHERE next_run_time <= ?", (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self):
+        row = self._execute(
+            f"SELECT next_run_time FROM {self.tablename} WHERE next_run_time IS NOT NULL"
+            f" ORDER BY next_run_time LIMIT 1"
+        ).fetchone()
+        return utc_timestamp_to_datetime(row[0]) if row else None
+
+    def get_all_jobs(self) -> List[Job]:
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job: Job) -> None:
+        try:
+            self._execute(
+                f"INSERT INTO {self.tablename} (id, next_run_time, job_state) VALUES (?, ?, ?)",
+                (job.id, datetime_to_utc_timestamp(job.next_run_time), self._state(job))
+            )
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job: Job) -> None:
+        cursor = self._execute(
+            f"UPDATE {self.tablename} SET next_run_time = ?, job_state = ? WHERE id = ?",
+            (datetime_to_utc_timestamp(job.next_run_time), self._state(job), job.id)
+        )
+        if cursor.rowcount == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id: str) -> None:
+        cursor = self._execute(f"DELETE FROM {self.tablename} WHERE id = ?", (job_id,))
+        if cursor.rowcount == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self) -> None:
+        self._execute(f"DELETE FROM {self.tablename}")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _state(self, job: Job) -> bytes:
+        return pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+    def _reconstitute_job(self, job_state: bytes) -> Job:
+        state = pickle.loads(job_state)
+        state['jobstore'] = self
+        job = Job.__new__(Job)
+        job.__setstate__(state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, condition: str = "", params: tuple = ()) -> List[Job]:
+        rows = self._execute(
+            f"SELECT id, job_state FROM {self.tablename} {condition} ORDER BY next_run_time", params
+        ).fetchall()
+        jobs, failed = [], []
+        for job_id, job_state in rows:
+            try:
+                jobs.append(self._reconstitute_job(job_state))
+            except BaseException:
+                self._logger.exception('Unable to restore job "%s" -- removing it', job_id)
+                failed.append((job_id,))
+        if failed:
+            with self._lock, self._connection():
+                self._conn.executemany(f"DELETE FROM {self.tablename} WHERE id = ?", failed)
+        return jobs
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} (db_path={self.db_path}, table={self.tablename})>"
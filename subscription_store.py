@@ -0,0 +1,219 @@
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from config import PAID_USER_IDS
+from user_repository import USER_DB_PATH
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+USERPAID_DATA_FILE = 'userpaid_data.json'
+PAID_USER_IDS_FILE = 'paid_user_ids.json'
+SUBSCRIPTION_DAYS = 30
+SWEEP_INTERVAL_SECONDS = 5.0
+
+# Called with (user_id, expiry timestamp or None for no expiry, active flag)
+SubscriptionListener = Callable[[int, Optional[float], bool], None]
+
+class SubscriptionStore:
+    """Single source of truth for paid status, with an expiry min-heap swept in the background."""
+
+    def __init__(self, db_path: str = USER_DB_PATH, sweep_interval: float = SWEEP_INTERVAL_SECONDS) -> None:
+        self.db_path = db_path
+        self.sweep_interval = sweep_interval
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS subscriptions (
+                    user_id INTEGER PRIMARY KEY,
+                    subscription_end TEXT,
+                    source TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+        # Active subscriptions only: user_id -> expiry timestamp (None never expires)
+        self._active: Dict[int, Optional[float]] = {}
+        self._heap: List[Tuple[float, int]] = []
+        self._listeners: List[SubscriptionListener] = []
+        self._data_version = None
+        self._load()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="subscription-sweeper", daemon=True)
+        self._thread.start()
+
+    def _load(self) -> Dict[int, Optional[float]]:
+        """(Re)load active subscriptions from the database and rebuild the heap."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id, subscription_end FROM subscriptions").fetchall()
+            previous = self._active
+            active: Dict[int, Optional[float]] = {}
+            for user_id, subscription_end in rows:
+                expiry = datetime.fromisoformat(subscription_end).timestamp() if subscription_end else None
+                if expiry is None or expiry > now:
+                    active[user_id] = expiry
+            self._active = active
+            self._heap = [(expiry, user_id) for user_id, expiry in active.items() if expiry is not None]
+            heapq.heapify(self._heap)
+            self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return previous
+
+    def _refresh_if_changed(self) -> None:
+        """Reload when another process (e.g. the payment webhook) has written to the database."""
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return
+            previous = self._load()
+            current = dict(self._active)
+        for user_id in previous.keys() | current.keys():
+            if previous.get(user_id, 0) != current.get(user_id, 0):
+                self._publish(user_id, current.get(user_id), user_id in current)
+
+    def subscribe(self, listener: SubscriptionListener) -> None:
+        """Call `listener(user_id, expiry, active)` on every tier change."""
+        self._listeners.append(listener)
+
+    def _publish(self, user_id: int, expiry: Optional[float], active: bool) -> None:
+        """Publish a tier change to in-process caches."""
+        for listener in self._listeners:
+            try:
+                listener(user_id, expiry, active)
+            except Exception as e:
+                logger.error(f"Subscription listener failed for {user_id}: {e}")
+
+    def _write(self, user_id: int, end: Optional[datetime], source: str) -> None:
+        """Persist a subscription row; caller must hold the lock."""
+        with self._conn:
+            self._conn.execute("""
+                INSERT INTO subscriptions (user_id, subscription_end, source, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    subscription_end = excluded.subscription_end,
+                    source = excluded.source,
+                    updated_at = excluded.updated_at
+            """, (user_id, end.isoformat() if end else None, source, datetime.now().isoformat()))
+
+    def grant(self, user_id: int, days: Optional[int] = SUBSCRIPTION_DAYS, source: str = 'payment') -> Optional[datetime]:
+        """Grant or extend a subscription by `days` (None never expires). Returns the new end."""
+        with self._lock:
+            current = self._active.get(user_id, 0)
+            if days is None or (user_id in self._active and current is None):
+                end = None
+            else:
+                start = max(datetime.now(), datetime.fromtimestamp(current or 0))
+                end = start + timedelta(days=days)
+            self._write(user_id, end, source)
+            expiry = end.timestamp() if end else None
+            self._active[user_id] = expiry
+            if expiry is not None:
+                heapq.heappush(self._heap, (expiry, user_id))
+        self._publish(user_id, expiry, True)
+        return end
+
+    def revoke(self, user_id: int, source: str = 'revoke') -> None:
+        """End a subscription immediately."""
+        with self._lock:
+            self._write(user_id, datetime.now(), source)
+            was_active = self._active.pop(user_id, 0) != 0
+        if was_active:
+            self._publish(user_id, None, False)
+
+    def is_active(self, user_id: int) -> bool:
+        """Check paid status in O(1) without touching disk."""
+        expiry = self._active.get(user_id, 0)
+        return expiry is None or expiry > time.time()
+
+    def expiry(self, user_id: int) -> Optional[datetime]:
+        """Return the subscription end of an active subscriber, or None."""
+        expiry = self._active.get(user_id)
+        return datetime.fromtimestamp(expiry) if expiry else None
+
+    def active(self) -> Dict[int, Optional[float]]:
+        """Return a snapshot of active subscriptions (user_id -> expiry timestamp)."""
+        with self._lock:
+            return dict(self._active)
+
+    def sweep(self) -> List[int]:
+        """Demote every subscriber whose expiry has passed. Returns the demoted IDs."""
+        now = time.time()
+        demoted = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expiry, user_id = heapq.heappop(self._heap)
+                # Skip stale heap entries left behind by renewals and revocations
+                if self._active.get(user_id, 0) == expiry:
+                    del self._active[user_id]
+                    demoted.append(user_id)
+        for user_id in demoted:
+            logger.info(f"Subscription expired for user_id: {user_id}")
+            self._publish(user_id, None, False)
+        return demoted
+
+    def _run(self) -> None:
+        """Background sweeper: demote expired users and pick up cross-process writes."""
+        while not self._stopped.wait(self.sweep_interval):
+            try:
+                self._refresh_if_changed()
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Subscription sweep failed: {e}")
+
+    def import_legacy(self, paid_files: Iterable[str] = (USERPAID_DATA_FILE, PAID_USER_IDS_FILE)) -> int:
+        """Import userpaid_data.json / paid_user_ids.json into an empty store. Returns rows imported."""
+        imported = 0
+        with self._lock:
+            if self._conn.execute("SELECT COUNT(*) FROM subscriptions").fetchone()[0]:
+                return 0
+            for file_path in paid_files:
+                if not os.path.exists(file_path):
+                    continue
+                try:
+                    with open(file_path, 'r') as file:
+                        legacy = json.load(file)
+                except (OSError, json.JSONDecodeError) as e:
+                    logger.error(f"Failed to read {file_path} for import: {e}")
+                    continue
+                # paid_user_ids.json has been written both as a list of IDs and as a userpaid-style dict
+                if isinstance(legacy, list):
+                    legacy = {str(uid): {} for uid in legacy}
+                for uid, record in legacy.items():
+                    subscription_end = record.get('subscription_end')
+                    self._write(int(uid), datetime.fromisoformat(subscription_end) if subscription_end else None, file_path)
+                    imported += 1
+            self._load()
+        logger.info(f"Imported {imported} legacy subscriptions.")
+        return imported
+
+    def seed_permanent(self, user_ids: Iterable[int], source: str = 'config') -> None:
+        """Ensure statically configured paid users (PAID_USER_IDS) never expire."""
+        for user_id in user_ids:
+            if self._active.get(user_id, 0) is not None:
+                self.grant(user_id, days=None, source=source)
+
+    def close(self) -> None:
+        """Stop the sweeper and close the connection."""
+        self._stopped.set()
+        self._thread.join(timeout=self.sweep_interval + 1)
+        with self._lock:
+            self._conn.close()
+
+_store: Optional[SubscriptionStore] = None
+_store_lock = threading.Lock()
+
+def get_subscription_store() -> SubscriptionStore:
+    """Return the process-wide subscription store, importing legacy paid-user files on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SubscriptionStore()
+            _store.import_legacy()
+            _store.seed_permanent(PAID_USER_IDS)
+        return _store
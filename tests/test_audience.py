@@ -0,0 +1,51 @@
+import pytest
+import audience
+from audience import (Audience, append_segment_delta, load_segment, load_segment_delta, save_segment,
+                      segment_delta_path)
+
+@pytest.fixture
+def segments_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(audience, 'SEGMENTS_DIR', str(tmp_path))
+    return tmp_path
+
+def test_from_ids_sorts_and_deduplicates_numeric_strings():
+    ids = Audience.from_ids(['30', 10, 20, '10', -100])
+    assert ids.tolist() == [-100, 10, 20, 30]
+    assert 20 in ids and 25 not in ids
+    assert ids.index(30) == 3
+    with pytest.raises(ValueError):
+        ids.index(25)
+
+def test_set_operations_keep_the_result_sorted():
+    a = Audience.from_ids([1, 3, 5, 7, 9])
+    b = Audience.from_ids([0, 3, 4, 9, 10])
+    assert (a | b).tolist() == [0, 1, 3, 4, 5, 7, 9, 10]
+    assert (a - b).tolist() == [1, 5, 7]
+    assert (b - a).tolist() == [0, 4, 10]
+    assert (a & b).tolist() == [3, 9]
+    assert (a | Audience()).tolist() == a.tolist()
+    assert (Audience() - a).tolist() == []
+
+def test_save_and_memory_mapped_load_round_trip(tmp_path):
+    ids = Audience.from_ids([-1001234567890, 42, 7])
+    path = str(tmp_path / 'audience.bin')
+    ids.save(path)
+    assert Audience.load(path).tolist() == ids.tolist()
+    assert Audience.load(path, use_mmap=False).tolist() == ids.tolist()
+    assert len(Audience.load(str(tmp_path / 'missing.bin'))) == 0
+
+def test_delta_log_appends_in_order_and_full_save_replaces_it(segments_dir):
+    assert load_segment_delta('blocked') == []
+    append_segment_delta('blocked', [(5, True), (6, True)])
+    append_segment_delta('blocked', [(5, False)])
+    assert load_segment_delta('blocked') == [(5, True), (6, True), (5, False)]
+
+    save_segment('blocked', Audience.from_ids([6]))
+    assert load_segment('blocked').tolist() == [6]
+    assert load_segment_delta('blocked') == []
+
+def test_torn_final_delta_record_is_ignored(segments_dir):
+    append_segment_delta('all', [(1, True), (2, True)])
+    with open(segment_delta_path('all'), 'ab') as file:
+        file.write(b'\x03\x00\x00')
+    assert load_segment_delta('all') == [(1, True), (2, True)]
@@ -0,0 +1,50 @@
+import asyncio
+from pyrogram import Client, raw
+from broadcast_content import build_sender
+
+def make_client(sent: list) -> Client:
+    """A client that records outgoing SendMessage requests instead of talking to Telegram (create it inside the loop)."""
+    client = Client("test_broadcast_content", api_id=1, api_hash="0" * 32, in_memory=True)
+
+    async def resolve_peer(peer_id):
+        return raw.types.InputPeerUser(user_id=int(peer_id), access_hash=0)
+
+    async def invoke(query, *args, **kwargs):
+        sent.append(query)
+        return raw.types.UpdateShortSentMessage(out=True, id=len(sent), pts=1, pts_count=1, date=0)
+
+    client.resolve_peer = resolve_peer
+    client.invoke = invoke
+    return client
+
+def test_formatted_text_broadcast_sends_parsed_entities():
+    sent = []
+
+    async def broadcast():
+        send = await build_sender(make_client(sent), {'message_text': "**Sale** ends <i>today</i>, ask [me](tg://user?id=42)"})
+        for chat_id in (101, 102):
+            await send(chat_id)
+
+    asyncio.run(broadcast())
+
+    assert len(sent) == 2
+    for request in sent:
+        assert request.message == "Sale ends today, ask me"
+        assert [type(entity) for entity in request.entities] == [
+            raw.types.MessageEntityBold, raw.types.MessageEntityItalic, raw.types.InputMessageEntityMentionName,
+        ]
+        assert [(entity.offset, entity.length) for entity in request.entities] == [(0, 4), (10, 5), (21, 2)]
+        assert request.entities[2].user_id.user_id == 42
+    assert [request.peer.user_id for request in sent] == [101, 102]
+
+def test_plain_text_broadcast_sends_no_entities():
+    sent = []
+
+    async def broadcast():
+        send = await build_sender(make_client(sent), {'message_text': "Hello everyone"})
+        await send(101)
+
+    asyncio.run(broadcast())
+
+    assert sent[0].message == "Hello everyone"
+    assert sent[0].entities is None
@@ -0,0 +1,62 @@
+from datetime import date
+import pytest
+from limits_db import LimitsEngine
+from usage_counters import UsageCounters
+
+TIER_LIMITS = {'freemium': {'convert': 2}, 'premium': {'convert': 5}}
+
+@pytest.fixture
+def make_engine(tmp_path):
+    engines = []
+
+    def make(premium=()):
+        engine = LimitsEngine(str(tmp_path / 'limits.db'), pool_size=2, tier_limits=TIER_LIMITS,
+                              tier_of=lambda user_id: 'premium' if user_id in premium else 'freemium')
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.close()
+
+def test_try_consume_enforces_the_tier_limit_in_one_statement(make_engine):
+    engine = make_engine(premium={2})
+    assert [engine.try_consume(1, 'convert') for _ in range(3)] == [True, True, False]
+    assert [engine.try_consume(2, 'convert') for _ in range(6)] == [True] * 5 + [False]
+    assert engine.usage(1, 'convert') == 2
+    assert engine.remaining(2, 'convert') == 0
+
+def test_try_consume_rejects_an_amount_over_the_limit_without_counting_it(make_engine):
+    engine = make_engine()
+    assert not engine.try_consume(1, 'convert', amount=3)
+    assert engine.usage(1, 'convert') == 0
+
+def test_per_user_override_replaces_the_tier_limit(make_engine):
+    engine = make_engine()
+    engine.set_limit(1, 'convert', 3)
+    assert [engine.try_consume(1, 'convert') for _ in range(4)] == [True, True, True, False]
+    assert engine.limit(1, 'convert') == 3
+    assert engine.limit(2, 'convert') == 2
+
+def test_usage_is_partitioned_by_day(make_engine):
+    engine = make_engine()
+    engine.store_usage([(1, 'convert', '2000-01-01', 2)])
+    assert engine.try_consume(1, 'convert')
+    assert engine.usage(1, 'convert', '2000-01-01') == 2
+    assert engine.usage(1, 'convert') == 1
+    assert engine.purge_before(date.today().isoformat()) == 1
+
+def test_counters_in_several_processes_add_up(make_engine):
+    first = UsageCounters(make_engine(), snapshot_interval=3600)
+    second = UsageCounters(make_engine(), snapshot_interval=3600)
+    try:
+        assert first.try_consume(1, 'convert')
+        assert second.try_consume(1, 'convert')
+        first.snapshot()
+        second.snapshot()
+        assert first.engine.usage(1, 'convert') == 2
+        # The second snapshot read back the first process's use, so the limit is already reached there
+        assert not second.try_consume(1, 'convert')
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,70 @@
+from membership_cache import MembershipCache, is_joined_status
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def make_cache(answers, **options):
+    calls = []
+
+    def lookup(user_id, chat):
+        calls.append((user_id, chat))
+        return answers.get((user_id, chat))
+
+    clock = FakeClock()
+    return MembershipCache(lookup, clock=clock, **options), clock, calls
+
+def test_joined_results_are_kept_for_the_positive_ttl():
+    cache, clock, calls = make_cache({(1, '@news'): True}, positive_ttl=100, negative_ttl=10)
+    assert cache.is_member(1, '@news')
+    clock.now = 99
+    assert cache.is_member(1, 'NEWS')
+    assert len(calls) == 1
+    clock.now = 100
+    assert cache.is_member(1, '@news')
+    assert len(calls) == 2
+
+def test_not_joined_results_expire_after_the_short_negative_ttl():
+    answers = {(1, -100): False}
+    cache, clock, calls = make_cache(answers, positive_ttl=100, negative_ttl=10)
+    assert not cache.is_member(1, -100)
+    clock.now = 9
+    assert not cache.is_member(1, -100)
+    answers[(1, -100)] = True
+    clock.now = 10
+    assert cache.is_member(1, -100)
+    assert len(calls) == 2
+
+def test_failed_lookups_are_not_cached():
+    cache, _, calls = make_cache({})
+    assert not cache.is_member(1, -100)
+    assert not cache.is_member(1, -100)
+    assert len(calls) == 2
+    assert len(cache) == 0
+
+def test_updates_apply_to_every_key_of_the_chat_and_none_drops_them():
+    cache, _, calls = make_cache({})
+    cache.update(1, (-100, 'News', None), True)
+    assert cache.is_member(1, -100) and cache.is_member(1, '@news')
+    cache.update(1, (-100, 'News'), None)
+    assert cache.peek(1, -100) is None and cache.peek(1, 'news') is None
+    assert calls == []
+
+def test_least_recently_used_entries_are_evicted():
+    cache, _, _ = make_cache({}, max_entries=2)
+    cache.set(1, -100, True)
+    cache.set(2, -100, True)
+    cache.peek(1, -100)
+    cache.set(3, -100, True)
+    assert cache.peek(2, -100) is None
+    assert cache.peek(1, -100) and cache.peek(3, -100)
+
+def test_restricted_members_count_only_while_still_in_the_chat():
+    assert is_joined_status('member') and is_joined_status('creator')
+    assert is_joined_status('restricted', is_member=True)
+    assert not is_joined_status('restricted', is_member=False)
+    assert not is_joined_status('restricted')
+    assert not is_joined_status('left') and not is_joined_status('kicked')
@@ -0,0 +1,83 @@
+import pytest
+from outbound_limiter import (BULK, GROUP_MESSAGES_PER_WINDOW, GROUP_WINDOW_SECONDS, INTERACTIVE, LANE_ACTIVE_SECONDS,
+                              OutboundLimiter, current_lane, send_lane)
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_global_rate_spaces_out_sends():
+    limiter = OutboundLimiter(max_rate=10, clock=FakeClock())
+    assert [limiter.reserve() for _ in range(3)] == pytest.approx([0.0, 0.1, 0.2])
+
+def test_per_chat_interval_and_group_window():
+    clock = FakeClock()
+    limiter = OutboundLimiter(max_rate=1000, per_chat_interval=1.0, clock=clock)
+    assert limiter.reserve(5) == 0.0
+    assert limiter.reserve(5) == pytest.approx(1.0)
+    assert limiter.reserve(6) == pytest.approx(0.002)
+
+    groups = OutboundLimiter(max_rate=1000, per_chat_interval=0.0, clock=clock)
+    delays = [groups.reserve(-100) for _ in range(GROUP_MESSAGES_PER_WINDOW + 1)]
+    assert max(delays[:-1]) < 1
+    assert delays[-1] == pytest.approx(GROUP_WINDOW_SECONDS)
+
+def test_flood_wait_halves_the_rate_once_per_burst_and_pauses_everyone():
+    clock = FakeClock()
+    limiter = OutboundLimiter(max_rate=30, min_rate=5, clock=clock)
+    limiter.on_flood_wait(10)
+    assert limiter.rate == 15
+    assert limiter.paused_for() == 10
+    assert limiter.reserve(1) == 10
+
+    # A second FloodWait from the same burst only extends the pause
+    clock.now = 5
+    limiter.on_flood_wait(8)
+    assert limiter.rate == 15
+    assert limiter.paused_for() == 8
+
+    clock.now = 20
+    limiter.on_flood_wait(1)
+    assert limiter.rate == 7.5
+    clock.now = 30
+    limiter.on_flood_wait(1)
+    assert limiter.rate == 5
+    assert limiter.flood_waits == 4
+
+def test_successful_sends_recover_the_rate_additively_up_to_the_maximum():
+    limiter = OutboundLimiter(max_rate=30, clock=FakeClock())
+    limiter.rate = 10
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(10.1)
+    # About one msg/s per second of sending: `rate` successes raise the rate by ~1
+    for _ in range(10):
+        limiter.on_success()
+    assert 11.0 < limiter.rate < 11.1
+    limiter.rate = 29.99
+    limiter.on_success()
+    assert limiter.rate == 30
+
+def test_interactive_sends_do_not_queue_behind_a_broadcast():
+    limiter = OutboundLimiter(max_rate=10, clock=FakeClock())
+    assert [limiter.reserve(lane=BULK) for _ in range(3)] == pytest.approx([0.0, 0.1, 0.2])
+
+    # Interactive replies go out now at their weighted share (6 of 6 + 1) of the rate...
+    assert [limiter.reserve(lane=INTERACTIVE) for _ in range(2)] == pytest.approx([0.0, 1 / (10 * 6 / 7)])
+    # ...and every interactive slot pushes the broadcast back by one slot
+    assert limiter.reserve(lane=BULK) == pytest.approx(0.5)
+
+def test_a_lane_alone_gets_the_whole_rate():
+    clock = FakeClock()
+    limiter = OutboundLimiter(max_rate=10, clock=clock)
+    limiter.reserve(lane=BULK)
+    clock.now = LANE_ACTIVE_SECONDS + 1
+    assert [limiter.reserve(lane=INTERACTIVE) for _ in range(3)] == pytest.approx([0.0, 0.1, 0.2])
+
+def test_send_lane_sets_the_lane_for_the_block_only():
+    assert current_lane.get() == INTERACTIVE
+    with send_lane(BULK):
+        assert current_lane.get() == BULK
+    assert current_lane.get() == INTERACTIVE
@@ -0,0 +1,38 @@
+from datetime import timedelta
+import pytest
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from scheduled_broadcasts import SCHEDULE_JITTER_SECONDS, SCHEDULE_TIMEZONE, parse_schedule
+
+def cron_fields(trigger: CronTrigger) -> dict:
+    return {field.name: str(field) for field in trigger.fields}
+
+@pytest.mark.parametrize('spec, interval', [
+    ('every 15m', timedelta(minutes=15)),
+    ('every 6h', timedelta(hours=6)),
+    ('Every  2D', timedelta(days=2)),
+])
+def test_every_interval(spec, interval):
+    trigger = parse_schedule(spec)
+    assert isinstance(trigger, IntervalTrigger)
+    assert trigger.interval == interval
+    assert trigger.jitter == SCHEDULE_JITTER_SECONDS
+    assert str(trigger.timezone) == SCHEDULE_TIMEZONE
+
+def test_daily_time():
+    trigger = parse_schedule('daily 20:05', jitter=0)
+    assert isinstance(trigger, CronTrigger)
+    fields = cron_fields(trigger)
+    assert (fields['hour'], fields['minute']) == ('20', '5')
+    assert fields['day_of_week'] == '*'
+    assert trigger.jitter == 0
+
+def test_five_field_cron_expression():
+    fields = cron_fields(parse_schedule('0 20 * * mon-fri'))
+    assert (fields['minute'], fields['hour'], fields['day'], fields['month'], fields['day_of_week']) == \
+        ('0', '20', '*', '*', 'mon-fri')
+
+@pytest.mark.parametrize('spec', ['every 0h', 'every 5w', 'daily 25:00', 'tomorrow', '0 20 * *', '0 20 * * * *'])
+def test_invalid_schedules_raise_value_error(spec):
+    with pytest.raises(ValueError):
+        parse_schedule(spec)
@@ -0,0 +1,53 @@
+import pytest
+from rate_limiter import TokenBucketLimiter, retry_after
+
+RATES = {'freemium': {'convert': (3, 1 / 10)}}
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_burst_up_to_capacity_then_wait_for_refill():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(RATES, clock=clock)
+
+    assert [limiter.acquire(1, 'convert') for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire(1, 'convert') == 10.0
+
+    clock.now += 4
+    assert limiter.acquire(1, 'convert') == pytest.approx(6.0)
+    clock.now += 6
+    assert limiter.allow(1, 'convert')
+    assert not limiter.allow(1, 'convert')
+
+def test_buckets_are_per_user_and_unlisted_features_are_unlimited():
+    limiter = TokenBucketLimiter(RATES, clock=FakeClock())
+    for _ in range(3):
+        limiter.acquire(1, 'convert')
+
+    assert limiter.allow(2, 'convert')
+    assert all(limiter.allow(1, 'chatgpt') for _ in range(10))
+    assert len(limiter) == 2
+
+def test_idle_buckets_are_evicted_in_lru_order():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(RATES, idle_ttl=60, clock=clock)
+    limiter.acquire(1, 'convert')
+    clock.now += 30
+    limiter.acquire(2, 'convert')
+    clock.now += 20
+    limiter.acquire(1, 'convert')
+
+    # User 2 is now least recently used; 61s after its last use it is evicted, user 1 (41s idle) is kept
+    clock.now += 41
+    limiter.acquire(3, 'convert')
+    assert len(limiter) == 2
+    assert (2, 'convert') not in limiter._buckets
+
+def test_retry_after_never_shows_zero_seconds():
+    assert retry_after(0.2) == 1
+    assert retry_after(6.1) == 7
+    assert retry_after(10.0) == 10
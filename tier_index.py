@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from json_store import load_json
+from user_registry import UserRegistry, get_user_registry
+from subscription_store import SubscriptionStore, get_subscription_store
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+USERPAID_DATA_FILE = 'userpaid_data.json'
+STAT_CHECK_INTERVAL_SECONDS = 1.0
+
+FREEMIUM = 'freemium'
+PREMIUM = 'premium'
+
+# (tier, subscription expiry as a POSIX timestamp or None)
+TierEntry = Tuple[str, Optional[float]]
+
+def parse_expiry(subscription_end: Optional[str]) -> Optional[float]:
+    """Convert an ISO subscription_end string to a timestamp, or None if absent/invalid."""
+    if not subscription_end:
+        return None
+    try:
+        return datetime.fromisoformat(subscription_end).timestamp()
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring invalid subscription_end value: {subscription_end!r}")
+        return None
+
+class TierIndex:
+    """In-memory user_id -> (tier, expiry) map, rebuilt when its source file changes."""
+
+    def __init__(self, paid_file: str = USERPAID_DATA_FILE, registry: Optional[UserRegistry] = None,
+                 subscriptions: Optional[SubscriptionStore] = None,
+                 stat_interval: float = STAT_CHECK_INTERVAL_SECONDS) -> None:
+        self.paid_file = paid_file
+        self.registry = registry
+        self.subscriptions = subscriptions
+        self.stat_interval = stat_interval
+        self._lock = threading.Lock()
+        self._entries: Dict[int, TierEntry] = {}
+        self._file_signature: Optional[Tuple[int, float]] = None
+        self._next_stat = 0.0
+        self._stale = True
+        if registry is not None:
+            registry.subscribe(self._on_user_changed)
+        if subscriptions is not None:
+            subscriptions.subscribe(self._on_subscription_changed)
+
+    def _signature(self) -> Optional[Tuple[int, float]]:
+        """Return (inode, mtime) of the paid-users file, or None if it does not exist."""
+        try:
+            stat = os.stat(self.paid_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime
+
+    def _ensure_fresh(self) -> None:
+        """Rebuild if invalidated or if the paid-users file changed (stat at most once per interval)."""
+        now = time.monotonic()
+        if not self._stale and (self.subscriptions is not None or now < self._next_stat):
+            return
+        self._next_stat = now + self.stat_interval
+        signature = self._signature()
+        if self._stale or signature != self._file_signature:
+            self.rebuild(signature)
+
+    def rebuild(self, signature: Optional[Tuple[int, float]] = None) -> None:
+        """Rebuild the whole index from the user registry and the subscription store (or paid-users file)."""
+        entries: Dict[int, TierEntry] = {}
+        if self.registry is not None:
+            for uid, record in self.registry.all().items():
+                expiry = parse_expiry(record.get('subscription_end'))
+                entries[int(uid)] = (PREMIUM if expiry else FREEMIUM, expiry)
+        if self.subscriptions is not None:
+            for user_id, expiry in self.subscriptions.active().items():
+                entries[user_id] = (PREMIUM, expiry)
+            with self._lock:
+                self._entries = entries
+                self._stale = False
+            return
+        paid_users = load_json(self.paid_file, {})
+        now = time.time()
+        for uid, record in paid_users.items():
+            expiry = parse_expiry(record.get('subscription_end'))
+            # Lapsed subscribers who never registered must not leak into freemium audiences
+            if expiry and (expiry > now or int(uid) in entries):
+                entries[int(uid)] = (PREMIUM, expiry)
+        with self._lock:
+            self._entries = entries
+            self._file_signature = signature if signature is not None else self._signature()
+            self._stale = False
+
+    def invalidate(self) -> None:
+        """Force a rebuild on the next lookup."""
+        self._stale = True
+
+    def set_tier(self, user_id: int, tier: str, expiry: Optional[float] = None) -> None:
+        """Apply a single tier change without rebuilding the index."""
+        with self._lock:
+            self._entries[user_id] = (tier, expiry)
+
+    def _on_user_changed(self, user_id: int, record: dict) -> None:
+        """Registry change event: refresh the entry for one user."""
+        expiry = parse_expiry(record.get('subscription_end'))
+        with self._lock:
+            current = self._entries.get(user_id)
+            # A paid-file subscription outranks a registry record without one
+            if expiry is None and current and current[0] == PREMIUM:
+                return
+            self._entries[user_id] = (PREMIUM if expiry else FREEMIUM, expiry)
+
+    def _on_subscription_changed(self, user_id: int, expiry: Optional[float], active: bool) -> None:
+        """Subscription store event: promote or demote one user."""
+        if active:
+            self.set_tier(user_id, PREMIUM, expiry)
+        elif self.registry is not None and self.registry.is_known(user_id):
+            self.set_tier(user_id, FREEMIUM)
+        else:
+            # Lapsed subscribers who never registered must not leak into freemium audiences
+            with self._lock:
+                self._entries.pop(user_id, None)
+
+    def lookup(self, user_id: int) -> Optional[TierEntry]:
+        """Return the (tier, expiry) entry for a user, or None if unknown."""
+        self._ensure_fresh()
+        return self._entries.get(user_id)
+
+    def is_premium(self, user_id: int) -> bool:
+        """Check if the user holds an unexpired premium subscription."""
+        entry = self.lookup(user_id)
+        return bool(entry) and entry[0] == PREMIUM and (entry[1] is None or entry[1] > time.time())
+
+    def is_freemium(self, user_id: int) -> bool:
+        """Check if the user is known and not currently premium."""
+        return self.lookup(user_id) is not None and not self.is_premium(user_id)
+
+    def freemium_ids(self) -> List[int]:
+        """Return the IDs of every known user that is not currently premium."""
+        self._ensure_fresh()
+        now = time.time()
+        with self._lock:
+            return [uid for uid, (tier, expiry) in self._entries.items()
+                    if not (tier == PREMIUM and (expiry is None or expiry > now))]
+
+    def premium_ids(self) -> List[int]:
+        """Return the IDs of every user with an unexpired premium subscription."""
+        self._ensure_fresh()
+        now = time.time()
+        with self._lock:
+            return [uid for uid, (tier, expiry) in self._entries.items()
+                    if tier == PREMIUM and (expiry is None or expiry > now)]
+
+_tier_index: Optional[TierIndex] = None
+_tier_index_lock = threading.Lock()
+
+def get_tier_index() -> TierIndex:
+    """Return the process-wide tier index backed by the user registry and subscription store."""
+    global _tier_index
+    with _tier_index_lock:
+        if _tier_index is None:
+            _tier_index = TierIndex(registry=get_user_registry(), subscriptions=get_subscription_store())
+        return _tier_index
@@ -0,0 +1,197 @@
+import atexit
+import os
+import threading
+import logging
+from datetime import date
+from typing import Dict, List, Optional, Tuple, Union
+from limits_db import LimitsEngine
+from tier_index import FREEMIUM, PREMIUM, get_tier_index
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+LIMITS_FILE = "limits.json"
+SNAPSHOT_INTERVAL_SECONDS = 30.0
+# "memory": kaunter dalam proses dengan snapshot ke SQLite; "sqlite": setiap semakan terus ke SQLite (berbilang proses)
+LIMITS_BACKEND = os.getenv('LIMITS_BACKEND', 'memory')
+
+# Polisi had harian mengikut tier; hanya had yang ditetapkan oleh admin disimpan bagi setiap pengguna
+TIER_DAILY_LIMITS = {
+    FREEMIUM: {
+        "convert": 5,
+        "broadcast": 2,
+        "auto_approve": 5,
+        "downloader": 5,
+        "chatgpt": 10,
+    },
+    PREMIUM: {
+        "convert": 100,
+        "broadcast": 50,
+        "auto_approve": 100,
+        "downloader": 100,
+        "chatgpt": 200,
+    },
+}
+DEFAULT_DAILY_LIMITS = TIER_DAILY_LIMITS[FREEMIUM]
+FALLBACK_DAILY_LIMIT = 10
+
+# (user_id, feature) -> [date, count]
+UsageEntry = List
+# (user_id, feature, date) -> uses counted here but not yet added to SQLite
+PendingKey = Tuple[int, str, str]
+
+def tier_of(user_id: int) -> str:
+    """Return the limit policy tier for a user."""
+    return PREMIUM if get_tier_index().is_premium(user_id) else FREEMIUM
+
+class UsageCounters:
+    """In-memory daily usage counters with atomic check-and-increment and periodic SQLite snapshots.
+
+    main.py, m.py and k.py each hold their own counters, so a snapshot adds this process's increments
+    to the shared rows (never overwrites them) and then reads today's totals back, which brings in
+    the uses counted by the other processes.
+    """
+
+    def __init__(self, engine: LimitsEngine, snapshot_interval: float = SNAPSHOT_INTERVAL_SECONDS) -> None:
+        self.engine = engine
+        self.snapshot_interval = snapshot_interval
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[int, str], UsageEntry] = {}
+        self._overrides: Dict[Tuple[int, str], int] = {}
+        self._pending: Dict[PendingKey, int] = {}
+        self._purged_on: Optional[str] = None
+        self._load()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="usage-snapshot", daemon=True)
+        self._thread.start()
+
+    def _load(self) -> None:
+        """Load today's usage and the per-user limit overrides from the SQLite engine."""
+        today = date.today().isoformat()
+        self._entries = {key: [today, usage] for key, usage in self.engine.load_usage(today).items()}
+        self._overrides = self.engine.load_limits()
+
+    def limit(self, user_id: int, feature: str) -> int:
+        """Return the user's override, or the limit inherited from their tier."""
+        override = self._overrides.get((user_id, feature))
+        return override if override is not None else self.engine.policy_limit(user_id, feature)
+
+    def _entry(self, user_id: int, feature: str, today: str) -> UsageEntry:
+        """Return the counter for today, creating it or resetting it lazily; caller must hold the lock."""
+        entry = self._entries.get((user_id, feature))
+        if entry is None:
+            entry = [today, 0]
+            self._entries[(user_id, feature)] = entry
+        elif entry[0] != today:
+            entry[0] = today
+            entry[1] = 0
+        return entry
+
+    def try_consume(self, user_id: int, feature: str, amount: int = 1) -> bool:
+        """Atomically check the daily limit and count one use. Returns False if the limit is reached."""
+        today = date.today().isoformat()
+        limit = self.limit(user_id, feature)
+        with self._lock:
+            entry = self._entry(user_id, feature, today)
+            if entry[1] + amount > limit:
+                return False
+            entry[1] += amount
+            self._add_pending(user_id, feature, today, amount)
+            return True
+
+    def consume(self, user_id: int, feature: str, amount: int = 1) -> None:
+        """Count a use without checking the limit."""
+        today = date.today().isoformat()
+        with self._lock:
+            self._entry(user_id, feature, today)[1] += amount
+            self._add_pending(user_id, feature, today, amount)
+
+    def _add_pending(self, user_id: int, feature: str, day: str, amount: int) -> None:
+        """Queue an increment for the next snapshot; caller must hold the lock."""
+        key = (user_id, feature, day)
+        self._pending[key] = self._pending.get(key, 0) + amount
+
+    def remaining(self, user_id: int, feature: str) -> int:
+        """Return how many uses are left today without creating a counter."""
+        today = date.today().isoformat()
+        entry = self._entries.get((user_id, feature))
+        used = entry[1] if entry and entry[0] == today else 0
+        return max(self.limit(user_id, feature) - used, 0)
+
+    def set_limit(self, user_id: int, feature: str, limit: int) -> None:
+        """Set a user's daily limit for a feature (written through to SQLite)."""
+        self.engine.set_limit(user_id, feature, limit)
+        self._overrides[(user_id, feature)] = limit
+
+    def snapshot(self) -> bool:
+        """Add changed counters to SQLite and refresh today's totals. Returns True if anything was written."""
+        with self._lock:
+            if not self._pending:
+                return False
+            pending, self._pending = self._pending, {}
+        try:
+            self.engine.add_usage([(user_id, feature, day, amount) for (user_id, feature, day), amount in pending.items()])
+        except Exception as e:
+            logger.error(f"Ralat menyimpan snapshot had harian: {e}")
+            with self._lock:
+                for key, amount in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + amount
+            return False
+        try:
+            self._refresh_totals()
+        except Exception as e:
+            logger.error(f"Ralat memuatkan jumlah penggunaan harian: {e}")
+        return True
+
+    def _refresh_totals(self) -> None:
+        """Replace today's counters with the shared totals plus any increments counted since the snapshot."""
+        today = date.today().isoformat()
+        totals = self.engine.load_usage(today)
+        with self._lock:
+            for (user_id, feature), usage in totals.items():
+                entry = self._entry(user_id, feature, today)
+                entry[1] = usage + self._pending.get((user_id, feature, today), 0)
+            # Counters from previous days that are already persisted only cost memory; drop them
+            pending_keys = {(user_id, feature) for user_id, feature, _ in self._pending}
+            for key in [key for key, entry in self._entries.items() if entry[0] != today and key not in pending_keys]:
+                del self._entries[key]
+
+    def _purge_daily(self) -> None:
+        """Drop old usage partitions once per day."""
+        today = date.today().isoformat()
+        if self._purged_on != today:
+            self.engine.purge_expired()
+            self._purged_on = today
+
+    def _run(self) -> None:
+        """Background loop writing snapshots at a fixed interval."""
+        while not self._stopped.wait(self.snapshot_interval):
+            self.snapshot()
+            try:
+                self._purge_daily()
+            except Exception as e:
+                logger.error(f"Ralat membuang data penggunaan lama: {e}")
+
+    def close(self) -> None:
+        """Stop the snapshot thread and write a final snapshot."""
+        self._stopped.set()
+        self._thread.join(timeout=self.snapshot_interval + 1)
+        self.snapshot()
+
+_counters: Optional[Union[UsageCounters, LimitsEngine]] = None
+_counters_lock = threading.Lock()
+
+def get_usage_counters() -> Union[UsageCounters, LimitsEngine]:
+    """Return the process-wide limits backend, importing limits.json into SQLite on first use."""
+    global _counters
+    with _counters_lock:
+        if _counters is None:
+            engine = LimitsEngine(tier_limits=TIER_DAILY_LIMITS, fallback_limit=FALLBACK_DAILY_LIMIT, tier_of=tier_of)
+            if engine.is_empty():
+                engine.import_limits_json(LIMITS_FILE)
+            if LIMITS_BACKEND == 'sqlite':
+                _counters = engine
+            else:
+                _counters = UsageCounters(engine)
+                atexit.register(_counters.close)
+        return _counters
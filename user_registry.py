@@ -0,0 +1,209 @@
+import atexit
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from user_repository import UserRecord, UserRepository, get_user_repository
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = 5.0
+MAX_PENDING_WRITES = 1000
+# Baris yang ditulis oleh proses lain dibaca semula dari sedikit sebelum tanda terakhir, kerana updated_at
+# diambil sebelum commit dan penulis yang lebih perlahan boleh commit selepas penulis yang lebih baru
+SYNC_LOOKBACK_SECONDS = 60
+
+UserListener = Callable[[int, UserRecord], None]
+
+class UserRegistry:
+    """In-memory view of known users with write-behind batching to the user repository.
+
+    Several bot processes share users.db, so writes made by the others are picked up through SQLite's
+    data_version: on every full read and after each flush, only the rows changed since the last sync are reloaded.
+    """
+
+    def __init__(self, repository: UserRepository, flush_interval: float = FLUSH_INTERVAL_SECONDS,
+                 max_pending: int = MAX_PENDING_WRITES) -> None:
+        self.repository = repository
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Pending patches per user; a None value removes the key on flush
+        self._dirty: Dict[int, UserRecord] = {}
+        self._records: Dict[int, UserRecord] = {}
+        self._data_version = repository.data_version()
+        self._synced_at = ''
+        self._sync_lock = threading.Lock()
+        self._merge(repository.changed_since())
+        self._listeners: List[UserListener] = []
+        self._start_listeners: List[UserListener] = []
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="user-registry-flush", daemon=True)
+        self._thread.start()
+
+    def add_user(self, user_id: int) -> bool:
+        """Register a user in memory (on /start). Returns True when the user was not known before.
+
+        Start listeners hear every call, known user or not: a /start proves the user can be messaged.
+        """
+        with self._lock:
+            is_new = user_id not in self._records
+            if is_new:
+                self._records[user_id] = {"user_id": user_id}
+                self._mark_dirty(user_id, {"user_id": user_id})
+            snapshot = dict(self._records[user_id])
+        if is_new:
+            self._notify(self._listeners, user_id, snapshot)
+        self._notify(self._start_listeners, user_id, snapshot)
+        return is_new
+
+    def update(self, user_id: int, fields: UserRecord) -> None:
+        """Merge `fields` into a user's record (None removes a key) and queue the write."""
+        with self._lock:
+            record = self._records.setdefault(user_id, {"user_id": user_id})
+            for key, value in fields.items():
+                if value is None:
+                    record.pop(key, None)
+                else:
+                    record[key] = value
+            self._mark_dirty(user_id, fields)
+            snapshot = dict(record)
+        self._notify(self._listeners, user_id, snapshot)
+
+    def subscribe(self, listener: UserListener) -> None:
+        """Call `listener(user_id, record)` whenever a user is added or updated."""
+        self._listeners.append(listener)
+
+    def subscribe_started(self, listener: UserListener) -> None:
+        """Call `listener(user_id, record)` whenever a user sends /start, including users already known."""
+        self._start_listeners.append(listener)
+
+    def _notify(self, listeners: List[UserListener], user_id: int, record: UserRecord) -> None:
+        """Publish an event to subscribed caches."""
+        for listener in listeners:
+            try:
+                listener(user_id, record)
+            except Exception as e:
+                logger.error(f"User change listener failed for {user_id}: {e}")
+
+    def _mark_dirty(self, user_id: int, fields: UserRecord) -> None:
+        """Record a pending patch; caller must hold the lock."""
+        self._dirty.setdefault(user_id, {}).update(fields)
+        if len(self._dirty) >= self.max_pending:
+            self._wakeup.set()
+
+    def _merge(self, rows: List[Tuple[int, UserRecord, str]]) -> List[Tuple[int, UserRecord]]:
+        """Apply rows read from the repository under any patches not yet flushed. Returns the records that changed."""
+        changed = []
+        with self._lock:
+            for user_id, stored, updated_at in rows:
+                record = dict(stored)
+                for key, value in self._dirty.get(user_id, {}).items():
+                    if value is None:
+                        record.pop(key, None)
+                    else:
+                        record[key] = value
+                if self._records.get(user_id) != record:
+                    self._records[user_id] = record
+                    changed.append((user_id, dict(record)))
+                self._synced_at = max(self._synced_at, updated_at)
+        return changed
+
+    def refresh(self) -> int:
+        """Pick up users added or updated by other processes (e.g. /start in another bot). Returns the number merged.
+
+        Cheap when nothing changed: only PRAGMA data_version is read. Otherwise only rows written since
+        the last sync are loaded, and subscribers hear about each new or changed user.
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return 0
+        try:
+            version = self.repository.data_version()
+            if version == self._data_version:
+                return 0
+            since = ''
+            if self._synced_at:
+                since = (datetime.fromisoformat(self._synced_at) - timedelta(seconds=SYNC_LOOKBACK_SECONDS)).isoformat()
+            changed = self._merge(self.repository.changed_since(since))
+            self._data_version = version
+        except Exception as e:
+            logger.error(f"Failed to reload users from the repository: {e}")
+            return 0
+        finally:
+            self._sync_lock.release()
+        for user_id, record in changed:
+            self._notify(self._listeners, user_id, record)
+        return len(changed)
+
+    def is_known(self, user_id: int) -> bool:
+        """Check whether a user has been registered."""
+        return user_id in self._records
+
+    def get(self, user_id: int) -> UserRecord:
+        """Return a copy of a user's record, or an empty dict."""
+        with self._lock:
+            return dict(self._records.get(user_id, {}))
+
+    def user_ids(self) -> List[int]:
+        """Return every known user ID, including users other processes have registered."""
+        self.refresh()
+        with self._lock:
+            return list(self._records)
+
+    def count(self) -> int:
+        """Return the number of known users."""
+        return len(self._records)
+
+    def all(self) -> Dict[str, UserRecord]:
+        """Return copies of all records keyed by the user ID string, including other processes' changes."""
+        self.refresh()
+        with self._lock:
+            return {str(uid): dict(record) for uid, record in self._records.items()}
+
+    def flush(self) -> int:
+        """Write all pending patches to the repository. Returns the number of users written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._dirty = self._dirty, {}
+            if not pending:
+                return 0
+            try:
+                self.repository.upsert_many(pending)
+            except Exception as e:
+                logger.error(f"Failed to flush {len(pending)} users, will retry: {e}")
+                with self._lock:
+                    for user_id, fields in pending.items():
+                        newer = self._dirty.get(user_id, {})
+                        self._dirty[user_id] = {**fields, **newer}
+                return 0
+            return len(pending)
+
+    def _run(self) -> None:
+        """Background loop flushing on the timer or when the pending threshold is hit."""
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            self.refresh()
+
+    def close(self) -> None:
+        """Stop the background thread and force a final flush."""
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+_registry: Optional[UserRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_user_registry() -> UserRegistry:
+    """Return the process-wide registry, flushed automatically at interpreter exit."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = UserRegistry(get_user_repository())
+            atexit.register(_registry.close)
+        return _registry
@@ -0,0 +1,153 @@
+import json
+import os
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Konfigurasi logger
+logger = logging.getLogger(__name__)
+
+USER_DB_PATH = os.getenv('USER_DB_PATH', 'users.db')
+USER_DATA_FILE = 'user_data.json'
+
+UserRecord = Dict[str, object]
+
+class UserRepository:
+    """SQLite-backed user store keyed by user_id (replaces whole-file user_data.json rewrites)."""
+
+    def __init__(self, db_path: str = USER_DB_PATH, batch_size: int = 500) -> None:
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        """Create the users table and its lookup indexes if they do not exist."""
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id INTEGER PRIMARY KEY,
+                    data TEXT NOT NULL DEFAULT '{}',
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_users_subscription_end
+                ON users (json_extract(data, '$.subscription_end'))
+            """)
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_users_version
+                ON users (json_extract(data, '$.version'))
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_users_updated_at ON users (updated_at)")
+
+    def add_user(self, user_id: int) -> bool:
+        """Register a user if unseen. Returns True when a new row was created."""
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO users (user_id, data, updated_at) VALUES (?, ?, ?)",
+                (user_id, json.dumps({"user_id": user_id}), now)
+            )
+            return cursor.rowcount > 0
+
+    def upsert(self, user_id: int, fields: UserRecord) -> None:
+        """Insert a user or merge `fields` into the existing record (None removes a key)."""
+        self.upsert_many({user_id: fields})
+
+    def upsert_many(self, records: Dict[int, UserRecord]) -> None:
+        """Upsert many users, committing once per `batch_size` rows."""
+        now = datetime.now().isoformat()
+        rows = [
+            (int(user_id), json.dumps(dict(fields, user_id=int(user_id))), now)
+            for user_id, fields in records.items()
+        ]
+        with self._lock:
+            for start in range(0, len(rows), self.batch_size):
+                with self._conn:
+                    self._conn.executemany("""
+                        INSERT INTO users (user_id, data, updated_at) VALUES (?, json_patch('{}', ?), ?)
+                        ON CONFLICT(user_id) DO UPDATE SET
+                            data = json_patch(users.data, excluded.data),
+                            updated_at = excluded.updated_at
+                    """, rows[start:start + self.batch_size])
+
+    def get(self, user_id: int) -> UserRecord:
+        """Return the stored record for a user, or an empty dict."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def exists(self, user_id: int) -> bool:
+        """Check whether a user has been registered."""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return row is not None
+
+    def user_ids(self) -> List[int]:
+        """Return every registered user ID in ascending order."""
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id FROM users ORDER BY user_id").fetchall()
+        return [row[0] for row in rows]
+
+    def count(self) -> int:
+        """Return the number of registered users."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def all(self) -> Dict[str, UserRecord]:
+        """Return all records keyed by the user ID string, like the old user_data.json."""
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id, data FROM users").fetchall()
+        return {str(user_id): json.loads(data) for user_id, data in rows}
+
+    def data_version(self) -> int:
+        """Return SQLite's data_version, which changes whenever another connection commits to the database."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed_since(self, updated_at: str = '') -> List[Tuple[int, UserRecord, str]]:
+        """Return (user_id, record, updated_at) for every row written at or after `updated_at`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, data, updated_at FROM users WHERE updated_at >= ?", (updated_at,)
+            ).fetchall()
+        return [(user_id, json.loads(data), changed_at) for user_id, data, changed_at in rows]
+
+    def import_json(self, file_path: str = USER_DATA_FILE) -> int:
+        """Bulk import a legacy user_data.json file. Returns the number of users imported."""
+        if not os.path.exists(file_path):
+            return 0
+        try:
+            with open(file_path, 'r') as file:
+                legacy = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Failed to read {file_path} for import: {e}")
+            return 0
+        records = {int(uid): fields for uid, fields in legacy.items() if isinstance(fields, dict)}
+        self.upsert_many(records)
+        logger.info(f"Imported {len(records)} users from {file_path} into {self.db_path}.")
+        return len(records)
+
+    def close(self) -> None:
+        """Close the underlying connection."""
+        with self._lock:
+            self._conn.close()
+
+_repository: Optional[UserRepository] = None
+_repository_lock = threading.Lock()
+
+def get_user_repository() -> UserRepository:
+    """Return the process-wide repository, importing user_data.json on first use."""
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = UserRepository()
+            if _repository.count() == 0:
+                _repository.import_json(USER_DATA_FILE)
+        return _repository